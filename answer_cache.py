@@ -0,0 +1,171 @@
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip("?!. ")
+
+
+def history_scope(formatted_history: str) -> str:
+    """Cache scope for a conversation: '' for a fresh chat, else a hash of the prompt history."""
+    if not formatted_history:
+        return ""
+    return hashlib.sha1(formatted_history.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedAnswer:
+    response: str
+    sources: List[dict]
+    vector: Optional[np.ndarray] = None
+    expires_at: float = 0.0
+    size: int = field(default=0, repr=False)
+
+
+class AnswerCache:
+    """
+    LRU + TTL cache of final answers, bounded by an approximate size in bytes.
+
+    Entries are keyed by (scope, normalized query), where scope is derived from
+    the chat history that goes into the prompt, so a follow-up question is never
+    answered with a reply that was generated for a different conversation.
+    For fresh conversations (empty scope) a lookup can also match a cached
+    question whose query embedding has cosine similarity >= similarity_threshold.
+    """
+
+    def __init__(self, max_bytes: int = None, ttl: float = None, similarity_threshold: float = None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+        self.ttl = ttl if ttl is not None else float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+        self.similarity_threshold = (
+            similarity_threshold if similarity_threshold is not None
+            else float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+        )
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, scope: str, query: str) -> Optional[CachedAnswer]:
+        """Exact lookup by normalized query."""
+        if not self.enabled:
+            return None
+        key = (scope, normalize_query(query))
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is not None:
+                self.hits += 1
+            return entry
+
+    def get_similar(self, scope: str, vector) -> Optional[CachedAnswer]:
+        """Nearest cached question by embedding; only used for fresh conversations."""
+        if not self.enabled or scope or self.similarity_threshold <= 0 or vector is None:
+            return None
+        query = _unit(vector)
+        # Score a snapshot outside the lock so the scan doesn't block other lookups and puts
+        with self._lock:
+            items = list(self._entries.items())
+        candidates = [(key, entry.vector) for key, entry in items if key[0] == scope and entry.vector is not None]
+        if not candidates:
+            return None
+        scores = np.stack([vec for _, vec in candidates]) @ query
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        with self._lock:
+            # None if it expired or was evicted since the snapshot
+            entry = self._live_entry(candidates[best][0])
+            if entry is not None:
+                self.semantic_hits += 1
+            return entry
+
+    def clear(self):
+        """Drop every entry (e.g. after the index they were answered from was replaced)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(self, scope: str, query: str, response: str, sources: List[dict], vector=None):
+        if not self.enabled:
+            return
+        entry = CachedAnswer(
+            response=response,
+            sources=sources,
+            vector=_unit(vector) if vector is not None else None,
+            expires_at=time.monotonic() + self.ttl,
+        )
+        entry.size = _entry_size(query, entry)
+        if entry.size > self.max_bytes:
+            return
+        key = (scope, normalize_query(query))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
+
+    def _live_entry(self, key) -> Optional[CachedAnswer]:
+        """Return the entry for key and mark it recently used, dropping it if expired. Lock held."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._entries[key]
+            self._bytes -= entry.size
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _entry_size(query: str, entry: CachedAnswer) -> int:
+    size = sys.getsizeof(query) + sys.getsizeof(entry.response)
+    size += sum(sys.getsizeof(s.get("text", "")) + sys.getsizeof(s.get("url", "")) for s in entry.sources)
+    if entry.vector is not None:
+        size += entry.vector.nbytes
+    return size
@@ -1,68 +1,233 @@
-import pandas as pd
-import wikipediaapi
+import argparse
+import json
+import logging
+import os
+import sqlite3
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from tqdm import tqdm  # For progress tracking
 
-# Dictionary to cache Wikipedia results (avoid redundant requests)
-wiki_cache = {}
+USER_AGENT = "MyDatasetAugmenter/1.0 (contact: saurabhrajput24k@gmail.com)"
+WIKI_BASE_URL = os.getenv("WIKI_BASE_URL", "https://en.wikipedia.org/api/rest_v1")
+NO_DATA = "No Wikipedia data available"
+
+# Columns to augment with Wikipedia
+WIKI_COLUMNS = ["menu_category", "menu_item", "ingredient_name", "categories", "city", "country", "state"]
+
+
+class TokenBucket:
+    """Thread-safe token bucket: at most `rate` acquisitions per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int = None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SummaryCache:
+    """
+    On-disk SQLite cache of term -> summary with a TTL, safe to share across threads.
+    Entries are keyed by `source` (the API root they came from) as well, so a run
+    against a local stub never answers for the real API or the other way round.
+    """
+
+    def __init__(self, path: str, ttl: float, source: str = WIKI_BASE_URL):
+        self.ttl = ttl
+        self.source = source
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS source_summaries (source TEXT NOT NULL, term TEXT NOT NULL, "
+            "summary TEXT NOT NULL, fetched_at REAL NOT NULL, PRIMARY KEY (source, term))"
+        )
+        self._conn.commit()
+
+    def get(self, term: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, fetched_at FROM source_summaries WHERE source = ? AND term = ?", (self.source, term)
+            ).fetchone()
+        if row is None or (self.ttl and time.time() - row[1] > self.ttl):
+            return None
+        return row[0]
+
+    def put(self, term: str, summary: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO source_summaries (source, term, summary, fetched_at) VALUES (?, ?, ?, ?)",
+                (self.source, term, summary, time.time()),
+            )
+            self._conn.commit()
 
-def fetch_wikipedia_summary(term):
-    """Fetch Wikipedia summary for a given term, using caching."""
-    if term in wiki_cache:
-        return wiki_cache[term]  # ✅ Return cached result if available
-    
-    USER_AGENT = "MyDatasetAugmenter/1.0 (contact: saurabhrajput24k@gmail.com)"
-    wiki_wiki = wikipediaapi.Wikipedia(language="en", user_agent=USER_AGENT)
+    def close(self):
+        with self._lock:
+            self._conn.close()
 
-    page = wiki_wiki.page(term)
-    if page.exists():
-        summary = page.summary[:500]  # Limit to first 500 characters
-    else:
-        summary = "No Wikipedia data available"
 
-    wiki_cache[term] = summary  # ✅ Store result in cache
-    return summary
+class WikipediaFetcher:
+    """
+    Fetches page summaries from the Wikipedia REST API (`/page/summary/<title>`)
+    through one pooled requests.Session, rate limited by a token bucket and
+    backed by a persistent SQLite cache (keyed by `base_url`), so each term is
+    requested at most once per TTL across runs.
 
-def augment_with_wikipedia(file_path):
-    """Augment the cleaned menu CSV with Wikipedia data for multiple columns (faster with caching + threading)."""
+    For offline runs point `base_url` at a local stub server, or set
+    `fixture_dir` to a directory of `<term>.json` files shaped like the API
+    response ({"extract": "..."}); terms without a fixture resolve to NO_DATA,
+    and neither the network nor the cache is used.
+    """
+
+    def __init__(self, base_url: str = WIKI_BASE_URL, cache_path: str = None, ttl: float = None,
+                 rate: float = None, workers: int = None, fixture_dir: str = None, timeout: float = 10):
+        self.base_url = base_url.rstrip("/")
+        self.fixture_dir = fixture_dir or os.getenv("WIKI_FIXTURE_DIR")
+        self.workers = workers or int(os.getenv("WIKI_WORKERS", "8"))
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate or float(os.getenv("WIKI_RATE", "20")))
+        self.cache = None if self.fixture_dir else SummaryCache(
+            cache_path or os.getenv("WIKI_CACHE_PATH", "data/wiki_cache.sqlite"),
+            ttl if ttl is not None else float(os.getenv("WIKI_CACHE_TTL", str(30 * 24 * 3600))),
+            source=self.base_url,
+        )
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.workers,
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.requests_made = 0
+        self._requests_lock = threading.Lock()
+
+    def fetch(self, term: str) -> str:
+        """Summary (first 500 chars) for one term, from fixtures, cache or the API."""
+        if self.fixture_dir:
+            return self._from_fixture(term)
+
+        cached = self.cache.get(term)
+        if cached is not None:
+            return cached
+        summary = self._from_api(term)
+        if summary is None:
+            return NO_DATA  # transient failure: don't cache, retry on the next run
+        self.cache.put(term, summary)
+        return summary
+
+    def fetch_many(self, terms) -> dict:
+        """Fetch every distinct term once, concurrently. Returns {term: summary}."""
+        unique_terms = list(dict.fromkeys(str(t) for t in terms))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            summaries = list(tqdm(pool.map(self.fetch, unique_terms), total=len(unique_terms), unit="term"))
+        return dict(zip(unique_terms, summaries))
+
+    def _from_fixture(self, term: str) -> str:
+        path = os.path.join(self.fixture_dir, quote(term, safe="") + ".json")
+        if not os.path.exists(path):
+            return NO_DATA
+        with open(path) as f:
+            return (json.load(f).get("extract") or NO_DATA)[:500]
+
+    def _from_api(self, term: str):
+        self.bucket.acquire()
+        with self._requests_lock:
+            self.requests_made += 1
+        url = f"{self.base_url}/page/summary/{quote(term.replace(' ', '_'), safe='')}"
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            logging.warning(f"Wikipedia request for {term!r} failed: {e}")
+            return None
+        if response.status_code == 404:
+            return NO_DATA
+        if not response.ok:
+            logging.warning(f"Wikipedia returned {response.status_code} for {term!r}")
+            return None
+        try:
+            body = response.json()
+        except ValueError as e:
+            logging.warning(f"Wikipedia returned invalid JSON for {term!r}: {e}")
+            return None
+        extract = (body.get("extract") if isinstance(body, dict) else None) or NO_DATA
+        return extract[:500]  # Limit to first 500 characters
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+def augment_with_wikipedia(file_path, fetcher: WikipediaFetcher = None):
+    """Augment the cleaned menu CSV with Wikipedia data, fetching each distinct value per column once."""
     df = pd.read_csv(file_path)
+    owns_fetcher = fetcher is None
+    fetcher = fetcher or WikipediaFetcher()
 
-    # Columns to augment with Wikipedia
-    wiki_columns = ["menu_category", "menu_item", "ingredient_name", "categories", "city", "country", "state"]
-    
-    print("\n🔍 Fetching Wikipedia data for:", wiki_columns)
-    tqdm.pandas()  # Enable progress tracking
-
-    for col in wiki_columns:
-        if col in df.columns:
-            print(f"\n🌍 Augmenting `{col}` with Wikipedia summaries...")
-            
-            # ✅ Use threading to speed up Wikipedia requests
-            def fetch_parallel(index, value):
-                df.at[index, f"{col}_wiki_summary"] = fetch_wikipedia_summary(value)
-
-            threads = []
-            for index, value in tqdm(df[col].items(), total=len(df[col]), desc=f"🔄 Fetching {col}"):
-                thread = threading.Thread(target=fetch_parallel, args=(index, value))
-                threads.append(thread)
-                thread.start()
-
-                if len(threads) >= 10:  # ✅ Control concurrency to avoid API rate limits
-                    for t in threads:
-                        t.join()
-                    threads = []
-
-            # Ensure remaining threads finish
-            for t in threads:
-                t.join()
+    print("\n🔍 Fetching Wikipedia data for:", WIKI_COLUMNS)
+    try:
+        for col in WIKI_COLUMNS:
+            if col in df.columns:
+                values = df[col].dropna().astype(str)
+                print(f"\n🌍 Augmenting `{col}`: {values.nunique():,} distinct terms for {len(df):,} rows...")
+                summaries = fetcher.fetch_many(values.unique())
+                df[f"{col}_wiki_summary"] = values.map(summaries).reindex(df.index).fillna(NO_DATA)
+    finally:
+        if owns_fetcher:
+            fetcher.close()
 
     # Save new CSV with Wikipedia data
     output_path = file_path.replace(".csv", "_wiki_augmented.csv")
     df.to_csv(output_path, index=False)
 
-    print(f"\n✅ Wikipedia data successfully added! Saved as `{output_path}`")
+    print(f"\n✅ Wikipedia data successfully added ({fetcher.requests_made:,} API requests)! Saved as `{output_path}`")
     return df
 
-# Run the augmentation on your cleaned menu CSV
-csv_path = "data/cleaned_menu.csv"
-df_augmented = augment_with_wikipedia(csv_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Augment the cleaned menu CSV with Wikipedia summaries.")
+    parser.add_argument("csv_path", nargs="?", default="data/cleaned_menu.csv")
+    parser.add_argument("--base-url", default=WIKI_BASE_URL, help="Wikipedia REST API root (or a local stub).")
+    parser.add_argument("--fixture-dir", default=None, help="Serve summaries from <term>.json files, offline.")
+    parser.add_argument("--cache", default=None, help="SQLite cache path (default data/wiki_cache.sqlite).")
+    parser.add_argument("--rate", type=float, default=None, help="Max requests per second.")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    fetcher = WikipediaFetcher(
+        base_url=args.base_url,
+        cache_path=args.cache,
+        rate=args.rate,
+        workers=args.workers,
+        fixture_dir=args.fixture_dir,
+    )
+    try:
+        augment_with_wikipedia(args.csv_path, fetcher)
+    finally:
+        fetcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Filtered vs unfiltered retrieval on the local Chroma index.
+
+Each synthetic query comes from a template that also carries its relevance
+label: the dish it asks for plus the city, state, price bound or rating that
+was filled in. For every query the same vector search runs with and without
+the `where` filter that QueryParser derives from the text, and the report
+gives latency, precision@k (share of hits that satisfy the label) and
+recall@k (share of the index's relevant chunks that were returned). Labels
+are checked against the document text and raw metadata, never through the
+parser, so a missed or wrong filter shows up as lower precision or recall.
+Prints a JSON report.
+
+    python benchmarks/filtered_queries.py --k 5 --repeat 3
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from langchain_chroma import Chroma  # noqa: E402
+
+from embedding_backends import build_embeddings  # noqa: E402
+from query_parser import GAZETTEER_FILE, QueryParser  # noqa: E402
+
+
+@dataclass
+class Label:
+    """What a relevant chunk looks like for one synthetic query, independent of QueryParser."""
+    dish: Tuple[str, ...]
+    city: Optional[str] = None
+    state: Optional[str] = None
+    max_price: Optional[float] = None
+    min_rating: Optional[float] = None
+
+    def relevant(self, text: str, metadata: dict) -> bool:
+        def number(key):
+            try:
+                return float(metadata.get(key))
+            except (TypeError, ValueError):
+                return None
+
+        text = text.lower()
+        price, rating = number("price_value"), number("rating")
+        return (
+            any(word in text for word in self.dish)
+            and (self.city is None or metadata.get("city") == self.city)
+            and (self.state is None or metadata.get("state") == self.state)
+            and (self.max_price is None or (price is not None and price <= self.max_price))
+            and (self.min_rating is None or (rating is not None and rating >= self.min_rating))
+        )
+
+
+# (template, dish words, label fields filled from the template)
+DEFAULT_QUERIES = [
+    ("best tacos in {city}", ("taco",), {"city": True}),
+    ("cheap pizza in {city}", ("pizza",), {"city": True}),
+    ("sushi under $20 in {city}", ("sushi", "nigiri", "maki"), {"city": True, "max_price": 20}),
+    ("burgers rated 4 stars or more in {city}", ("burger",), {"city": True, "min_rating": 4}),
+    ("vegetarian dishes in {state}", ("vegetarian", "vegan", "veggie"), {"state": True}),
+    ("highly rated ramen", ("ramen",), {"min_rating": 4}),
+    ("pasta under $15", ("pasta", "spaghetti", "fettuccine", "penne", "lasagna"), {"max_price": 15}),
+]
+
+
+def build_queries(parser: QueryParser, count: int, seed: int) -> list:
+    """(query, Label) pairs: the templates filled with cities/states from the gazetteer."""
+    rng = random.Random(seed)
+    cities = sorted(parser.cities) or ["new york"]
+    states = sorted(s for s in parser.states if len(s) > 2) or ["california"]
+    queries = []
+    for i in range(count):
+        template, dish, fields = DEFAULT_QUERIES[i % len(DEFAULT_QUERIES)]
+        city, state = rng.choice(cities), rng.choice(states)
+        label = Label(
+            dish=dish,
+            city=parser.cities.get(city, city) if fields.get("city") else None,
+            state=parser.states.get(state, state) if fields.get("state") else None,
+            max_price=fields.get("max_price"),
+            min_rating=fields.get("min_rating"),
+        )
+        queries.append((template.format(city=city, state=state), label))
+    return queries
+
+
+def count_relevant(vectordb, labels: list, page_size: int = 10000) -> list:
+    """Relevant chunks in the whole collection per label (the recall denominators)."""
+    counts = [0] * len(labels)
+    offset = 0
+    while True:
+        page = vectordb.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        for text, metadata in zip(page["documents"], page["metadatas"]):
+            for i, label in enumerate(labels):
+                counts[i] += label.relevant(text or "", metadata or {})
+        if len(page["ids"]) < page_size:
+            break
+        offset += page_size
+    return counts
+
+
+def timed_search(vectordb, vector, k, where):
+    start = time.perf_counter()
+    hits = vectordb.similarity_search_by_vector(vector, k=k, filter=where)
+    return hits, (time.perf_counter() - start) * 1000
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Chroma where-filters against unfiltered search.")
+    parser.add_argument("--db-dir", default=os.path.join(ROOT, "chroma_db"))
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per query (best is kept).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectordb = Chroma(persist_directory=args.db_dir, embedding_function=build_embeddings())
+    query_parser = QueryParser.from_gazetteer(os.path.join(args.db_dir, GAZETTEER_FILE))
+    queries = build_queries(query_parser, args.queries, args.seed)
+    relevant_counts = count_relevant(vectordb, [label for _, label in queries])
+
+    rows = []
+    for (query, label), relevant_in_index in zip(queries, relevant_counts):
+        constraints = query_parser.parse(query)
+        vector = vectordb.embeddings.embed_query(query)
+        result = {"query": query, "where": constraints.where(), "relevant_in_index": relevant_in_index}
+        for mode, where in (("unfiltered", None), ("filtered", constraints.where())):
+            timings = []
+            for _ in range(args.repeat):
+                hits, ms = timed_search(vectordb, vector, args.k, where)
+                timings.append(ms)
+            relevant = sum(label.relevant(doc.page_content, doc.metadata) for doc in hits)
+            result[mode] = {
+                "ms": round(min(timings), 2),
+                "hits": len(hits),
+                "relevant": relevant,
+                "precision": round(relevant / args.k, 3),
+                "recall": round(relevant / relevant_in_index, 4) if relevant_in_index else None,
+            }
+        rows.append(result)
+
+    def summarize(mode):
+        ms = [r[mode]["ms"] for r in rows]
+        recalls = [r[mode]["recall"] for r in rows if r[mode]["recall"] is not None]
+        return {
+            "p50_ms": round(percentile(ms, 50), 2),
+            "p95_ms": round(percentile(ms, 95), 2),
+            "mean_precision": round(statistics.mean(r[mode]["precision"] for r in rows), 3) if rows else 0.0,
+            "mean_recall": round(statistics.mean(recalls), 4) if recalls else None,
+        }
+
+    print(json.dumps({
+        "k": args.k,
+        "queries": len(rows),
+        "queries_without_relevant_chunks": sum(not r["relevant_in_index"] for r in rows),
+        "unfiltered": summarize("unfiltered"),
+        "filtered": summarize("filtered"),
+        "per_query": rows,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
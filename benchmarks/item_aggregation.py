@@ -0,0 +1,126 @@
+"""
+Index size and search latency with one document per ingredient row versus
+one per menu item (with and without near-duplicate removal), fully offline.
+
+Each layout streams the same synthetic CSV through iter_csv_chunks and
+reports its document count, text size, on-disk BM25 index size and BM25
+query latency. The vector side is estimated without an embedding model:
+`vector_mb` is documents x --dim float32, and `vector_ms` is an exact
+top-k search over that many random unit vectors (an upper bound for the
+HNSW index, whose cost also grows with the document count).
+
+    python benchmarks/item_aggregation.py --rows 50000 --out aggregation.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.run_suite import dir_size_mb  # noqa: E402
+from benchmarks.synthetic_menu import sample_queries, write_csv  # noqa: E402
+
+LAYOUTS = {
+    "rows": {"aggregate": False, "dedup_threshold": 0},
+    "items": {"aggregate": True, "dedup_threshold": 0},
+    "items_dedup": {"aggregate": True, "dedup_threshold": None},  # None: ingest default
+}
+
+
+def percentiles(samples_ms: list) -> dict:
+    samples_ms = sorted(samples_ms)
+    return {
+        "p50": round(statistics.median(samples_ms), 3),
+        "p95": round(samples_ms[int(0.95 * (len(samples_ms) - 1))], 3),
+    }
+
+
+def load_documents(csv_path: str, rows_per_chunk: int, aggregate: bool, dedup_threshold) -> list:
+    from ingest_pdfs import DEFAULT_THRESHOLD, iter_csv_chunks
+
+    if dedup_threshold is None:
+        dedup_threshold = DEFAULT_THRESHOLD
+    with contextlib.redirect_stdout(sys.stderr):
+        return [
+            doc
+            for chunk in iter_csv_chunks(csv_path, rows_per_chunk, aggregate=aggregate, dedup_threshold=dedup_threshold)
+            for doc in chunk
+        ]
+
+
+def bench_layout(docs: list, queries: list, work_dir: str, args) -> dict:
+    from lexical_index import LexicalIndex, LexicalIndexBuilder
+
+    builder = LexicalIndexBuilder()
+    for i, doc in enumerate(docs):
+        builder.add(str(i), doc.page_content, doc.metadata)
+    started = time.perf_counter()
+    builder.save(work_dir)
+    build_s = time.perf_counter() - started
+
+    index = LexicalIndex(work_dir)
+    lexical_ms = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, args.k)
+        lexical_ms.append((time.perf_counter() - started) * 1000)
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((len(docs), args.dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    vector_ms = []
+    for _ in queries:
+        query = rng.standard_normal(args.dim, dtype=np.float32)
+        started = time.perf_counter()
+        scores = vectors @ query
+        np.argpartition(scores, -args.k)[-args.k :]
+        vector_ms.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "documents": len(docs),
+        "text_mb": round(sum(len(doc.page_content.encode("utf-8")) for doc in docs) / 2**20, 2),
+        "lexical_index_mb": dir_size_mb(work_dir),
+        "lexical_build_s": round(build_s, 3),
+        "lexical_ms": percentiles(lexical_ms),
+        "vector_mb": round(len(docs) * args.dim * 4 / 2**20, 2),
+        "vector_ms": percentiles(vector_ms),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-row and per-item document layouts offline.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rows-per-chunk", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=768, help="Embedding width for the vector estimate.")
+    parser.add_argument("--out", help="Also write the JSON report to this file.")
+    args = parser.parse_args()
+
+    queries = sample_queries(args.queries, args.seed)
+    report = {"rows": args.rows, "queries": len(queries), "layouts": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "menu.csv")
+        write_csv(csv_path, args.rows, args.seed)
+        for name, layout in LAYOUTS.items():
+            docs = load_documents(csv_path, args.rows_per_chunk, **layout)
+            report["layouts"][name] = bench_layout(docs, queries, os.path.join(tmp, name), args)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
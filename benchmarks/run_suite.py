@@ -0,0 +1,298 @@
+"""
+End-to-end benchmark and load test, fully offline.
+
+1. ingest:    a synthetic menu CSV through load_and_process_csvs + create_vector_store
+2. startup:   the engine's background initialization on that index
+3. retrieval: single-query embedding and retrieval latency (no LLM)
+4. chat:      POST /api/chat (or /api/chat/stream) at a fixed concurrency against
+              app.py served by uvicorn in-process
+
+The inference endpoint is replaced by StubLLM (configurable latency and
+tokens/s) and the web fallback by the stub provider, so results depend only
+on this code and the machine. Prints a JSON report (p50/p95/p99, QPS, peak
+RSS) meant to be diffed across commits:
+
+    python benchmarks/run_suite.py --rows 5000 --concurrency 8 --requests 200 --out bench.json
+    python benchmarks/run_suite.py --db-dir /tmp/bench/chroma_db --skip-ingest --stream
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stubs import StubLLM, StubModelRegistry, stub_web_provider  # noqa: E402
+from benchmarks.synthetic_menu import sample_queries, write_csv  # noqa: E402
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))] if values else 0.0
+
+
+def summarize(ms: list) -> dict:
+    return {
+        "count": len(ms),
+        "mean_ms": round(statistics.mean(ms), 2) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(max(ms), 2) if ms else 0.0,
+    }
+
+
+def peak_rss_mb() -> dict:
+    """Peak resident set size of this process and of its (waited-for) children, in MB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return {"self": None, "children": None}
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def dir_size_mb(path: str) -> float:
+    total = sum(os.path.getsize(os.path.join(dirpath, name)) for dirpath, _, names in os.walk(path) for name in names)
+    return round(total / (1024 * 1024), 2)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# -------------------------
+# Phases
+# -------------------------
+def bench_ingest(csv_path: str, db_dir: str, args) -> dict:
+    from ingest_pdfs import create_vector_store, load_and_process_csvs
+
+    # Ingest progress goes to stderr so stdout stays pure JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        started = time.perf_counter()
+        chunks = load_and_process_csvs(
+            csv_path, args.rows_per_chunk, aggregate=not args.no_aggregate, dedup_threshold=args.dedup_threshold
+        )
+        loaded = time.perf_counter()
+        create_vector_store(chunks, db_dir, batch_size=args.batch_size, workers=args.workers)
+        stored = time.perf_counter()
+
+    return {
+        "rows": args.rows,
+        "chunks": len(chunks),
+        "load_s": round(loaded - started, 3),
+        "load_rows_per_s": round(args.rows / (loaded - started), 1),
+        "store_s": round(stored - loaded, 3),
+        "store_chunks_per_s": round(len(chunks) / (stored - loaded), 1),
+        "index_mb": dir_size_mb(db_dir),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def configure_engine(llm: StubLLM, web_delay_ms: float):
+    """The process-wide engine with the LLM and web search swapped for stubs (before start())."""
+    from rag_engine import Generator, get_engine
+    from web_search import WebSearch
+
+    engine = get_engine()
+    engine.model_registry = StubModelRegistry(llm)
+    engine.generator = Generator(engine.model_registry)
+    engine.web_search.shutdown()
+    engine.web_search = WebSearch(provider=stub_web_provider(web_delay_ms))
+    return engine
+
+
+def wait_ready(engine, timeout: float) -> dict:
+    deadline = time.monotonic() + timeout
+    while not engine.startup.wait(0.1):
+        if engine.startup.failed:
+            raise RuntimeError(f"Engine failed to start: {engine.startup.error}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Engine not ready after {timeout}s ({engine.startup.state})")
+    return {"ready_ms": engine.startup.total_ms(), "phases_ms": dict(engine.startup.phases_ms)}
+
+
+def bench_retrieval(engine, queries: list) -> dict:
+    embed_ms, retrieve_ms, web_fallbacks = [], [], 0
+    for query in queries:
+        started = time.perf_counter()
+        vector = engine.embeddings.embed_query(query)
+        embedded = time.perf_counter()
+        retrieval = engine.retriever.retrieve(query, vector)
+        done = time.perf_counter()
+        embed_ms.append((embedded - started) * 1000)
+        retrieve_ms.append((done - embedded) * 1000)
+        web_fallbacks += bool(retrieval.context_header)
+    return {
+        "queries": len(queries),
+        "embed": summarize(embed_ms),
+        "retrieve": summarize(retrieve_ms),
+        "web_fallbacks": web_fallbacks,
+    }
+
+
+def post_chat(url: str, query: str, stream: bool, timeout: float):
+    """One chat request: (HTTP status, total ms, ms to first token event or None)."""
+    body = json.dumps({"message": query, "history": []}).encode("utf-8")
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    started = time.perf_counter()
+    first_token = None
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            if stream:
+                for line in response:
+                    if first_token is None and line.startswith(b"event: token"):
+                        first_token = (time.perf_counter() - started) * 1000
+            else:
+                response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = None
+    return status, (time.perf_counter() - started) * 1000, first_token
+
+
+def bench_chat(base_url: str, queries: list, concurrency: int, stream: bool, timeout: float) -> dict:
+    url = base_url + ("/api/chat/stream" if stream else "/api/chat")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda q: post_chat(url, q, stream, timeout), queries))
+    wall = time.perf_counter() - started
+
+    ok = [ms for status, ms, _ in results if status == 200]
+    report = {
+        "endpoint": url[len(base_url):],
+        "concurrency": concurrency,
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected_503": sum(status == 503 for status, _, _ in results),
+        "errors": sum(status not in (200, 503) for status, _, _ in results),
+        "wall_s": round(wall, 3),
+        "qps": round(len(ok) / wall, 2) if wall else 0.0,
+        "latency": summarize(ok),
+    }
+    if stream:
+        report["first_token"] = summarize([ft for status, _, ft in results if status == 200 and ft is not None])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark: ingest, retrieval and /api/chat load.")
+    parser.add_argument("--rows", type=int, default=5000, help="Synthetic CSV rows to ingest.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", default=None, help="Where the CSV, index and feedback DB go (default: a temp dir).")
+    parser.add_argument("--db-dir", default=None, help="Index to benchmark (default: <work-dir>/chroma_db).")
+    parser.add_argument("--skip-ingest", action="store_true", help="Reuse an existing --db-dir.")
+    parser.add_argument("--workers", type=int, default=1, help="Embedding processes during ingest.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--rows-per-chunk", type=int, default=2000)
+    parser.add_argument("--no-aggregate", action="store_true",
+                        help="Index one document per CSV row (the pre-aggregation layout) for comparison.")
+    parser.add_argument("--dedup-threshold", type=float, default=0.9, help="Near-duplicate threshold (0 = off).")
+    parser.add_argument("--queries", type=int, default=50, help="Single-query retrieval samples.")
+    parser.add_argument("--requests", type=int, default=200, help="Chat requests in the load test.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--stream", action="store_true", help="Load /api/chat/stream instead of /api/chat.")
+    parser.add_argument("--answer-cache", action="store_true", help="Leave the answer cache on (off by default).")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="Stub LLM time to first token.")
+    parser.add_argument("--tokens-per-s", type=float, default=50.0, help="Stub LLM generation speed.")
+    parser.add_argument("--tokens", type=int, default=64, help="Stub LLM tokens per answer.")
+    parser.add_argument("--web-delay-ms", type=float, default=100.0, help="Stub web search latency.")
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--out", default=None, help="Also write the JSON report here.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="rag-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+    db_dir = args.db_dir or os.path.join(work_dir, "chroma_db")
+
+    # Everything the engine reads at import/construction time; nothing may reach the network
+    os.environ.setdefault("HUGGINGFACE_API_TOKEN", "stub")
+    os.environ.setdefault("CHROMA_DB_GDRIVE_URL", "unused")
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ["CHROMA_DB_DIR"] = db_dir
+    os.environ["WEB_SEARCH_PROVIDER"] = "stub"
+    os.environ["FEEDBACK_DB"] = os.path.join(work_dir, "feedback.db")
+    if not args.answer_cache:
+        os.environ["ANSWER_CACHE_MAX_BYTES"] = "0"
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("work_dir", "db_dir", "out")},
+        "ingest": None,
+    }
+
+    if not args.skip_ingest:
+        csv_path = os.path.join(work_dir, "synthetic_menu.csv")
+        write_csv(csv_path, args.rows, args.seed)
+        report["ingest"] = bench_ingest(csv_path, db_dir, args)
+    elif not os.path.exists(db_dir):
+        parser.error(f"--skip-ingest needs an existing index at {db_dir}")
+
+    llm = StubLLM(args.llm_latency_ms, args.tokens_per_s, args.tokens)
+    engine = configure_engine(llm, args.web_delay_ms)
+
+    import uvicorn
+
+    from app import app
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    server_thread = threading.Thread(target=server.run, name="bench-server", daemon=True)
+    server_thread.start()
+    try:
+        report["startup"] = wait_ready(engine, args.startup_timeout)
+        report["retrieval"] = bench_retrieval(engine, sample_queries(args.queries, args.seed + 1))
+
+        load_queries = sample_queries(args.requests, args.seed + 2)
+        base_url = f"http://127.0.0.1:{port}"
+        for query in load_queries[:3]:  # connection setup and first-request costs
+            post_chat(base_url + "/api/chat", query, False, args.request_timeout)
+        report["chat"] = bench_chat(base_url, load_queries, args.concurrency, args.stream, args.request_timeout)
+        report["llm_calls"] = llm.calls
+        report["cache"] = engine.stats()
+    finally:
+        server.should_exit = True
+        server_thread.join(timeout=30)
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
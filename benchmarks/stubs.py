@@ -0,0 +1,67 @@
+"""
+Offline stand-ins for the network services the chat pipeline calls, so
+benchmarks measure this code rather than the HF endpoint or DuckDuckGo.
+"""
+import threading
+import time
+
+from model_registry import DEFAULT_MODEL_ID, ModelRegistry
+from web_search import StubProvider
+
+STUB_WORDS = (
+    "Based on the local menu data, you can find this dish at several restaurants nearby. "
+    "Prices range from about ten to twenty dollars and most places are rated above four stars."
+).split()
+
+
+class StubLLM:
+    """
+    Mimics InferenceClient.text_generation: waits `latency_ms` (time to first
+    token), then produces up to `max_new_tokens` (capped at `tokens`) words at
+    `tokens_per_s`, returned whole or yielded one by one with stream=True.
+    """
+
+    def __init__(self, latency_ms: float = 200.0, tokens_per_s: float = 50.0, tokens: int = 64):
+        self.latency = latency_ms / 1000
+        self.tokens_per_s = tokens_per_s
+        self.tokens = tokens
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _tokens(self, max_new_tokens: int):
+        for i in range(min(self.tokens, max_new_tokens)):
+            yield STUB_WORDS[i % len(STUB_WORDS)] + " "
+
+    def _stream(self, count: int):
+        time.sleep(self.latency)
+        for token in self._tokens(count):
+            if self.tokens_per_s:
+                time.sleep(1 / self.tokens_per_s)
+            yield token
+
+    def text_generation(self, prompt: str, stream: bool = False, max_new_tokens: int = 512, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if stream:
+            return self._stream(max_new_tokens)
+        return "".join(self._stream(max_new_tokens))
+
+
+class StubModelRegistry(ModelRegistry):
+    """ModelRegistry whose clients are a shared StubLLM and whose Hub checks always pass."""
+
+    def __init__(self, llm: StubLLM):
+        super().__init__(token="stub")
+        self.llm = llm
+
+    def get(self, model_id: str = DEFAULT_MODEL_ID):
+        return self.llm
+
+    def health_check(self, model_id: str = DEFAULT_MODEL_ID) -> bool:
+        self._status[model_id] = {"ok": True, "checked_at": time.time(), "error": None}
+        return True
+
+
+def stub_web_provider(delay_ms: float = 100.0) -> StubProvider:
+    """The web_search stub provider with a fixed per-lookup delay."""
+    return StubProvider(delay=delay_ms / 1000)
@@ -0,0 +1,135 @@
+"""
+Synthetic menu CSV with the columns ingest_pdfs.py reads, for benchmarks
+that must run without the real dataset. Output is deterministic per seed.
+
+    python benchmarks/synthetic_menu.py --rows 20000 --out /tmp/menu.csv
+"""
+import argparse
+import csv
+import random
+
+COLUMNS = [
+    "restaurant_name", "menu_category", "city", "state", "rating", "price",
+    "menu_item", "menu_description", "ingredient_name",
+]
+
+LOCATIONS = [
+    ("New York", "NY"), ("Brooklyn", "NY"), ("Los Angeles", "CA"), ("San Francisco", "CA"),
+    ("San Diego", "CA"), ("Chicago", "IL"), ("Houston", "TX"), ("Austin", "TX"), ("Dallas", "TX"),
+    ("Miami", "FL"), ("Orlando", "FL"), ("Seattle", "WA"), ("Portland", "OR"), ("Denver", "CO"),
+    ("Boston", "MA"), ("Atlanta", "GA"), ("Phoenix", "AZ"), ("Philadelphia", "PA"),
+    ("Nashville", "TN"), ("Minneapolis", "MN"),
+]
+CUISINES = {
+    "Pizza": ["Margherita Pizza", "Pepperoni Pizza", "Vegan Pizza", "Hawaiian Pizza", "White Pizza"],
+    "Thai": ["Pad Thai", "Green Curry", "Tom Yum Soup", "Pad See Ew", "Mango Sticky Rice"],
+    "Mexican": ["Carne Asada Tacos", "Chicken Burrito", "Veggie Quesadilla", "Elote", "Churros"],
+    "Japanese": ["Salmon Nigiri", "Spicy Tuna Roll", "Tonkotsu Ramen", "Chicken Katsu", "Miso Soup"],
+    "American": ["Cheeseburger", "Buffalo Wings", "Mac and Cheese", "Club Sandwich", "Apple Pie"],
+    "Italian": ["Spaghetti Carbonara", "Lasagna", "Fettuccine Alfredo", "Tiramisu", "Risotto"],
+    "Indian": ["Chicken Tikka Masala", "Palak Paneer", "Lamb Vindaloo", "Garlic Naan", "Samosa"],
+}
+INGREDIENTS = [
+    "tomato", "mozzarella", "basil", "garlic", "onion", "chicken", "beef", "pork", "shrimp", "tofu",
+    "rice noodles", "peanuts", "lime", "cilantro", "jalapeno", "avocado", "black beans", "corn",
+    "salmon", "tuna", "nori", "soy sauce", "ginger", "scallion", "cheddar", "bacon", "lettuce",
+    "pickles", "parmesan", "egg", "cream", "spinach", "paneer", "cumin", "coconut milk", "mango",
+]
+ADJECTIVES = ["Golden", "Little", "Blue", "Happy", "Urban", "Old Town", "Lucky", "Green", "Royal", "Corner"]
+NOUNS = ["Kitchen", "Bistro", "Grill", "House", "Cafe", "Table", "Diner", "Garden", "Eatery", "Spot"]
+PRICE_TIERS = ["$", "$$", "$$$"]
+
+
+def generate_rows(rows: int, seed: int = 0, restaurants: int = None):
+    """
+    Yield `rows` dicts in the cleaned_menu.csv layout: one row per ingredient,
+    so each menu item spans 2-4 consecutive rows. Each restaurant has one
+    cuisine, a location and ~25 rows; some items are listed twice.
+    """
+    rng = random.Random(seed)
+    restaurants = restaurants or max(1, rows // 25)
+    profiles = []
+    for i in range(restaurants):
+        cuisine = rng.choice(list(CUISINES))
+        city, state = rng.choice(LOCATIONS)
+        profiles.append({
+            "restaurant_name": f"{rng.choice(ADJECTIVES)} {cuisine} {rng.choice(NOUNS)} #{i}",
+            "menu_category": cuisine,
+            "city": city,
+            "state": state,
+            "rating": round(rng.uniform(2.5, 5.0), 1),
+            "tier": rng.random() < 0.3,
+        })
+
+    n = 0
+    item_index = 0
+    while n < rows:
+        profile = profiles[item_index % restaurants]
+        item_index += 1
+        if profile.get("last_item") and rng.random() < 0.05:
+            item, ingredients, price = profile["last_item"]  # listed again further down the menu
+        else:
+            item = rng.choice(CUISINES[profile["menu_category"]])
+            ingredients = rng.sample(INGREDIENTS, rng.randint(2, 4))
+            price = rng.choice(PRICE_TIERS) if profile["tier"] else f"{rng.uniform(4, 45):.2f}"
+            profile["last_item"] = (item, ingredients, price)
+        for ingredient in ingredients[: rows - n]:
+            yield {
+                "restaurant_name": profile["restaurant_name"],
+                "menu_category": profile["menu_category"],
+                "city": profile["city"],
+                "state": profile["state"],
+                "rating": profile["rating"],
+                "price": price,
+                "menu_item": item,
+                "menu_description": f"{item} made with {', '.join(ingredients[:-1])} and {ingredients[-1]}.",
+                "ingredient_name": ingredient,
+            }
+            n += 1
+
+
+def write_csv(path: str, rows: int, seed: int = 0) -> int:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        count = 0
+        for row in generate_rows(rows, seed):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def sample_queries(count: int, seed: int = 0) -> list:
+    """Questions that hit the synthetic data (items, cities, prices), mixed with a few off-topic ones."""
+    rng = random.Random(seed)
+    templates = [
+        "Where can I find {item}?",
+        "{item} in {city}",
+        "cheap {cuisine} food in {city}",
+        "{cuisine} under $20",
+        "highly rated {cuisine} restaurants",
+        "dishes with {ingredient}",
+        "how do I make {item} at home?",
+    ]
+    queries = []
+    for i in range(count):
+        cuisine = rng.choice(list(CUISINES))
+        city, _ = rng.choice(LOCATIONS)
+        queries.append(templates[i % len(templates)].format(
+            item=rng.choice(CUISINES[cuisine]), cuisine=cuisine, city=city, ingredient=rng.choice(INGREDIENTS),
+        ))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic menu CSV in the cleaned_menu.csv layout.")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="synthetic_menu.csv")
+    args = parser.parse_args()
+    count = write_csv(args.out, args.rows, args.seed)
+    print(f"✅ Wrote {count:,} rows to `{args.out}`")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+
+class ChatOverloaded(Exception):
+    """Raised when the chat queue is full and the request should be shed."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Chat service is overloaded, please retry shortly.")
+        self.retry_after = retry_after
+
+
+@dataclass
+class ChatTiming:
+    """Time a request spent waiting for a worker vs. running on one (ms)."""
+    queue_wait_ms: float
+    service_ms: float
+
+    def server_timing(self) -> str:
+        return f"queue;dur={self.queue_wait_ms:.1f}, service;dur={self.service_ms:.1f}"
+
+
+class _StreamFailure:
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+_STREAM_END = object()
+
+
+class ChatExecutor:
+    """
+    Runs the blocking RAG pipeline on a bounded thread pool so the event loop
+    stays free for other requests. At most `max_workers` requests run at once
+    and at most `max_queue` more may wait; anything beyond that is rejected
+    with ChatOverloaded instead of piling up behind the running requests.
+    """
+
+    def __init__(self, max_workers: int = None, max_queue: int = None, retry_after: int = None):
+        self.max_workers = max_workers or int(os.getenv("CHAT_MAX_WORKERS", "4"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("CHAT_MAX_QUEUE", "16"))
+        self.retry_after = retry_after or int(os.getenv("CHAT_RETRY_AFTER", "2"))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="chat")
+        self._lock = threading.Lock()
+        self._running = 0
+        self._queued = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._running
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    def _admit(self):
+        with self._lock:
+            if self._running + self._queued >= self.max_workers + self.max_queue:
+                logging.warning(
+                    f"Shedding chat request: {self._running} running, {self._queued} queued"
+                )
+                raise ChatOverloaded(self.retry_after)
+            self._queued += 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool. Returns (result, ChatTiming)."""
+        self._admit()
+        submitted = time.perf_counter()
+        marks = {}
+
+        def task():
+            marks["started"] = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                marks["finished"] = time.perf_counter()
+
+        try:
+            future = self._pool.submit(task)
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            raise
+        try:
+            result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Client went away before a worker picked the request up.
+            if future.cancelled():
+                with self._lock:
+                    self._queued -= 1
+            raise
+        timing = ChatTiming(
+            queue_wait_ms=(marks["started"] - submitted) * 1000,
+            service_ms=(marks["finished"] - marks["started"]) * 1000,
+        )
+        return result, timing
+
+    def stream(self, gen_fn, *args, on_timing=None, **kwargs):
+        """
+        Start iterating the blocking generator gen_fn(*args, **kwargs) on the
+        pool and return an async iterator over its items. Admission happens
+        here, before the caller commits to a streaming response, so an
+        overloaded server can still answer 503. The worker slot is held until
+        the generator is exhausted or the consumer stops reading.
+        """
+        self._admit()
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stopped = threading.Event()
+        submitted = time.perf_counter()
+        marks = {}
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                stopped.set()  # event loop is gone
+
+        def task():
+            marks["started"] = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+            try:
+                for item in gen_fn(*args, **kwargs):
+                    if stopped.is_set():
+                        break
+                    put(item)
+            except Exception as e:
+                put(_StreamFailure(e))
+            finally:
+                with self._lock:
+                    self._running -= 1
+                marks["finished"] = time.perf_counter()
+                put(_STREAM_END)
+
+        try:
+            future = self._pool.submit(task)
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            raise
+
+        async def consume():
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is _STREAM_END:
+                        break
+                    if isinstance(item, _StreamFailure):
+                        raise item.error
+                    yield item
+                if on_timing is not None:
+                    on_timing(ChatTiming(
+                        queue_wait_ms=(marks["started"] - submitted) * 1000,
+                        service_ms=(marks["finished"] - marks["started"]) * 1000,
+                    ))
+            finally:
+                stopped.set()
+                if future.cancel():
+                    with self._lock:
+                        self._queued -= 1
+
+        return consume()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
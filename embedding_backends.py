@@ -0,0 +1,179 @@
+import argparse
+import logging
+import os
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+ONNX_MODEL_DIR = os.getenv(
+    "ONNX_MODEL_DIR", os.path.join(os.path.dirname(__file__), "onnx_models", "all-mpnet-base-v2")
+)
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def build_embeddings(backend: str = None, device: str = None) -> Embeddings:
+    """
+    Build the all-mpnet-base-v2 embedder for the selected backend
+    (EMBEDDING_BACKEND: torch | onnx | onnx-int8). Ingest and query must use
+    the same backend so stored and query vectors live in the same space.
+    torch is only imported for the torch backend.
+    """
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "torch")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}; expected one of {BACKENDS}.")
+
+    if backend == "torch":
+        import torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        logging.info(f"Embedding backend: torch on {device}")
+        return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL, model_kwargs={'device': device})
+
+    logging.info(f"Embedding backend: {backend} from {ONNX_MODEL_DIR}")
+    return OnnxEmbeddings(ONNX_MODEL_DIR, quantized=backend == "onnx-int8")
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    all-mpnet-base-v2 on ONNX Runtime: tokenizers for tokenization, then mean
+    pooling and L2 normalization, matching the sentence-transformers pipeline.
+    Expects a directory produced by `python embedding_backends.py export`.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, batch_size: int = 32,
+                 max_seq_length: int = 384, threads: int = None):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("The onnx embedding backends need `onnxruntime` and `tokenizers`.") from e
+
+        model_file = os.path.join(model_dir, "model_quantized.onnx" if quantized else "model.onnx")
+        if not os.path.exists(model_file):
+            raise FileNotFoundError(
+                f"{model_file} not found. Run `python embedding_backends.py export` first."
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = threads or int(os.getenv("ONNX_THREADS", "0"))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[i : i + self.batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.append(pooled)
+        return np.concatenate(vectors) if vectors else np.zeros((0, 768), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+
+def export_onnx(out_dir: str = ONNX_MODEL_DIR, quantize: bool = True):
+    """
+    One-off export of all-mpnet-base-v2 to ONNX (needs `optimum[onnxruntime]`
+    and torch on the machine doing the export, not on the serving hosts).
+    Writes model.onnx, tokenizer.json and, with quantize, model_quantized.onnx
+    with dynamic int8 weights.
+    """
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoTokenizer
+
+    print(f"\n📦 Exporting {EMBEDDING_MODEL} to ONNX at {out_dir}...")
+    model = ORTModelForFeatureExtraction.from_pretrained(EMBEDDING_MODEL, export=True)
+    model.save_pretrained(out_dir)
+    AutoTokenizer.from_pretrained(EMBEDDING_MODEL).save_pretrained(out_dir)
+
+    if quantize:
+        print("🔢 Quantizing weights to int8...")
+        quantize_dynamic(
+            os.path.join(out_dir, "model.onnx"),
+            os.path.join(out_dir, "model_quantized.onnx"),
+            weight_type=QuantType.QInt8,
+        )
+    print(f"✅ ONNX export written to `{out_dir}`\n")
+
+
+def parity_check(csv_path: str, backend: str = "onnx-int8", sample: int = 200, min_cosine: float = 0.99) -> dict:
+    """
+    Embed a random sample of menu rows with torch and with `backend` and report
+    the cosine agreement between the two sets of vectors.
+    """
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    df = df.sample(n=min(sample, len(df)), random_state=0)
+    if "combined_text" in df.columns:
+        texts = df["combined_text"].astype(str).tolist()
+    else:
+        texts = df.astype(str).agg(" | ".join, axis=1).tolist()
+
+    reference = np.asarray(build_embeddings("torch", device="cpu").embed_documents(texts), dtype=np.float32)
+    candidate = np.asarray(build_embeddings(backend).embed_documents(texts), dtype=np.float32)
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate /= np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = (reference * candidate).sum(axis=1)
+
+    report = {
+        "backend": backend,
+        "rows": len(texts),
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        "passed": bool(cosines.min() >= min_cosine),
+    }
+    print(f"🔍 Parity {backend} vs torch on {report['rows']} rows: "
+          f"mean cosine {report['mean_cosine']:.5f}, min {report['min_cosine']:.5f} "
+          f"-> {'✅ pass' if report['passed'] else '❌ fail'} (threshold {min_cosine})")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend tooling.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="Export all-mpnet-base-v2 to ONNX (+ int8).")
+    export.add_argument("--out", default=ONNX_MODEL_DIR)
+    export.add_argument("--no-quantize", action="store_true")
+
+    parity = sub.add_parser("parity", help="Compare an ONNX backend against torch vectors.")
+    parity.add_argument("--csv", default=os.path.join(os.path.dirname(__file__), "data", "cleaned_menu.csv"))
+    parity.add_argument("--backend", default="onnx-int8", choices=["onnx", "onnx-int8"])
+    parity.add_argument("--sample", type=int, default=200)
+    parity.add_argument("--min-cosine", type=float, default=0.99)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export_onnx(args.out, quantize=not args.no_quantize)
+    else:
+        report = parity_check(args.csv, args.backend, args.sample, args.min_cosine)
+        raise SystemExit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
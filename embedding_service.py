@@ -0,0 +1,118 @@
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+class EmbeddingService(Embeddings):
+    """
+    Query-side wrapper around an Embeddings model.
+
+    embed_query() results are kept in an LRU keyed by a hash of the text, and
+    cache misses from concurrent requests are coalesced: the first miss opens a
+    batch window of `batch_window_ms`, every miss arriving inside it joins the
+    batch, and the whole batch goes through one embed_documents() call on a
+    background thread. Identical texts already waiting in a batch share its
+    result. embed_documents() is passed straight through, so bulk callers such
+    as ingestion don't churn the query cache.
+    """
+
+    def __init__(self, base: Embeddings, cache_size: int = None, batch_window_ms: float = None,
+                 max_batch_size: int = None):
+        self.base = base
+        self.cache_size = cache_size if cache_size is not None else int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+        self.batch_window = (batch_window_ms if batch_window_ms is not None
+                             else float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))) / 1000
+        self.max_batch_size = max_batch_size or int(os.getenv("EMBED_MAX_BATCH", "32"))
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.batched_texts = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+            future = self._pending.get(key)
+            if future is None:
+                future = Future()
+                self._pending[key] = future
+                self._queue.put((key, text))
+                self._ensure_worker()
+        return future.result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "cache_entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "batches": self.batches,
+                "avg_batch_size": self.batched_texts / self.batches if self.batches else 0.0,
+            }
+
+    def _ensure_worker(self):
+        """Start the batching thread on first use. Lock held."""
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._embed_batch(batch)
+
+    def _embed_batch(self, batch):
+        keys = [key for key, _ in batch]
+        try:
+            vectors = self.base.embed_documents([text for _, text in batch])
+        except Exception as e:
+            logging.error(f"Embedding batch of {len(batch)} failed: {e}")
+            with self._lock:
+                futures = [self._pending.pop(key) for key in keys]
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.batched_texts += len(batch)
+            futures = []
+            for key, vector in zip(keys, vectors):
+                futures.append(self._pending.pop(key))
+                if self.cache_size > 0:
+                    self._cache[key] = vector
+                    self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        for future, vector in zip(futures, vectors):
+            future.set_result(vector)
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    query TEXT NOT NULL,
+    response TEXT NOT NULL,
+    feedback TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS feedback_query ON feedback (query);
+CREATE TABLE IF NOT EXISTS migrations (
+    source TEXT PRIMARY KEY,
+    records INTEGER NOT NULL,
+    migrated_at REAL NOT NULL
+);
+"""
+
+_STOP = object()
+
+
+def normalize_feedback(value) -> str:
+    """'good'/'GOOD' -> 'Good', 'bad' -> 'Bad'; the React and Gradio UIs differ in case."""
+    value = str(value).strip()
+    return value.capitalize() if value.lower() in ("good", "bad") else value
+
+
+class FeedbackStore:
+    """
+    Append-only feedback log in SQLite (WAL mode, so readers never block the
+    writer and several worker processes can share the file).
+
+    add() only enqueues the record; a background thread inserts queued records
+    in one transaction every `flush_every` records or `flush_interval_ms`
+    milliseconds, whichever comes first. Each write is O(batch) instead of
+    rewriting the whole history like the old feedback.json did.
+    """
+
+    def __init__(self, path: str = None, flush_every: int = None, flush_interval_ms: float = None):
+        self.path = path or os.getenv("FEEDBACK_DB", "feedback.db")
+        self.flush_every = flush_every or int(os.getenv("FEEDBACK_FLUSH_EVERY", "50"))
+        self.flush_interval = (flush_interval_ms or float(os.getenv("FEEDBACK_FLUSH_MS", "200"))) / 1000
+        self._queue = queue.Queue()
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+        self._writer = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # -------------------------
+    # Writes
+    # -------------------------
+    def add(self, query: str, response: str, feedback: str):
+        """Queue one Good/Bad record for the background writer."""
+        self._queue.put((time.time(), query, response, normalize_feedback(feedback)))
+
+    def flush(self, timeout: float = 5.0):
+        """Block until everything queued so far has been written."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._writer.join(timeout=5)
+
+    def _run(self):
+        conn = self._connect()
+        pending, waiters = [], []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, tuple):
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+
+            if item is _STOP or waiters or len(pending) >= self.flush_every or (
+                deadline is not None and time.monotonic() >= deadline
+            ):
+                self._write(conn, pending)
+                pending, deadline = [], None
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+            if item is _STOP:
+                conn.close()
+                return
+
+    def _write(self, conn: sqlite3.Connection, records):
+        if not records:
+            return
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO feedback (created_at, query, response, feedback) VALUES (?, ?, ?, ?)",
+                    records,
+                )
+            logging.info(f"Feedback saved: {len(records)} record(s)")
+        except sqlite3.Error as e:
+            logging.error(f"Failed to save {len(records)} feedback record(s): {e}")
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def rates_by_query(self, limit: int = 100, min_votes: int = 1) -> list:
+        """Good/Bad counts and Good rate per query, most-voted first."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                """
+                SELECT query,
+                       SUM(feedback = 'Good') AS good,
+                       SUM(feedback = 'Bad') AS bad,
+                       COUNT(*) AS total
+                FROM feedback
+                GROUP BY query
+                HAVING COUNT(*) >= ?
+                ORDER BY total DESC, query
+                LIMIT ?
+                """,
+                (min_votes, limit),
+            ).fetchall()
+        return [
+            {"query": q, "good": good, "bad": bad, "total": total, "good_rate": good / total}
+            for q, good, bad, total in rows
+        ]
+
+    def summary(self) -> dict:
+        """Overall Good/Bad counts."""
+        with closing(self._connect()) as conn:
+            good, bad, total = conn.execute(
+                "SELECT COALESCE(SUM(feedback = 'Good'), 0), COALESCE(SUM(feedback = 'Bad'), 0), COUNT(*) FROM feedback"
+            ).fetchone()
+        return {"good": good, "bad": bad, "total": total, "good_rate": good / total if total else 0.0}
+
+    # -------------------------
+    # Migration
+    # -------------------------
+    def migrate_json(self, json_path: str) -> int:
+        """
+        Import the entries appended to the legacy feedback.json array since the
+        last call. The number of entries already read is recorded per file, so
+        calling this again (or from another worker) only inserts new ones.
+        Returns the number of records imported.
+        """
+        if not os.path.exists(json_path):
+            return 0
+        with open(json_path, "rb") as f:
+            raw = f.read()
+        source = os.path.basename(json_path)
+        entries = json.loads(raw or b"[]")
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            imported = self._imported_entries(conn, source, entries, hashlib.sha256(raw).hexdigest())
+            if imported > len(entries):
+                logging.warning(
+                    f"{json_path} has {len(entries)} entries but {imported} were already imported; "
+                    "only entries appended from now on will be imported"
+                )
+                imported = len(entries)
+            # Records without a rating carry no signal and are skipped
+            records = [r for r in entries[imported:] if r.get("feedback")]
+            mtime = os.path.getmtime(json_path)
+            conn.executemany(
+                "INSERT INTO feedback (created_at, query, response, feedback) VALUES (?, ?, ?, ?)",
+                [(mtime, r.get("query") or "", r.get("response") or "", normalize_feedback(r["feedback"]))
+                 for r in records],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO migrations (source, records, migrated_at) VALUES (?, ?, ?)",
+                (source, len(entries), time.time()),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        if records:
+            logging.info(f"Migrated {len(records)} feedback records from {json_path}")
+        return len(records)
+
+    @staticmethod
+    def _imported_entries(conn: sqlite3.Connection, source: str, entries: list, digest: str) -> int:
+        """
+        Array entries of `source` imported so far. Earlier versions recorded one
+        "<file name>:<sha256>" row per import with the number of rated records
+        inserted, so those are translated into an entry count.
+        """
+        row = conn.execute("SELECT records FROM migrations WHERE source = ?", (source,)).fetchone()
+        if row:
+            return row[0]
+        legacy = conn.execute(
+            "SELECT source, records FROM migrations WHERE source LIKE ? ORDER BY records DESC",
+            (f"{source}:%",),
+        ).fetchall()
+        if not legacy:
+            return 0
+        if any(legacy_source == f"{source}:{digest}" for legacy_source, _ in legacy):
+            return len(entries)
+        # The file was only ever appended to: skip entries until the rated records
+        # the largest earlier import inserted are accounted for
+        rated = legacy[0][1]
+        for position, entry in enumerate(entries):
+            if rated == 0:
+                return position
+            if entry.get("feedback"):
+                rated -= 1
+        return len(entries)
@@ -0,0 +1,597 @@
+"""
+Versioned, content-addressed snapshots of the vector store (chroma_db/).
+
+A snapshot store is a plain directory, which can be served as is over HTTP:
+
+    LATEST                    {"version": ..., "sha256": <hash of the manifest>}
+    manifests/<version>.json  collections -> blocks, other files -> hashes
+    objects/<sha256>          blocks and files, named by the hash of their content
+
+Each Chroma collection (the single store, or every shard) is exported as
+blocks of records: ids, documents and metadatas as compressed JSON plus the
+vectors as float16. A record goes to one of the collection's `buckets` by a
+hash of its id, so re-ingesting changes only the blocks whose records
+changed, and a client on the previous version fetches just those. BM25
+indexes are rebuilt from the collection on the client; other files
+(shards.json, locations.json) are shipped as they are.
+
+    python index_snapshot.py publish --db-dir chroma_db --store snapshots/
+    python index_snapshot.py delta --store snapshots/ --base <version> --out delta/
+    python index_snapshot.py pull --source https://example.com/snapshots --dir index_snapshots/
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import struct
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from lexical_index import build_from_chroma
+from shard_router import LEXICAL_INDEX_DIR, release_chroma
+
+FORMAT_VERSION = 1
+BLOCK_MAGIC = b"RAGBLK1\x00"
+BLOCK_RECORDS = 4096  # target records per block when a collection is first bucketed
+LATEST_FILE = "LATEST"
+MANIFESTS_DIR = "manifests"
+OBJECTS_DIR = "objects"
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+SNAPSHOT_FILE = "snapshot.json"  # the manifest a materialized version was built from
+CHROMA_FILE = "chroma.sqlite3"
+# Chroma's HNSW segment directories are named by UUID
+SEGMENT_DIR = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+SKIP_FILES = ("ingest_checkpoint.json", ".tmp", ".part", ".DS_Store")
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def bucket_of(record_id: str, buckets: int) -> int:
+    return int(hashlib.sha1(record_id.encode("utf-8")).hexdigest()[:8], 16) % buckets
+
+
+def bucket_count(records: int, block_records: int = BLOCK_RECORDS) -> int:
+    """Smallest power of two that keeps blocks at about `block_records` records."""
+    buckets = 1
+    while buckets * block_records < records:
+        buckets *= 2
+    return buckets
+
+
+def encode_block(ids: List[str], documents: List[str], metadatas: List[dict], vectors) -> bytes:
+    """
+    Records as one block: magic, (count, dim, header length), zlib-compressed
+    JSON of ids/documents/metadatas, then count x dim little-endian float16.
+    Records are sorted by id, so equal content always gives an equal hash.
+    """
+    order = sorted(range(len(ids)), key=ids.__getitem__)
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)[order].astype("<f2")
+    header = zlib.compress(json.dumps({
+        "ids": [ids[i] for i in order],
+        "documents": [documents[i] for i in order],
+        "metadatas": [metadatas[i] for i in order],
+    }, sort_keys=True, separators=(",", ":")).encode("utf-8"), 6)
+    return BLOCK_MAGIC + struct.pack("<IIQ", len(ids), vectors.shape[1], len(header)) + header + vectors.tobytes()
+
+
+def decode_block(data: bytes) -> Tuple[List[str], List[str], List[dict], np.ndarray]:
+    """(ids, documents, metadatas, float32 vectors) from encode_block output."""
+    if not data.startswith(BLOCK_MAGIC):
+        raise ValueError("Not a snapshot block.")
+    offset = len(BLOCK_MAGIC)
+    count, dim, header_size = struct.unpack_from("<IIQ", data, offset)
+    offset += struct.calcsize("<IIQ")
+    header = json.loads(zlib.decompress(data[offset : offset + header_size]))
+    vectors = np.frombuffer(data, dtype="<f2", count=count * dim, offset=offset + header_size)
+    return header["ids"], header["documents"], header["metadatas"], vectors.reshape(count, dim).astype(np.float32)
+
+
+def manifest_objects(manifest: dict) -> Dict[str, int]:
+    """sha256 -> size of every object a manifest refers to."""
+    objects = {}
+    for collection in manifest["collections"].values():
+        for block in collection["blocks"].values():
+            objects[block["sha256"]] = block["size"]
+    for entry in manifest["files"].values():
+        objects[entry["sha256"]] = entry["size"]
+    return objects
+
+
+# -------------------------
+# Reading a vector store
+# -------------------------
+def open_vectordb(directory: str):
+    from langchain_chroma import Chroma
+
+    # Vectors come from the blocks, so no embedding function is needed
+    return Chroma(persist_directory=directory)
+
+
+def all_ids(collection, page_size: int = 10000) -> List[str]:
+    ids, offset = [], 0
+    while True:
+        page = collection.get(include=[], limit=page_size, offset=offset)["ids"]
+        ids.extend(page)
+        if len(page) < page_size:
+            return ids
+        offset += page_size
+
+
+def find_collections(db_dir: str) -> List[str]:
+    """Relative paths ("." for the root) of the Chroma collections under `db_dir`."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(db_dir):
+        dirnames[:] = sorted(d for d in dirnames if not SEGMENT_DIR.match(d) and d != LEXICAL_INDEX_DIR)
+        if CHROMA_FILE in filenames:
+            found.append(os.path.relpath(dirpath, db_dir).replace(os.sep, "/"))
+    return found
+
+
+def list_files(db_dir: str) -> List[str]:
+    """Files under `db_dir` other than Chroma's own, BM25 indexes and ingest leftovers."""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(db_dir):
+        dirnames[:] = sorted(d for d in dirnames if not SEGMENT_DIR.match(d) and d != LEXICAL_INDEX_DIR)
+        for name in sorted(filenames):
+            if name.startswith(CHROMA_FILE) or name.endswith(SKIP_FILES) or name == SNAPSHOT_FILE:
+                continue
+            files.append(os.path.relpath(os.path.join(dirpath, name), db_dir).replace(os.sep, "/"))
+    return files
+
+
+# -------------------------
+# Publishing
+# -------------------------
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def read_store_manifest(store_dir: str, version: str = None) -> Optional[dict]:
+    """A manifest from a local store (the LATEST one by default), or None if the store is empty."""
+    if version is None:
+        latest_path = os.path.join(store_dir, LATEST_FILE)
+        if not os.path.exists(latest_path):
+            return None
+        with open(latest_path) as f:
+            version = json.load(f)["version"]
+    with open(os.path.join(store_dir, MANIFESTS_DIR, f"{version}.json")) as f:
+        return json.load(f)
+
+
+def publish(db_dir: str, store_dir: str, base_version: str = None, block_records: int = BLOCK_RECORDS) -> dict:
+    """
+    Write a snapshot of `db_dir` into `store_dir` and point LATEST at it.
+    Only objects the store doesn't have yet are written. Bucket counts are
+    kept from the base version (LATEST by default) so unchanged records land
+    in unchanged blocks; a collection that grew past 4x its target block
+    size is re-bucketed, which makes all its blocks new once.
+    """
+    base = read_store_manifest(store_dir, base_version)
+    version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    if base is not None and version <= base["version"]:
+        version = f"{base['version']}.1"
+    manifest = {
+        "format": FORMAT_VERSION,
+        "version": version,
+        "parent": base["version"] if base else None,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "vector_dtype": "float16",
+        "collections": {},
+        "files": {},
+    }
+    totals = {"new_objects": 0, "new_bytes": 0, "reused_objects": 0, "reused_bytes": 0}
+
+    def put(data: bytes) -> dict:
+        digest = sha256_bytes(data)
+        path = os.path.join(store_dir, OBJECTS_DIR, digest)
+        if os.path.exists(path):
+            totals["reused_objects"] += 1
+            totals["reused_bytes"] += len(data)
+        else:
+            _write_atomic(path, data)
+            totals["new_objects"] += 1
+            totals["new_bytes"] += len(data)
+        return {"sha256": digest, "size": len(data)}
+
+    for rel in find_collections(db_dir):
+        collection = open_vectordb(os.path.join(db_dir, rel))._collection
+        ids = all_ids(collection)
+        previous = (base or {}).get("collections", {}).get(rel)
+        buckets = previous["buckets"] if previous else bucket_count(len(ids), block_records)
+        if len(ids) > buckets * block_records * 4:
+            buckets = bucket_count(len(ids), block_records)
+            print(f"⚠️ `{rel}` outgrew its blocks; re-bucketing into {buckets} (all blocks change once).")
+
+        by_bucket = defaultdict(list)
+        for record_id in ids:
+            by_bucket[bucket_of(record_id, buckets)].append(record_id)
+        blocks, dim = {}, None
+        for bucket in sorted(by_bucket):
+            page = collection.get(ids=by_bucket[bucket], include=["embeddings", "documents", "metadatas"])
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            dim = vectors.shape[1]
+            data = encode_block(page["ids"], page["documents"], page["metadatas"], vectors)
+            blocks[str(bucket)] = {**put(data), "records": len(page["ids"])}
+        manifest["collections"][rel] = {"records": len(ids), "dim": dim, "buckets": buckets, "blocks": blocks}
+        print(f"📦 Collection `{rel}`: {len(ids):,} records in {len(blocks):,} blocks")
+
+    for rel in list_files(db_dir):
+        with open(os.path.join(db_dir, *rel.split("/")), "rb") as f:
+            manifest["files"][rel] = put(f.read())
+
+    manifest_bytes = json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8")
+    _write_atomic(os.path.join(store_dir, MANIFESTS_DIR, f"{version}.json"), manifest_bytes)
+    # LATEST last: a reader never sees a manifest whose objects aren't all there
+    _write_atomic(
+        os.path.join(store_dir, LATEST_FILE),
+        json.dumps({"version": version, "sha256": sha256_bytes(manifest_bytes)}).encode("utf-8"),
+    )
+    print(f"✅ Published snapshot `{version}` to `{store_dir}`: {totals['new_objects']:,} new objects "
+          f"({totals['new_bytes'] / 1e6:.1f} MB), {totals['reused_objects']:,} unchanged "
+          f"({totals['reused_bytes'] / 1e6:.1f} MB)")
+    return manifest
+
+
+def write_delta(store_dir: str, out_dir: str, base_version: str, version: str = None) -> dict:
+    """
+    Copy what a store that already has `base_version` needs to serve
+    `version` (LATEST by default) into `out_dir`, in the store layout:
+    the new objects, the manifest and LATEST. Upload it over the remote store.
+    """
+    target = read_store_manifest(store_dir, version)
+    if target is None:
+        raise ValueError(f"No snapshot in {store_dir}.")
+    base = read_store_manifest(store_dir, base_version)
+    base_objects = manifest_objects(base)
+    new = {sha: size for sha, size in manifest_objects(target).items() if sha not in base_objects}
+
+    for sha in new:
+        dest = os.path.join(out_dir, OBJECTS_DIR, sha)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copy2(os.path.join(store_dir, OBJECTS_DIR, sha), dest)
+    manifest_name = f"{target['version']}.json"
+    os.makedirs(os.path.join(out_dir, MANIFESTS_DIR), exist_ok=True)
+    shutil.copy2(os.path.join(store_dir, MANIFESTS_DIR, manifest_name), os.path.join(out_dir, MANIFESTS_DIR, manifest_name))
+    with open(os.path.join(store_dir, MANIFESTS_DIR, manifest_name), "rb") as f:
+        latest = {"version": target["version"], "sha256": sha256_bytes(f.read())}
+    _write_atomic(os.path.join(out_dir, LATEST_FILE), json.dumps(latest).encode("utf-8"))
+
+    full = sum(manifest_objects(target).values())
+    delta_bytes = sum(new.values())
+    print(f"✅ Delta `{base['version']}` -> `{target['version']}` in `{out_dir}`: {len(new):,} objects, "
+          f"{delta_bytes / 1e6:.1f} MB of {full / 1e6:.1f} MB")
+    return {"objects": len(new), "bytes": delta_bytes, "full_bytes": full}
+
+
+# -------------------------
+# Sources
+# -------------------------
+class SnapshotSource:
+    """Read access to a snapshot store; objects are checked against their hash."""
+
+    name = "source"
+
+    def read(self, path: str) -> bytes:
+        raise NotImplementedError
+
+    def latest(self) -> dict:
+        return json.loads(self.read(LATEST_FILE))
+
+    def manifest(self, latest: dict) -> dict:
+        data = self.read(f"{MANIFESTS_DIR}/{latest['version']}.json")
+        if sha256_bytes(data) != latest["sha256"]:
+            raise ValueError(f"Manifest {latest['version']} does not match the hash in {LATEST_FILE}.")
+        manifest = json.loads(data)
+        if manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {manifest.get('format')} in {latest['version']}")
+        return manifest
+
+    def object(self, sha256: str) -> bytes:
+        data = self.read(f"{OBJECTS_DIR}/{sha256}")
+        actual = sha256_bytes(data)
+        if actual != sha256:
+            raise ValueError(f"Checksum mismatch for object {sha256}: got {actual}")
+        return data
+
+
+class LocalSource(SnapshotSource):
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def read(self, path: str) -> bytes:
+        with open(os.path.join(self.root, *path.split("/")), "rb") as f:
+            return f.read()
+
+    def __repr__(self):
+        return f"LocalSource({self.root!r})"
+
+
+class HttpSource(SnapshotSource):
+    """A store served over HTTP(S), e.g. a bucket or a Hugging Face dataset repo."""
+
+    name = "http"
+
+    def __init__(self, base_url: str, timeout: float = 60.0, token: str = None, retries: int = 2):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.retries = retries
+
+    def read(self, path: str) -> bytes:
+        request = urllib.request.Request(f"{self.base_url}/{path}", headers=self.headers)
+        for attempt in range(self.retries + 1):
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return response.read()
+            except urllib.error.HTTPError:
+                raise
+            except (urllib.error.URLError, OSError) as e:
+                if attempt == self.retries:
+                    raise
+                logging.warning(f"Snapshot fetch {path} failed ({e}); retrying...")
+                time.sleep(2 ** attempt)
+
+    def __repr__(self):
+        return f"HttpSource({self.base_url!r})"
+
+
+def open_source(url: str) -> SnapshotSource:
+    """HttpSource for http(s) URLs (INDEX_SNAPSHOT_TOKEN as bearer token), else a local directory."""
+    if url.startswith(("http://", "https://")):
+        return HttpSource(
+            url,
+            timeout=float(os.getenv("INDEX_SNAPSHOT_TIMEOUT", "60")),
+            token=os.getenv("INDEX_SNAPSHOT_TOKEN"),
+        )
+    return LocalSource(url[len("file://"):] if url.startswith("file://") else url)
+
+
+# -------------------------
+# Client side
+# -------------------------
+def _copy_collection(src: str, dst: str):
+    """Copy one collection's own files (not nested shards or shipped files)."""
+    os.makedirs(dst, exist_ok=True)
+    for name in os.listdir(src):
+        path = os.path.join(src, name)
+        if name.startswith(CHROMA_FILE) or name == LEXICAL_INDEX_DIR or SEGMENT_DIR.match(name):
+            if os.path.isdir(path):
+                shutil.copytree(path, os.path.join(dst, name))
+            else:
+                shutil.copy2(path, os.path.join(dst, name))
+
+
+class SnapshotSync:
+    """
+    Local copy of the latest snapshot from `source`, under `root_dir`:
+
+        CURRENT              name of the version in use
+        versions/<version>/  a ready-to-open chroma_db, with snapshot.json
+
+    update() builds the next version beside the current one: unchanged
+    collections are copied, changed ones get only their changed blocks
+    fetched (stale records deleted by bucket, new ones upserted) and their
+    BM25 index rebuilt. Record counts are checked against the manifest
+    before CURRENT is replaced, so a failed or partial update never becomes
+    the version in use. Versions beyond the `keep` newest are removed unless
+    they are CURRENT or still held open (acquire/release) by a reader.
+    """
+
+    def __init__(self, source: SnapshotSource, root_dir: str, keep: int = 2):
+        self.source = source
+        self.root_dir = root_dir
+        self.keep = max(2, keep)
+        self._lock = threading.Lock()
+        self._held: Dict[str, int] = {}  # version -> readers with it open
+        self.last_check: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_update: dict = {}
+
+    def current_version(self) -> Optional[str]:
+        path = os.path.join(self.root_dir, CURRENT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            version = f.read().strip()
+        if not os.path.exists(os.path.join(self.root_dir, VERSIONS_DIR, version, SNAPSHOT_FILE)):
+            return None
+        return version
+
+    def current_dir(self) -> Optional[str]:
+        version = self.current_version()
+        return os.path.join(self.root_dir, VERSIONS_DIR, version) if version else None
+
+    def acquire(self, version: str):
+        """Keep `version` on disk until release(): it is open for reading."""
+        with self._lock:
+            self._held[version] = self._held.get(version, 0) + 1
+
+    def release(self, version: str):
+        with self._lock:
+            if self._held.get(version, 0) <= 1:
+                self._held.pop(version, None)
+            else:
+                self._held[version] -= 1
+            self._prune()
+
+    def _local_manifest(self, version: str) -> dict:
+        with open(os.path.join(self.root_dir, VERSIONS_DIR, version, SNAPSHOT_FILE)) as f:
+            return json.load(f)
+
+    def update(self) -> Optional[str]:
+        """Bring the local copy up to the source's LATEST; returns the new version's directory, or None if current."""
+        with self._lock:
+            staging = None
+            try:
+                latest = self.source.latest()
+                current = self.current_version()
+                if latest["version"] == current:
+                    self.last_check, self.last_error = time.time(), None
+                    return None
+
+                manifest = self.source.manifest(latest)
+                base = self._local_manifest(current) if current else None
+                base_dir = self.current_dir()
+                target = os.path.join(self.root_dir, VERSIONS_DIR, latest["version"])
+                staging = target + ".tmp"
+                shutil.rmtree(staging, ignore_errors=True)
+
+                started = time.perf_counter()
+                stats = self._materialize(manifest, base, base_dir, staging)
+                shutil.rmtree(target, ignore_errors=True)
+                os.rename(staging, target)
+                _write_atomic(os.path.join(self.root_dir, CURRENT_FILE), latest["version"].encode("utf-8"))
+                self._prune()
+            except Exception as e:
+                if staging is not None:
+                    shutil.rmtree(staging, ignore_errors=True)
+                self.last_check, self.last_error = time.time(), f"{type(e).__name__}: {e}"
+                raise
+
+            stats["seconds"] = round(time.perf_counter() - started, 2)
+            self.last_check, self.last_error = time.time(), None
+            self.last_update = {"from": current, "to": latest["version"], **stats}
+            logging.info(
+                f"Index snapshot {current or '(none)'} -> {latest['version']}: "
+                f"{stats['blocks_fetched']} blocks fetched ({stats['bytes_fetched'] / 1e6:.1f} MB), "
+                f"{stats['blocks_reused']} reused, in {stats['seconds']:.1f}s"
+            )
+            return target
+
+    def _materialize(self, manifest: dict, base: Optional[dict], base_dir: Optional[str], out_dir: str) -> dict:
+        stats = {"blocks_fetched": 0, "bytes_fetched": 0, "blocks_reused": 0}
+        os.makedirs(out_dir)
+        for rel, info in manifest["collections"].items():
+            dest = os.path.normpath(os.path.join(out_dir, rel))
+            previous = (base or {}).get("collections", {}).get(rel)
+            if previous is not None and previous["buckets"] == info["buckets"]:
+                _copy_collection(os.path.normpath(os.path.join(base_dir, rel)), dest)
+                old_blocks = previous["blocks"]
+            else:
+                old_blocks = {}
+            changed = {
+                bucket for bucket in set(old_blocks) | set(info["blocks"])
+                if old_blocks.get(bucket, {}).get("sha256") != info["blocks"].get(bucket, {}).get("sha256")
+            }
+            stats["blocks_reused"] += len(info["blocks"]) - len(changed & set(info["blocks"]))
+            if old_blocks and not changed:
+                continue
+
+            vectordb = open_vectordb(dest)
+            try:
+                collection = vectordb._collection
+                if old_blocks:
+                    buckets = {int(bucket) for bucket in changed}
+                    stale = [i for i in all_ids(collection) if bucket_of(i, info["buckets"]) in buckets]
+                    for start in range(0, len(stale), 5000):
+                        collection.delete(ids=stale[start : start + 5000])
+                for bucket in sorted(changed & set(info["blocks"]), key=int):
+                    data = self.source.object(info["blocks"][bucket]["sha256"])
+                    ids, documents, metadatas, vectors = decode_block(data)
+                    collection.upsert(ids=ids, embeddings=vectors.tolist(), documents=documents, metadatas=metadatas)
+                    stats["blocks_fetched"] += 1
+                    stats["bytes_fetched"] += len(data)
+
+                count = collection.count()
+                if count != info["records"]:
+                    raise ValueError(f"Collection `{rel}` has {count} records after update, manifest says {info['records']}")
+                lexical_dir = os.path.join(dest, LEXICAL_INDEX_DIR)
+                shutil.rmtree(lexical_dir, ignore_errors=True)
+                build_from_chroma(vectordb, lexical_dir)
+            finally:
+                release_chroma(vectordb)
+
+        for rel, entry in manifest["files"].items():
+            dest = os.path.join(out_dir, *rel.split("/"))
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            source_path = os.path.join(base_dir, *rel.split("/")) if base_dir else None
+            if base and base["files"].get(rel) == entry and os.path.exists(source_path):
+                shutil.copy2(source_path, dest)
+            else:
+                data = self.source.object(entry["sha256"])
+                stats["bytes_fetched"] += len(data)
+                with open(dest, "wb") as f:
+                    f.write(data)
+
+        with open(os.path.join(out_dir, SNAPSHOT_FILE), "w") as f:
+            json.dump(manifest, f)
+        return stats
+
+    def _prune(self):
+        """Remove versions beyond the `keep` newest, except CURRENT and held ones. Lock held."""
+        versions_dir = os.path.join(self.root_dir, VERSIONS_DIR)
+        if not os.path.isdir(versions_dir):
+            return
+
+        def published_at(name):
+            path = os.path.join(versions_dir, name, SNAPSHOT_FILE)
+            return os.path.getmtime(path) if os.path.exists(path) else 0.0
+
+        current = self.current_version()
+        for rank, name in enumerate(sorted(os.listdir(versions_dir), key=published_at, reverse=True)):
+            if name.endswith(".tmp") or (rank >= self.keep and name != current and name not in self._held):
+                shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+
+    def status(self) -> dict:
+        return {
+            "source": repr(self.source),
+            "version": self.current_version(),
+            "last_check": self.last_check,
+            "last_error": self.last_error,
+            "last_update": dict(self.last_update),
+            "held": dict(self._held),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish, diff and pull vector store snapshots.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    pub = sub.add_parser("publish", help="Snapshot a chroma_db directory into a store.")
+    pub.add_argument("--db-dir", default=os.path.join(os.path.dirname(__file__), "chroma_db"))
+    pub.add_argument("--store", required=True, help="Local store directory (created if missing).")
+    pub.add_argument("--base", default=None, help="Version whose bucketing to keep (default: the store's LATEST).")
+    pub.add_argument("--block-records", type=int, default=BLOCK_RECORDS)
+
+    delta = sub.add_parser("delta", help="Copy the objects added since --base into a directory to upload.")
+    delta.add_argument("--store", required=True)
+    delta.add_argument("--base", required=True, help="Version the remote store already has.")
+    delta.add_argument("--version", default=None, help="Target version (default: LATEST).")
+    delta.add_argument("--out", required=True)
+
+    pull = sub.add_parser("pull", help="Update a local copy the way the app does (e.g. to pre-seed a deployment).")
+    pull.add_argument("--source", required=True, help="Store directory or http(s) URL.")
+    pull.add_argument("--dir", default=os.path.join(os.path.dirname(__file__), "index_snapshots"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == "publish":
+        publish(args.db_dir, args.store, base_version=args.base, block_records=args.block_records)
+    elif args.command == "delta":
+        write_delta(args.store, args.out, args.base, args.version)
+    elif args.command == "pull":
+        sync = SnapshotSync(open_source(args.source), args.dir)
+        target = sync.update()
+        print(f"✅ Up to date at `{target or sync.current_dir()}`")
+
+
+if __name__ == "__main__":
+    main()
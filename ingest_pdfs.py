@@ -1,106 +1,593 @@
 from langchain_community.document_loaders import DirectoryLoader, CSVLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 from dotenv import load_dotenv
 import pandas as pd
+import hashlib
+import json
 import os
 import shutil
+import argparse
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from tqdm import tqdm  # For progress tracking
+from embedding_backends import build_embeddings
+from index_snapshot import publish
+from lexical_index import build_from_chroma
+from near_duplicates import DEFAULT_THRESHOLD, NearDuplicateFilter
+from query_parser import GAZETTEER_FILE, build_gazetteer
+from shard_router import SHARD_MANIFEST, SHARDS_DIR, merge_gazetteers, shard_key, write_manifest
 
 load_dotenv()
 
-def load_and_process_csvs(file_path: str):
-    """Load cleaned CSV and split into chunks with progress tracking."""
-    df = pd.read_csv(file_path)
-
-    # Create metadata fields for Chroma
-    documents = []
-    metadatas = []
-
-    print(f"\n📂 Processing {len(df):,} rows from CSV...")
-
-    for _, row in tqdm(df.iterrows(), total=len(df), desc="🔄 Processing Rows", unit="row"):
-        text = f"Restaurant: {row['restaurant_name']} | Category: {row['menu_category']} | " \
-               f"Item: {row['menu_item']} | Description: {row['menu_description']} | " \
-               f"Ingredients: {row['ingredient_name']} | Location: {row['city']}, {row['state']} | " \
-               f"Rating: {row['rating']} | Price: {row['price']}"
-        
-        metadata = {
-            "restaurant_name": row["restaurant_name"],
-            "menu_category": row["menu_category"],
-            "city": row["city"],
-            "state": row["state"],
-            "rating": row["rating"],
-            "price": row["price"]
+METADATA_COLUMNS = ["restaurant_name", "menu_category", "city", "state", "rating", "price"]
+
+class StageStats:
+    """Items processed and busy seconds per pipeline stage, for the rows/s report."""
+
+    def __init__(self):
+        self.items = {}
+        self.seconds = {}
+
+    def add(self, stage: str, items: int, seconds: float):
+        self.items[stage] = self.items.get(stage, 0) + items
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def report(self, wall_seconds: float) -> dict:
+        stages = {
+            stage: {
+                "items": self.items[stage],
+                "seconds": round(self.seconds[stage], 3),
+                "items_per_s": round(self.items[stage] / self.seconds[stage], 1) if self.seconds[stage] else None,
+            }
+            for stage in self.items
         }
+        print("\n⏱️ Ingest throughput per stage:")
+        for stage, s in stages.items():
+            print(f"   {stage:<8} {s['items']:>10,} items  {s['seconds']:>9.1f}s busy  {s['items_per_s'] or 0:>10,.1f}/s")
+        print(f"   {'wall':<8} {wall_seconds:>31.1f}s")
+        return stages
 
-        documents.append(text)
-        metadatas.append(metadata)
+def build_texts(df: pd.DataFrame) -> pd.Series:
+    """Vectorized document text for each row (same format the per-row f-string produced)."""
+    col = lambda name: df[name].astype(str)
+    return (
+        "Restaurant: " + col("restaurant_name") + " | Category: " + col("menu_category") + " | "
+        + "Item: " + col("menu_item") + " | Description: " + col("menu_description") + " | "
+        + "Ingredients: " + col("ingredient_name") + " | Location: " + col("city") + ", " + col("state") + " | "
+        + "Rating: " + col("rating") + " | Price: " + col("price")
+    )
+
+def build_metadatas(df: pd.DataFrame) -> list:
+    """
+    Chroma metadata per row: the raw columns plus numeric price fields for
+    query-time filtering. `price_value` is set when price is a number
+    ("12.99", "$12.99") and `price_tier` when it is a "$$"-style range.
+    """
+    price = df["price"].astype(str).str.strip()
+    derived = pd.DataFrame({
+        "price_value": pd.to_numeric(price.str.replace(r"[$,\s]", "", regex=True), errors="coerce"),
+        "price_tier": price.where(price.str.fullmatch(r"\$+")).str.len(),
+    }, index=df.index)
+    metadatas = df[METADATA_COLUMNS].to_dict("records")
+    for metadata, extra in zip(metadatas, derived.to_dict("records")):
+        # Chroma metadata can't hold None; leave the field out instead
+        metadata.update({k: (int(v) if k == "price_tier" else float(v)) for k, v in extra.items() if pd.notna(v)})
+    return metadatas
 
-    # Split documents into chunks
-    print("\n🔄 Splitting documents into chunks...")
-    text_splitter = RecursiveCharacterTextSplitter(
+def make_text_splitter():
+    return RecursiveCharacterTextSplitter(
         chunk_size=512,
         chunk_overlap=100,
         length_function=len
     )
-    
-    chunked_docs = text_splitter.create_documents(documents, metadatas=metadatas)
+
+TEXT_COLUMNS = ["menu_item", "menu_description", "ingredient_name"]
+# One document per menu item of a restaurant location (chains share names across cities)
+ITEM_KEY_COLUMNS = ["restaurant_name", "city", "state", "menu_item"]
+UNKNOWN_INGREDIENTS = {"unknown ingredients", "nan", ""}
+
+def read_row_chunks(file_path: str, rows_per_chunk: int):
+    """DataFrames of `rows_per_chunk` rows from the cleaned CSV, or from Parquet (only the needed columns)."""
+    if file_path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        columns = METADATA_COLUMNS + TEXT_COLUMNS
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=rows_per_chunk, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(file_path, chunksize=rows_per_chunk)
+
+def aggregate_items(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per restaurant location + menu item: the source has a row per
+    ingredient, so ingredient names are merged (first-seen order, without
+    repeats or "unknown ingredients" placeholders) and every other column
+    keeps its first non-null value.
+    """
+    grouped = df.groupby(ITEM_KEY_COLUMNS, sort=False, dropna=False)
+    items = grouped.first()
+
+    ingredients = df["ingredient_name"].astype(str).str.strip()
+    known = df.assign(ingredient_name=ingredients)[~ingredients.str.lower().isin(UNKNOWN_INGREDIENTS)]
+    merged = (
+        known.drop_duplicates(ITEM_KEY_COLUMNS + ["ingredient_name"])
+        .groupby(ITEM_KEY_COLUMNS, sort=False, dropna=False)["ingredient_name"]
+        .agg(", ".join)
+    )
+    items["ingredient_name"] = merged.reindex(items.index).fillna(items["ingredient_name"])
+    return items.reset_index()
+
+class ItemAggregator:
+    """
+    aggregate_items over a stream of row chunks. The rows of the last item
+    in each chunk are held back and merged with the next chunk, so an item
+    whose ingredient rows straddle a chunk boundary still becomes one
+    document. Rows of an item must be contiguous (as in the cleaned CSV);
+    an item that reappears later becomes a second document, which the
+    near-duplicate filter drops when it says the same thing at the same price.
+    """
+
+    def __init__(self):
+        self._held = None
+
+    def add(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self._held is not None:
+            df = pd.concat([self._held, df], ignore_index=True)
+        keys = df[ITEM_KEY_COLUMNS].astype(str)
+        last = (keys == keys.iloc[-1]).all(axis=1)
+        self._held = df[last]
+        return aggregate_items(df[~last])
+
+    def flush(self) -> pd.DataFrame:
+        held, self._held = self._held, None
+        return aggregate_items(held) if held is not None else pd.DataFrame()
+
+def drop_near_duplicates(df: pd.DataFrame, dedup: NearDuplicateFilter) -> pd.DataFrame:
+    """
+    Rows whose item, description and ingredients nearly repeat an earlier item
+    of the same restaurant location, menu category and price. Items that differ
+    in price or category ("Lunch Pepperoni Pizza" at 9.99 vs "Dinner Pepperoni
+    Pizza" at 14.99) are never compared, so both are kept.
+    """
+    if df.empty:
+        return df
+    col = lambda name: df[name].astype(str).str.strip().str.lower()
+    scopes = (
+        col("restaurant_name") + "|" + col("city") + "|" + col("state") + "|" + col("menu_category") + "|" + col("price")
+    ).tolist()
+    texts = (col("menu_item") + " " + col("menu_description") + " " + col("ingredient_name")).tolist()
+    keep = [not dedup.is_duplicate(text, scope) for text, scope in zip(texts, scopes)]
+    return df[keep]
+
+def iter_csv_chunks(file_path: str, rows_per_chunk: int = 5000, stats: "StageStats" = None,
+                    aggregate: bool = True, dedup_threshold: float = DEFAULT_THRESHOLD):
+    """
+    Stream the cleaned CSV (or Parquet) as lists of split Documents, `rows_per_chunk` rows
+    at a time, so memory stays bounded by the chunk size rather than the file.
+
+    With `aggregate` (default) each menu item of a restaurant becomes one document
+    with its ingredients merged instead of one document per ingredient row; items
+    whose text nearly repeats an earlier item of the same restaurant, category and
+    price (MinHash Jaccard >= `dedup_threshold`, 0 disables) are dropped.
+    """
+    text_splitter = make_text_splitter()
+    reader = read_row_chunks(file_path, rows_per_chunk)
+    aggregator = ItemAggregator() if aggregate else None
+    dedup = NearDuplicateFilter(dedup_threshold) if aggregate and dedup_threshold else None
+    finished = False
+    while not finished:
+        started = time.perf_counter()
+        df = next(reader, None)
+        read_done = time.perf_counter()
+        rows = 0 if df is None else len(df)
+        if df is None:
+            if aggregator is None:
+                return
+            finished = True
+            df = aggregator.flush()
+        elif aggregator is not None:
+            df = aggregator.add(df)
+        aggregated = time.perf_counter()
+        items = len(df)
+        if dedup is not None:
+            df = drop_near_duplicates(df, dedup)
+        deduped = time.perf_counter()
+        if stats is not None:
+            stats.add("read", rows, read_done - started)
+            if aggregator is not None:
+                stats.add("group", rows, aggregated - read_done)
+            if dedup is not None:
+                stats.add("dedup", items, deduped - aggregated)
+        if df.empty:
+            continue
+
+        texts = build_texts(df).tolist()
+        metadatas = build_metadatas(df)
+        chunked_docs = text_splitter.create_documents(texts, metadatas=metadatas)
+        if stats is not None:
+            stats.add("build", len(df), time.perf_counter() - deduped)
+        yield chunked_docs
+
+    if dedup is not None:
+        print(f"🧹 {dedup.kept:,} menu items kept, {dedup.duplicates:,} near-duplicates dropped.")
+
+def load_and_process_csvs(file_path: str, rows_per_chunk: int = 5000, aggregate: bool = True,
+                          dedup_threshold: float = DEFAULT_THRESHOLD):
+    """Load cleaned CSV and split into chunks with progress tracking (materialized in memory)."""
+    print(f"\n📂 Processing rows from `{file_path}`...")
+    chunked_docs = []
+    chunks = iter_csv_chunks(file_path, rows_per_chunk, aggregate=aggregate, dedup_threshold=dedup_threshold)
+    for docs in tqdm(chunks, desc="🔄 Processing Rows", unit="chunk"):
+        chunked_docs.extend(docs)
 
     print(f"✅ Created {len(chunked_docs):,} chunks.\n")
     return chunked_docs
 
-from tqdm import tqdm
-import math
+CHECKPOINT_FILE = "ingest_checkpoint.json"
+LEXICAL_INDEX_DIR = "lexical_index"
+
+def chunk_id(chunk) -> str:
+    """Stable content-hash id for a chunk: same text + metadata -> same id on every run."""
+    payload = chunk.page_content + "\x00" + json.dumps(chunk.metadata, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def existing_ids(vectordb, page_size=10000) -> set:
+    """All document ids currently stored in the collection."""
+    ids = set()
+    offset = 0
+    while True:
+        page = vectordb.get(include=[], limit=page_size, offset=offset)["ids"]
+        ids.update(page)
+        if len(page) < page_size:
+            return ids
+        offset += page_size
+
+def load_checkpoint(persist_directory: str, run_id: str):
+    """Return the checkpoint left by an interrupted run of the same input, if any."""
+    path = os.path.join(persist_directory, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    return checkpoint if checkpoint.get("run_id") == run_id else None
+
+def save_checkpoint(persist_directory: str, checkpoint: dict):
+    """Write the checkpoint atomically so a crash never leaves it half-written."""
+    path = os.path.join(persist_directory, CHECKPOINT_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+def file_run_key(file_path: str) -> str:
+    """Identity of an input file for checkpointing: path, size and mtime."""
+    st = os.stat(file_path)
+    return f"{os.path.abspath(file_path)}:{st.st_size}:{st.st_mtime_ns}"
+
+# Each embedding worker process holds its own model copy
+_worker_embeddings = None
+
+def _init_embed_worker(threads_per_worker: int):
+    global _worker_embeddings
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "ONNX_THREADS"):
+        os.environ[var] = str(threads_per_worker)
+    _worker_embeddings = build_embeddings(device='cpu')
+    if os.getenv("EMBEDDING_BACKEND", "torch") == "torch":
+        import torch
+        torch.set_num_threads(threads_per_worker)
+
+def _embed_texts(texts):
+    started = time.perf_counter()
+    vectors = _worker_embeddings.embed_documents(texts)
+    return vectors, time.perf_counter() - started
+
+class _InlineEmbedder:
+    """Single-process stand-in for the worker pool (workers=1)."""
+
+    def __init__(self):
+        self.embeddings = build_embeddings(device='cpu')
 
-def create_vector_store(chunks, persist_directory: str, batch_size=1000):
-    """Create and persist Chroma vector store with metadata with proper progress tracking."""
-    
-    # Clear existing vector store if it exists
-    if os.path.exists(persist_directory):
+    def submit(self, texts):
+        started = time.perf_counter()
+        vectors = self.embeddings.embed_documents(texts)
+        return _Done((vectors, time.perf_counter() - started))
+
+    def shutdown(self):
+        pass
+
+class _Done:
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+class _PoolEmbedder:
+    """Embedding worker processes, each with its own model copy."""
+
+    def __init__(self, workers: int):
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_embed_worker,
+            initargs=(threads_per_worker,),
+        )
+
+    def submit(self, texts):
+        return self.pool.submit(_embed_texts, texts)
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+def make_embedder(workers: int):
+    if workers > 1:
+        print(f"⚙️ Embedding with {workers} worker processes...")
+        return _PoolEmbedder(workers)
+    return _InlineEmbedder()
+
+def create_vector_store(chunks, persist_directory: str, batch_size=1000, incremental=False,
+                        workers=None, run_key=None, stats: StageStats = None, embedder=None):
+    """
+    Create and persist Chroma vector store with metadata with proper progress tracking.
+
+    `chunks` is a list of Documents or any iterable of Documents / lists of
+    Documents (e.g. iter_csv_chunks), consumed lazily. Embedding runs on a
+    pool of `workers` processes with at most 2 batches per worker in flight,
+    and this process is the single writer into Chroma, so peak memory is
+    bounded by the batch size rather than the input size.
+
+    Every chunk gets a content-hash id. A full run (default) clears the store
+    first; an incremental run keeps it, embeds only chunks whose id is not
+    stored yet and then deletes ids whose rows are gone. Progress is
+    checkpointed after each batch, so rerunning after a crash resumes
+    instead of starting over (a full run won't clear the store again).
+    Finally the BM25 index under `<persist_directory>/lexical_index` and the
+    location gazetteer are rebuilt from the collection so lexical search and
+    query filters see the same chunks as vector search.
+
+    Pass `embedder` (from make_embedder) to reuse one worker pool across
+    several stores; it is then left running.
+    """
+    workers = workers or max(1, (os.cpu_count() or 1) // 2)
+    stats = stats or StageStats()
+    if run_key is None:
+        if not isinstance(chunks, list):
+            raise ValueError("run_key is required when chunks is a stream.")
+        run_key = "".join(sorted(chunk_id(chunk) for chunk in chunks))
+    run_id = hashlib.sha1(run_key.encode("utf-8")).hexdigest()
+
+    checkpoint = load_checkpoint(persist_directory, run_id) if os.path.exists(persist_directory) else None
+    if checkpoint:
+        print(f"♻️ Resuming interrupted ingest ({checkpoint['completed_batches']} batches already done)...")
+    elif incremental:
+        print(f"🔁 Incremental update of vector store at {persist_directory}...")
+    elif os.path.exists(persist_directory):
+        # Clear existing vector store if it exists
         print(f"🗑️ Clearing existing vector store at {persist_directory}...")
         shutil.rmtree(persist_directory)
-    
-    # Initialize HuggingFace embeddings
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-mpnet-base-v2",
-        model_kwargs={'device': 'cpu'}
-    )
 
-    # Create an empty Chroma vector store
-    print("\n🚀 Creating new vector store with metadata...")
-    vectordb = Chroma(persist_directory=persist_directory, embedding_function=embeddings)
+    # Vectors are computed by the embedding workers, so the store needs no embedding function
+    print("\n🚀 Opening vector store with metadata...")
+    vectordb = Chroma(persist_directory=persist_directory)
+    stored_ids = existing_ids(vectordb)
+    seen_ids = set()
+    checkpoint = checkpoint or {"run_id": run_id, "completed_batches": 0}
+    os.makedirs(persist_directory, exist_ok=True)
+
+    def pending_chunks():
+        """Chunks whose id is neither stored already nor a duplicate earlier in this run."""
+        for item in chunks:
+            for chunk in (item if isinstance(item, list) else [item]):
+                doc_id = chunk_id(chunk)
+                if doc_id in seen_ids:
+                    continue
+                seen_ids.add(doc_id)
+                if doc_id not in stored_ids:
+                    yield doc_id, chunk
+
+    pool = embedder or make_embedder(workers)
+    submit = pool.submit
+
+    def write(batch, future):
+        vectors, embed_seconds = future.result()
+        stats.add("embed", len(batch), embed_seconds)
+        started = time.perf_counter()
+        vectordb._collection.upsert(
+            ids=[doc_id for doc_id, _ in batch],
+            embeddings=vectors,
+            documents=[chunk.page_content for _, chunk in batch],
+            metadatas=[chunk.metadata for _, chunk in batch],
+        )
+        stats.add("write", len(batch), time.perf_counter() - started)
+        checkpoint["completed_batches"] += 1
+        save_checkpoint(persist_directory, checkpoint)
+        pbar.update(len(batch))  # Update progress bar
 
     # Batch insertion with progress tracking
-    total_batches = math.ceil(len(chunks) / batch_size)
-    
-    with tqdm(total=len(chunks), desc="📥 Inserting Chunks into Vector Store", unit="chunk") as pbar:
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i : i + batch_size]  # Select batch
-            vectordb.add_documents(batch)  # Insert batch
-            pbar.update(len(batch))  # Update progress bar
-    
-    print(f"\n✅ Vector store successfully created and persisted at `{persist_directory}`.\n")
+    started = time.perf_counter()
+    in_flight = deque()
+    pending = pending_chunks()
+    try:
+        with tqdm(desc="📥 Inserting Chunks into Vector Store", unit="chunk") as pbar:
+            while True:
+                batch = list(islice(pending, batch_size))  # Select batch
+                if not batch:
+                    break
+                in_flight.append((batch, submit([chunk.page_content for _, chunk in batch])))
+                if len(in_flight) >= 2 * workers:
+                    write(*in_flight.popleft())
+            while in_flight:
+                write(*in_flight.popleft())
+    finally:
+        if embedder is None:
+            pool.shutdown()
+
+    # Remove rows that disappeared only once everything new is in
+    stale_ids = [doc_id for doc_id in stored_ids if doc_id not in seen_ids]
+    for i in range(0, len(stale_ids), batch_size):
+        vectordb.delete(ids=stale_ids[i : i + batch_size])
+
+    if os.path.exists(os.path.join(persist_directory, CHECKPOINT_FILE)):
+        os.remove(os.path.join(persist_directory, CHECKPOINT_FILE))
+    print(f"\n✅ Vector store persisted at `{persist_directory}`: {len(seen_ids):,} chunks, "
+          f"{len(stored_ids) - len(stale_ids):,} unchanged, {len(stale_ids):,} stale chunks removed.")
+
+    # Keep the BM25 index in step with the collection it mirrors
+    started_lexical = time.perf_counter()
+    lexical_dir = os.path.join(persist_directory, LEXICAL_INDEX_DIR)
+    indexed = build_from_chroma(vectordb, lexical_dir)
+    stats.add("lexical", indexed, time.perf_counter() - started_lexical)
+    print(f"🔤 Lexical (BM25) index rebuilt at `{lexical_dir}` over {indexed:,} chunks.")
+
+    # City/state values present in the index, used by the query parser for filters
+    gazetteer = build_gazetteer(vectordb, os.path.join(persist_directory, GAZETTEER_FILE))
+    print(f"📍 Location gazetteer: {len(gazetteer['cities']):,} cities, {len(gazetteer['states']):,} states.")
+
+    stats.report(time.perf_counter() - started)
     return vectordb
 
+def partition_by_shard(file_path: str, staging_dir: str, rows_per_chunk: int, shard_by: str) -> dict:
+    """Stream the input into one CSV per shard under `staging_dir`; returns shard key -> path."""
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    paths = {}
+    for df in tqdm(read_row_chunks(file_path, rows_per_chunk), desc="🗂️ Partitioning rows", unit="chunk"):
+        keys = df["state"].map(lambda state: shard_key(state, shard_by))
+        for key, part in df.groupby(keys, sort=False):
+            path = os.path.join(staging_dir, f"{key}.csv")
+            part.to_csv(path, mode="a", header=key not in paths, index=False)
+            paths[key] = path
+    return paths
+
+def create_sharded_vector_store(data_file: str, persist_directory: str, shard_by="state", rows_per_chunk=5000,
+                                batch_size=1000, incremental=False, workers=None, aggregate=True,
+                                dedup_threshold=DEFAULT_THRESHOLD):
+    """
+    Partitioned layout: one Chroma store (with its own BM25 index and
+    gazetteer) per state or census region under `<persist_directory>/shards/`,
+    plus a `shards.json` manifest the query router reads. Each shard is
+    built with create_vector_store, so incremental runs and crash resume work
+    per shard; shards whose rows are all gone are removed.
+    """
+    shards_root = os.path.join(persist_directory, SHARDS_DIR)
+    staging_dir = os.path.join(persist_directory, "shards.staging")
+    os.makedirs(shards_root, exist_ok=True)
+
+    print(f"\n🧩 Partitioning `{data_file}` by {shard_by}...")
+    paths = partition_by_shard(data_file, staging_dir, rows_per_chunk, shard_by)
+    print(f"✅ {len(paths):,} shards: {', '.join(sorted(paths))}")
+
+    workers = workers or max(1, (os.cpu_count() or 1) // 2)
+    embedder = make_embedder(workers)
+    manifest = {}
+    try:
+        for key, path in sorted(paths.items()):
+            print(f"\n📦 Shard `{key}`")
+            shard_dir = os.path.join(shards_root, key)
+            stats = StageStats()
+            vectordb = create_vector_store(
+                iter_csv_chunks(path, rows_per_chunk, stats, aggregate, dedup_threshold),
+                shard_dir,
+                batch_size=batch_size,
+                incremental=incremental,
+                workers=workers,
+                run_key=f"{file_run_key(data_file)}:{shard_by}:{key}",
+                stats=stats,
+                embedder=embedder,
+            )
+            with open(os.path.join(shard_dir, GAZETTEER_FILE)) as f:
+                gazetteer = json.load(f)
+            manifest[key] = {
+                "path": os.path.join(SHARDS_DIR, key),
+                "states": gazetteer["states"],
+                "cities": gazetteer["cities"],
+                "chunks": vectordb._collection.count(),
+            }
+    finally:
+        embedder.shutdown()
+
+    for name in os.listdir(shards_root):
+        if name not in manifest:
+            print(f"🗑️ Removing shard `{name}` (no rows left)")
+            shutil.rmtree(os.path.join(shards_root, name))
+    write_manifest(persist_directory, shard_by, manifest)
+    merge_gazetteers(persist_directory, manifest)
+    shutil.rmtree(staging_dir)
+    print(f"\n✅ Shard manifest written to `{os.path.join(persist_directory, SHARD_MANIFEST)}` "
+          f"({sum(info['chunks'] for info in manifest.values()):,} chunks in {len(manifest)} shards)")
+    return manifest
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Build the Chroma vector store from the cleaned menu CSV.")
+    parser.add_argument("--data-file", default=None,
+                        help="Cleaned menu data, .csv or .parquet (default data/cleaned_menu.csv).")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only embed new/changed rows and delete removed ones instead of rebuilding.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--rows-per-chunk", type=int, default=5000,
+                        help="CSV rows read and split per step; bounds peak memory.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Embedding processes (default: half the CPU cores).")
+    parser.add_argument("--sharded", action="store_true",
+                        help="Write one collection per state/region plus a shards.json manifest.")
+    parser.add_argument("--shard-by", choices=["state", "region"], default="state",
+                        help="Partition key for --sharded (region = US Census region).")
+    parser.add_argument("--no-aggregate", action="store_true",
+                        help="One document per CSV row instead of one per restaurant menu item.")
+    parser.add_argument("--dedup-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="MinHash Jaccard at which a menu item counts as a near-duplicate (0 = keep all).")
+    parser.add_argument("--publish-snapshot", metavar="STORE_DIR", default=None,
+                        help="Afterwards, publish the store as a snapshot into this directory (see index_snapshot.py).")
+    args = parser.parse_args()
+
     # Define paths
-    data_file = os.path.join(os.path.dirname(__file__), "data", "cleaned_menu.csv")
+    data_file = args.data_file or os.path.join(os.path.dirname(__file__), "data", "cleaned_menu.csv")
     db_dir = os.path.join(os.path.dirname(__file__), "chroma_db")
-    
+
     print("\n🚀 Starting ingestion process...\n")
 
-    # Process CSVs
-    print("📂 Loading and processing CSVs with metadata...")
-    chunks = load_and_process_csvs(data_file)
-    print(f"✅ Finished processing CSV: {len(chunks):,} chunks created.\n")
+    if args.sharded:
+        create_sharded_vector_store(
+            data_file,
+            db_dir,
+            shard_by=args.shard_by,
+            rows_per_chunk=args.rows_per_chunk,
+            batch_size=args.batch_size,
+            incremental=args.incremental,
+            workers=args.workers,
+            aggregate=not args.no_aggregate,
+            dedup_threshold=args.dedup_threshold,
+        )
+        if args.publish_snapshot:
+            publish(db_dir, args.publish_snapshot)
+        return
+
+    # The app prefers shards when a manifest exists, so drop a previous sharded layout
+    if os.path.exists(os.path.join(db_dir, SHARD_MANIFEST)):
+        print("🗑️ Removing previous sharded layout...")
+        os.remove(os.path.join(db_dir, SHARD_MANIFEST))
+        shutil.rmtree(os.path.join(db_dir, SHARDS_DIR), ignore_errors=True)
 
-    # Create vector store
+    # Stream CSV -> split -> embed (process pool) -> single Chroma writer
     print("📥 Creating vector store with metadata...")
-    vectordb = create_vector_store(chunks, db_dir)
+    stats = StageStats()
+    vectordb = create_vector_store(
+        iter_csv_chunks(data_file, args.rows_per_chunk, stats, not args.no_aggregate, args.dedup_threshold),
+        db_dir,
+        batch_size=args.batch_size,
+        incremental=args.incremental,
+        workers=args.workers,
+        run_key=file_run_key(data_file),
+        stats=stats,
+    )
     print(f"✅ Vector store successfully created at `{db_dir}`\n")
+    if args.publish_snapshot:
+        publish(db_dir, args.publish_snapshot)
 
 if __name__ == "__main__":
     main()
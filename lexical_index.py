@@ -0,0 +1,191 @@
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "best", "can", "do", "does", "find", "for", "from", "get", "good",
+    "have", "how", "i", "in", "is", "it", "me", "my", "near", "of", "on", "or", "serve", "serves",
+    "some", "that", "the", "there", "to", "what", "where", "which", "who", "with", "you",
+    # price / rating phrasing, handled as filters by query_parser
+    "under", "below", "less", "than", "over", "above", "between", "cheap", "stars", "star", "rated", "dollars",
+    # field labels from the document template
+    "restaurant", "category", "item", "description", "ingredients", "location", "rating", "price",
+}
+FORMAT_VERSION = 1
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens without stopwords (queries and documents alike)."""
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def reciprocal_rank_fusion(*rankings: List[str], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked key lists: score(key) = sum over lists of 1 / (k + rank)."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class LexicalIndexBuilder:
+    """Accumulates documents in memory and writes the on-disk BM25 index."""
+
+    def __init__(self):
+        self.postings = defaultdict(list)  # term -> [(doc_idx, tf)]
+        self.doc_lengths = []
+        self.records = []
+
+    def add(self, doc_id: str, text: str, metadata: dict):
+        doc_idx = len(self.doc_lengths)
+        tokens = tokenize(text)
+        for term, tf in Counter(tokens).items():
+            self.postings[term].append((doc_idx, tf))
+        self.doc_lengths.append(len(tokens))
+        self.records.append(json.dumps({"id": doc_id, "text": text, "metadata": metadata}).encode("utf-8"))
+
+    def save(self, directory: str, k1: float = 1.2, b: float = 0.75):
+        """
+        Write the index next to the vector store. Arrays are plain .npy files so
+        LexicalIndex can memory-map them; the directory is swapped in as a whole
+        so a running reader never sees a half-written index.
+        """
+        tmp_dir = directory.rstrip("/") + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        terms = sorted(self.postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(self.postings[term])
+        postings_docs = np.empty(offsets[-1], dtype=np.int32)
+        postings_tf = np.empty(offsets[-1], dtype=np.uint16)
+        for i, term in enumerate(terms):
+            entries = self.postings[term]
+            postings_docs[offsets[i]:offsets[i + 1]] = [d for d, _ in entries]
+            postings_tf[offsets[i]:offsets[i + 1]] = [min(tf, 65535) for _, tf in entries]
+
+        doc_offsets = np.zeros(len(self.records) + 1, dtype=np.int64)
+        with open(os.path.join(tmp_dir, "docs.bin"), "wb") as f:
+            for i, record in enumerate(self.records):
+                f.write(record)
+                doc_offsets[i + 1] = doc_offsets[i] + len(record)
+
+        np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+        np.save(os.path.join(tmp_dir, "postings_docs.npy"), postings_docs)
+        np.save(os.path.join(tmp_dir, "postings_tf.npy"), postings_tf)
+        np.save(os.path.join(tmp_dir, "doc_lengths.npy"), np.asarray(self.doc_lengths, dtype=np.int32))
+        np.save(os.path.join(tmp_dir, "doc_offsets.npy"), doc_offsets)
+        with open(os.path.join(tmp_dir, "vocab.json"), "w") as f:
+            json.dump({term: i for i, term in enumerate(terms)}, f)
+        n_docs = len(self.doc_lengths)
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "n_docs": n_docs,
+                "avgdl": (sum(self.doc_lengths) / n_docs) if n_docs else 0.0,
+                "k1": k1,
+                "b": b,
+            }, f)
+
+        old_dir = directory.rstrip("/") + ".old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(directory):
+            os.rename(directory, old_dir)
+        os.rename(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+class LexicalIndex:
+    """
+    Read side of the BM25 index: postings, term frequencies, document lengths
+    and stored documents are memory-mapped, so startup is cheap and the OS
+    page cache holds the hot parts. Only the vocabulary is loaded into RAM.
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported lexical index version {meta.get('version')} in {directory}")
+        with open(os.path.join(directory, "vocab.json")) as f:
+            self.vocab: Dict[str, int] = json.load(f)
+        load = lambda name: np.load(os.path.join(directory, name), mmap_mode="r")
+        self.offsets = load("offsets.npy")
+        self.postings_docs = load("postings_docs.npy")
+        self.postings_tf = load("postings_tf.npy")
+        self.doc_lengths = load("doc_lengths.npy")
+        self.doc_offsets = load("doc_offsets.npy")
+        self.n_docs = meta["n_docs"]
+        self.avgdl = meta["avgdl"] or 1.0
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        self._docs_file = open(os.path.join(directory, "docs.bin"), "rb")
+        self._docs = mmap.mmap(self._docs_file.fileno(), 0, access=mmap.ACCESS_READ) if self.n_docs else b""
+
+    @classmethod
+    def load_if_exists(cls, directory: str) -> Optional["LexicalIndex"]:
+        if not os.path.exists(os.path.join(directory, "meta.json")):
+            return None
+        return cls(directory)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float, float]]:
+        """
+        Top-k documents by BM25. Returns (doc_idx, score, coverage) where
+        coverage is the fraction of the query's terms the document contains.
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms or not self.n_docs:
+            return []
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        matched = np.zeros(self.n_docs, dtype=np.uint8)
+        for term in query_terms:
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = np.asarray(self.postings_docs[start:end])
+            tf = np.asarray(self.postings_tf[start:end], dtype=np.float32)
+            idf = math.log(1 + (self.n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * np.asarray(self.doc_lengths[docs]) / self.avgdl)
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+            matched[docs] += 1
+
+        candidates = np.flatnonzero(matched)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(int(i), float(scores[i]), int(matched[i]) / len(query_terms)) for i in candidates]
+
+    def document(self, doc_idx: int) -> Document:
+        record = json.loads(self._docs[self.doc_offsets[doc_idx]:self.doc_offsets[doc_idx + 1]])
+        return Document(page_content=record["text"], metadata=record["metadata"], id=record["id"])
+
+    def close(self):
+        if self.n_docs:
+            self._docs.close()
+        self._docs_file.close()
+
+
+def build_from_chroma(vectordb, directory: str, page_size: int = 10000) -> int:
+    """(Re)build the lexical index from everything stored in a Chroma collection."""
+    builder = LexicalIndexBuilder()
+    offset = 0
+    while True:
+        page = vectordb.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        for doc_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            builder.add(doc_id, text, metadata or {})
+        if len(page["ids"]) < page_size:
+            break
+        offset += page_size
+    builder.save(directory)
+    return len(builder.doc_lengths)
@@ -0,0 +1,70 @@
+import logging
+import os
+import threading
+import time
+from huggingface_hub import InferenceClient, model_info
+
+DEFAULT_MODEL_ID = "mistralai/Mistral-7B-Instruct-v0.3"
+
+
+class ModelRegistry:
+    """
+    Keeps one long-lived InferenceClient per model id so every chat turn reuses
+    the same client (and the hub's pooled HTTP session) instead of building a
+    new one. The Hub lookup that used to run on every request lives in
+    health_check(), which is meant to be called at startup and then in the
+    background every `check_ttl` seconds. A failed check is logged and
+    reported by status(); it does not block requests, since a transient Hub
+    outage should not take the chat down with it.
+    """
+
+    def __init__(self, token: str, check_ttl: float = None):
+        self.token = token
+        self.check_ttl = check_ttl if check_ttl is not None else float(os.getenv("MODEL_CHECK_TTL", "3600"))
+        self._clients = {}
+        self._status = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def get(self, model_id: str = DEFAULT_MODEL_ID) -> InferenceClient:
+        """Return the cached client for model_id, creating it on first use."""
+        client = self._clients.get(model_id)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(model_id)
+                if client is None:
+                    client = InferenceClient(model=model_id, token=self.token)
+                    self._clients[model_id] = client
+        return client
+
+    def health_check(self, model_id: str = DEFAULT_MODEL_ID) -> bool:
+        """Verify model_id exists on the Hub and record the result."""
+        try:
+            model_info(model_id, token=self.token)
+            ok, error = True, None
+            logging.info(f"Model {model_id} found on HF Hub.")
+        except Exception as e:
+            ok, error = False, str(e)
+            logging.error(f"Error loading model {model_id}: {e}")
+        self._status[model_id] = {"ok": ok, "checked_at": time.time(), "error": error}
+        if ok:
+            self.get(model_id)
+        return ok
+
+    def status(self) -> dict:
+        return dict(self._status)
+
+    def start_background_checks(self, model_ids=(DEFAULT_MODEL_ID,)):
+        """Run health_check now and every check_ttl seconds on a daemon thread (only once if check_ttl <= 0)."""
+        def loop():
+            while not self._stop.is_set():
+                for model_id in model_ids:
+                    self.health_check(model_id)
+                if self.check_ttl <= 0:
+                    break
+                self._stop.wait(self.check_ttl)
+
+        threading.Thread(target=loop, name="model-health", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
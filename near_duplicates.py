@@ -0,0 +1,74 @@
+import re
+import zlib
+from collections import defaultdict
+from typing import List
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+NUM_PERM = 64
+BANDS = 8  # 8 bands x 8 rows: pairs above ~0.8 Jaccard almost always share a bucket
+DEFAULT_THRESHOLD = 0.9
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+
+
+def shingles(text: str, size: int = 2) -> List[str]:
+    """Word n-grams of the lowercased text (the whole text if it has fewer words)."""
+    tokens = TOKEN_RE.findall(text.lower())
+    if len(tokens) <= size:
+        return [" ".join(tokens)]
+    return [" ".join(tokens[i : i + size]) for i in range(len(tokens) - size + 1)]
+
+
+class NearDuplicateFilter:
+    """
+    Streaming MinHash + LSH near-duplicate detection. Each text is checked
+    against the texts kept so far in the same `scope` (e.g. one restaurant
+    location); it is a duplicate when the estimated Jaccard similarity of
+    its word shingles with one of them reaches `threshold`, otherwise it is
+    kept and indexed. Memory is one signature (NUM_PERM uint32) plus BANDS
+    bucket entries per kept text.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = NUM_PERM, bands: int = BANDS,
+                 seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands}).")
+        rng = np.random.default_rng(seed)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        # a < 2**31 keeps a * h + b (h < 2**32) inside uint64
+        self._a = rng.integers(1, 1 << 31, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+        self._buckets = defaultdict(list)  # hash(scope, band, band values) -> kept indexes
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self.kept = 0
+        self.duplicates = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in set(shingles(text))), dtype=np.uint64
+        )
+        return ((self._a * hashes + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def is_duplicate(self, text: str, scope: str = "") -> bool:
+        """True if `text` nearly matches a kept text in `scope`; otherwise keep it and return False."""
+        sig = self.signature(text)
+        keys = [hash((scope, band, sig[band * self.rows : (band + 1) * self.rows].tobytes()))
+                for band in range(self.bands)]
+
+        candidates = {index for key in keys for index in self._buckets.get(key, ())}
+        if candidates:
+            similarity = (self._signatures[sorted(candidates)] == sig).mean(axis=1)
+            if similarity.max() >= self.threshold:
+                self.duplicates += 1
+                return True
+
+        if self.kept == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+        self._signatures[self.kept] = sig
+        for key in keys:
+            self._buckets[key].append(self.kept)
+        self.kept += 1
+        return False
@@ -1,23 +1,18 @@
 import pandas as pd
 import re
 import os
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 # Define file paths
 input_file = "data/cleaned_menu_wiki_augmented.csv"  # Update with actual path if needed
 output_file = "data/cleaned_menu.csv"
 
-# Load the CSV file
-df = pd.read_csv(input_file)
-
-### 1️⃣ Handle Missing Values
-# Fill missing descriptions with "No description available"
-df['menu_description'].fillna("No description available", inplace=True)
-
-# Fill missing ingredient names with "Unknown ingredients"
-df['ingredient_name'].fillna("Unknown ingredients", inplace=True)
-
-# Drop rows where essential fields are missing (restaurant_name, menu_item, address)
-df.dropna(subset=['restaurant_name', 'menu_item', 'address1'], inplace=True)
+text_columns = ['restaurant_name', 'menu_category', 'menu_item', 'menu_description', 'ingredient_name', 'city', 'state', 'country']
+numeric_columns = ['rating', 'review_count', 'confidence']  # float64 in Parquet output; every other column is string
+confidence_threshold = 0.7  # Adjust if needed
 
 ### 2️⃣ Normalize Text
 def clean_text(text):
@@ -27,29 +22,134 @@ def clean_text(text):
         text = re.sub(r'[^\w\s]', '', text)  # Remove special characters
     return text
 
-# Apply text cleaning
-text_columns = ['restaurant_name', 'menu_category', 'menu_item', 'menu_description', 'ingredient_name', 'city', 'state', 'country']
-for col in text_columns:
-    df[col] = df[col].astype(str).apply(clean_text)
+def clean_text_series(series: pd.Series) -> pd.Series:
+    """Vectorized clean_text over a whole column."""
+    return series.astype(str).str.lower().str.strip().str.replace(r'[^\w\s]', '', regex=True)
 
-### 3️⃣ Filter Out Low-Confidence Entries
-confidence_threshold = 0.7  # Adjust if needed
-df = df[df['confidence'] >= confidence_threshold]
-
-### 4️⃣ Create a Concatenated Text Column for Better Embeddings
-df['combined_text'] = (
-    "Restaurant: " + df['restaurant_name'] + " | "
-    "Category: " + df['menu_category'] + " | "
-    "Item: " + df['menu_item'] + " | "
-    "Description: " + df['menu_description'] + " | "
-    "Ingredients: " + df['ingredient_name'] + " | "
-    "Location: " + df['city'] + ", " + df['state'] + " | "
-    "Rating: " + df['rating'].astype(str) + " | "
-    "Reviews: " + df['review_count'].astype(str) + " | "
-    "Price: " + df['price'].astype(str)
-)
-
-### 5️⃣ Save the Cleaned CSV
-df.to_csv(output_file, index=False)
-
-print(f"✅ Preprocessing complete! Cleaned data saved as: {output_file}")
+def preprocess_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """All preprocessing steps; every step is row-local, so it works on any chunk of the file."""
+    ### 1️⃣ Handle Missing Values
+    # Fill missing descriptions / ingredient names
+    df = df.fillna({'menu_description': "No description available", 'ingredient_name': "Unknown ingredients"})
+
+    # Drop rows where essential fields are missing (restaurant_name, menu_item, address)
+    df = df.dropna(subset=['restaurant_name', 'menu_item', 'address1'])
+
+    # Apply text cleaning
+    for col in text_columns:
+        df[col] = clean_text_series(df[col])
+
+    ### 3️⃣ Filter Out Low-Confidence Entries
+    df = df[df['confidence'] >= confidence_threshold].copy()
+
+    ### 4️⃣ Create a Concatenated Text Column for Better Embeddings
+    df['combined_text'] = (
+        "Restaurant: " + df['restaurant_name'] + " | "
+        "Category: " + df['menu_category'] + " | "
+        "Item: " + df['menu_item'] + " | "
+        "Description: " + df['menu_description'] + " | "
+        "Ingredients: " + df['ingredient_name'] + " | "
+        "Location: " + df['city'] + ", " + df['state'] + " | "
+        "Rating: " + df['rating'].astype(str) + " | "
+        "Reviews: " + df['review_count'].astype(str) + " | "
+        "Price: " + df['price'].astype(str)
+    )
+    return df
+
+class ChunkWriter:
+    """Appends processed chunks to a CSV or Parquet file as they arrive."""
+
+    def __init__(self, path: str, fmt: str):
+        self.path = path
+        self.fmt = fmt
+        self.rows = 0
+        self._started = False
+        self._parquet = None
+        self._schema = None
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, df: pd.DataFrame):
+        if self.fmt == "parquet":
+            self._write_parquet(df)
+        else:
+            df.to_csv(self.path, mode="a", header=not self._started, index=False)
+        self._started = True
+        self.rows += len(df)
+
+    def _write_parquet(self, df: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Every chunk is written with one schema fixed from the header, never inferred from the
+        # data: a column that is all-NaN in the first chunk may hold text in a later one.
+        if self._parquet is None:
+            self._schema = pa.schema(
+                [(col, pa.float64() if col in numeric_columns else pa.string()) for col in df.columns]
+            )
+            self._parquet = pq.ParquetWriter(self.path, self._schema)
+        df = pd.DataFrame({
+            col: pd.to_numeric(df[col], errors="coerce").astype("float64") if col in numeric_columns
+            else df[col].astype("string")
+            for col in self._schema.names
+        })
+        self._parquet.write_table(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+def preprocess_streaming(input_path: str, output_path: str, chunksize: int = 50000, workers: int = 1,
+                         fmt: str = "csv") -> int:
+    """
+    Process the augmented CSV `chunksize` rows at a time and append each result
+    to the output, optionally on a process pool (at most 2 chunks per worker in
+    flight, written in input order). Memory is bounded by the chunk size.
+    """
+    writer = ChunkWriter(output_path, fmt)
+    reader = pd.read_csv(input_path, chunksize=chunksize)
+    try:
+        if workers <= 1:
+            for chunk in reader:
+                writer.write(preprocess_frame(chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                in_flight = deque()
+                for chunk in reader:
+                    in_flight.append(pool.submit(preprocess_frame, chunk))
+                    if len(in_flight) >= 2 * workers:
+                        writer.write(in_flight.popleft().result())
+                while in_flight:
+                    writer.write(in_flight.popleft().result())
+    finally:
+        writer.close()
+    return writer.rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean the Wikipedia-augmented menu CSV.")
+    parser.add_argument("--input", default=input_file)
+    parser.add_argument("--output", default=None, help=f"Default {output_file} (or .parquet with --format parquet).")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream the input in chunks of this many rows instead of loading it whole.")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for streaming mode.")
+    args = parser.parse_args()
+
+    output_path = args.output or (output_file if args.format == "csv" else output_file.replace(".csv", ".parquet"))
+
+    if args.chunksize:
+        rows = preprocess_streaming(args.input, output_path, args.chunksize, args.workers, args.format)
+    else:
+        # Load the CSV file
+        df = preprocess_frame(pd.read_csv(args.input))
+
+        ### 5️⃣ Save the Cleaned CSV
+        writer = ChunkWriter(output_path, args.format)
+        writer.write(df)
+        writer.close()
+        rows = writer.rows
+
+    print(f"✅ Preprocessing complete! {rows:,} cleaned rows saved as: {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Threads that do work on behalf of a request: query embedding runs on the
+# batcher, sharded vector search on the fan-out pool, web lookups on their own
+# pool. Their stacks are sampled alongside the request thread (they may be
+# serving other requests at the same moment; this is a statistical view).
+HELPER_THREAD_PREFIXES = ("embed-batcher", "shard", "web-search")
+# Leaf frames of a parked helper thread (condition wait, idle pool worker); such
+# samples say nothing about where CPU goes and are dropped
+IDLE_LEAVES = {("wait", "threading.py"), ("get", "queue.py"), ("_worker", "thread.py")}
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+MAX_STACK_DEPTH = 128
+
+FrameKey = Tuple[str, str, int]  # (function, file, first line)
+
+
+def _stack(frame) -> List[FrameKey]:
+    """Function-level stack of `frame`, outermost call first."""
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _idle(stack: List[FrameKey]) -> bool:
+    return not stack or (stack[-1][0], os.path.basename(stack[-1][1])) in IDLE_LEAVES
+
+
+def _label(key: FrameKey) -> str:
+    name, filename, line = key
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class _Session:
+    """Samples collected for one profiled request, per sampled thread."""
+
+    def __init__(self, label: str, thread_id: int, thread_name: str):
+        self.label = label
+        self.thread_id = thread_id
+        self.thread_name = thread_name
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        self.frames: Dict[FrameKey, int] = {}
+        self.samples: Dict[str, list] = {}  # thread name -> [(stack indices, weight ms), ...]
+
+    def add(self, thread_name: str, stack: List[FrameKey], weight_ms: float):
+        indices = [self.frames.setdefault(key, len(self.frames)) for key in stack]
+        self.samples.setdefault(thread_name, []).append((indices, weight_ms))
+
+    def speedscope(self) -> dict:
+        frames = [None] * len(self.frames)
+        for (name, filename, line), index in self.frames.items():
+            frames[index] = {"name": name, "file": filename, "line": line}
+        # Request thread first so speedscope opens on it
+        names = sorted(self.samples, key=lambda name: name != self.thread_name)
+        profiles = []
+        for thread_name in names:
+            samples = self.samples[thread_name]
+            total = sum(weight for _, weight in samples)
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(total, 3),
+                "samples": [stack for stack, _ in samples],
+                "weights": [round(weight, 3) for _, weight in samples],
+            })
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": f"{self.label} @ {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at))}",
+            "exporter": "profiler.py",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+class SamplingProfiler:
+    """
+    Opt-in statistical profiler for live requests.
+
+    With `sample_every` = N > 0, one in N wrapped calls runs profiled: a
+    background thread snapshots the stacks of the request thread (and of
+    HELPER_THREAD_PREFIXES threads) every `interval_ms` via
+    sys._current_frames(), and when the call returns the samples are written
+    as a speedscope file into `out_dir`, keeping the newest `keep` files.
+    Samples are also aggregated per second for hot_functions() over the last
+    `window_s` seconds.
+
+    With sample_every = 0 (the default), wrap() returns the function
+    unchanged and no sampler thread runs.
+    """
+
+    def __init__(self, sample_every: int = None, interval_ms: float = None, out_dir: str = None,
+                 keep: int = None, window_s: float = None,
+                 helper_prefixes: Tuple[str, ...] = HELPER_THREAD_PREFIXES):
+        self.sample_every = sample_every if sample_every is not None else int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))
+        self.interval = (interval_ms or float(os.getenv("PROFILE_INTERVAL_MS", "5"))) / 1000
+        self.out_dir = out_dir or os.getenv("PROFILE_DIR", "profiles")
+        self.keep = keep or int(os.getenv("PROFILE_KEEP", "50"))
+        self.window_s = window_s or float(os.getenv("PROFILE_WINDOW_S", "600"))
+        self.helper_prefixes = helper_prefixes
+        self._calls = itertools.count()
+        self._lock = threading.Lock()
+        self._active: Dict[int, _Session] = {}
+        self._finished: deque = deque()
+        self._buckets: deque = deque()  # (second, self Counter, total Counter, samples)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.profiles_written = 0
+        self.last_profile: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_every > 0
+
+    def configure(self, sample_every: int = None, interval_ms: float = None):
+        """Change the sampling rate at runtime (0 disables; in-progress profiles still finish)."""
+        if interval_ms is not None:
+            self.interval = max(interval_ms, 1.0) / 1000
+        if sample_every is not None:
+            self.sample_every = max(0, int(sample_every))
+        logging.info(
+            f"Profiler {'on: 1 in ' + str(self.sample_every) + ' requests' if self.enabled else 'off'}, "
+            f"every {self.interval * 1000:.0f}ms"
+        )
+
+    # -------------------------
+    # Wrapping
+    # -------------------------
+    def _should_sample(self) -> bool:
+        return self.enabled and next(self._calls) % self.sample_every == 0
+
+    def wrap(self, fn: Callable, label: str = "request") -> Callable:
+        """`fn` itself, or a profiled version of it for 1 in sample_every calls."""
+        if not self._should_sample():
+            return fn
+
+        def profiled(*args, **kwargs):
+            session = self._begin(label)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._end(session)
+
+        return profiled
+
+    def wrap_stream(self, gen_fn: Callable, label: str = "stream") -> Callable:
+        """Like wrap, for generator functions: profiles the thread that iterates the generator."""
+        if not self._should_sample():
+            return gen_fn
+
+        def profiled(*args, **kwargs):
+            session = self._begin(label)
+            try:
+                yield from gen_fn(*args, **kwargs)
+            finally:
+                self._end(session)
+
+        return profiled
+
+    def _begin(self, label: str) -> _Session:
+        thread = threading.current_thread()
+        session = _Session(label, thread.ident, thread.name)
+        with self._lock:
+            self._active[thread.ident] = session
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return session
+
+    def _end(self, session: _Session):
+        session.ended = time.perf_counter()
+        with self._lock:
+            self._active.pop(session.thread_id, None)
+            # Written by the sampler thread, off the request path
+            self._finished.append(session)
+        self._wake.set()
+
+    # -------------------------
+    # Sampling
+    # -------------------------
+    def _helper_threads(self) -> Dict[int, str]:
+        return {
+            thread.ident: thread.name
+            for thread in threading.enumerate()
+            if thread.name.startswith(self.helper_prefixes)
+        }
+
+    def _run(self):
+        helpers, helpers_at = {}, 0.0
+        last = time.perf_counter()
+        while not self._stop.is_set():
+            self._write_finished()
+            with self._lock:
+                sessions = list(self._active.values())
+            if not sessions:
+                # Idle: park until the next profiled request (exit if profiling was turned off)
+                with self._lock:
+                    if not self.enabled and not self._active and not self._finished:
+                        self._thread = None
+                        return
+                self._wake.wait(1.0)
+                self._wake.clear()
+                last = time.perf_counter() - self.interval
+                continue
+
+            now = time.perf_counter()
+            weight_ms = min(now - last, self.interval * 10) * 1000
+            last = now
+            if now - helpers_at > 1.0:
+                helpers, helpers_at = self._helper_threads(), now
+            frames = sys._current_frames()
+            stacks = {ident: _stack(frames[ident]) for ident in helpers if ident in frames}
+            stacks = {ident: stack for ident, stack in stacks.items() if not _idle(stack)}
+            for session in sessions:
+                frame = frames.get(session.thread_id)
+                if frame is not None:
+                    stacks[session.thread_id] = _stack(frame)
+                    session.add(session.thread_name, stacks[session.thread_id], weight_ms)
+                for ident, name in helpers.items():
+                    if ident in stacks:
+                        session.add(name, stacks[ident], weight_ms)
+            del frames
+            self._aggregate(
+                [stacks[s.thread_id] for s in sessions if s.thread_id in stacks]
+                + [stacks[ident] for ident in helpers if ident in stacks]
+            )
+            time.sleep(self.interval)
+        with self._lock:
+            self._thread = None
+
+    def _aggregate(self, stacks: List[List[FrameKey]]):
+        second = int(time.time())
+        with self._lock:
+            if not self._buckets or self._buckets[-1][0] != second:
+                self._buckets.append((second, Counter(), Counter(), [0]))
+            _, self_counts, total_counts, samples = self._buckets[-1]
+            for stack in stacks:
+                if not stack:
+                    continue
+                self_counts[stack[-1]] += 1
+                total_counts.update(set(stack))
+                samples[0] += 1
+            while self._buckets and self._buckets[0][0] < second - self.window_s:
+                self._buckets.popleft()
+
+    # -------------------------
+    # Output
+    # -------------------------
+    def _write_finished(self):
+        while True:
+            with self._lock:
+                if not self._finished:
+                    return
+                session = self._finished.popleft()
+            if not session.samples:
+                continue
+            try:
+                self._write(session)
+            except Exception as e:
+                logging.error(f"Could not write profile: {e}")
+
+    def _write(self, session: _Session):
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(session.started_at))
+        duration_ms = ((session.ended or time.perf_counter()) - session.started) * 1000
+        path = os.path.join(
+            self.out_dir,
+            f"{stamp}-{int(session.started_at * 1000) % 1000:03d}-{session.label}-{duration_ms:.0f}ms.speedscope.json",
+        )
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(session.speedscope(), f)
+        os.replace(tmp_path, path)
+        self.profiles_written += 1
+        self.last_profile = path
+        logging.info(f"Profile written: {path}")
+
+        # Rotate: keep the newest `keep` profiles
+        profiles = sorted(
+            (name for name in os.listdir(self.out_dir) if name.endswith(".speedscope.json")),
+            key=lambda name: os.path.getmtime(os.path.join(self.out_dir, name)),
+        )
+        for name in profiles[: max(0, len(profiles) - self.keep)]:
+            try:
+                os.remove(os.path.join(self.out_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def hot_functions(self, window_s: float = None, limit: int = 30) -> dict:
+        """
+        Functions by share of samples over the last `window_s` seconds:
+        `self` counts samples where the function was on top of the stack,
+        `total` where it was anywhere on it.
+        """
+        window_s = min(window_s or self.window_s, self.window_s)
+        since = int(time.time()) - window_s
+        self_counts, total_counts, samples = Counter(), Counter(), 0
+        with self._lock:
+            for second, bucket_self, bucket_total, bucket_samples in self._buckets:
+                if second >= since:
+                    self_counts.update(bucket_self)
+                    total_counts.update(bucket_total)
+                    samples += bucket_samples[0]
+        return {
+            "window_s": window_s,
+            "samples": samples,
+            "functions": [
+                {
+                    "function": _label(key),
+                    "self": count,
+                    "self_pct": round(100 * count / samples, 2),
+                    "total": total_counts[key],
+                    "total_pct": round(100 * total_counts[key] / samples, 2),
+                }
+                for key, count in self_counts.most_common(limit)
+            ],
+        }
+
+    def status(self) -> dict:
+        with self._lock:
+            active = len(self._active)
+        return {
+            "enabled": self.enabled,
+            "sample_every": self.sample_every,
+            "interval_ms": round(self.interval * 1000, 2),
+            "out_dir": self.out_dir,
+            "keep": self.keep,
+            "active": active,
+            "profiles_written": self.profiles_written,
+            "last_profile": self.last_profile,
+        }
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
@@ -0,0 +1,278 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+SYSTEM_PROMPT = """You are a helpful and conversational restaurant expert.
+
+If the user says 'hi', 'hello', or a similar greeting, respond with a friendly greeting in return.
+You do not need to perform any searches or provide sources for greetings.
+Just be polite and acknowledge them.
+
+For restaurant-related questions, prioritize using the local menu data provided below when relevant.
+If the local data is not relevant or doesn't contain the answer, then use the web search results.
+ALWAYS include source links when using web search results."""
+NO_CONTEXT = "No relevant context found locally or online."
+
+
+def format_message(msg: dict) -> str:
+    """One chat message in Mistral instruct format."""
+    if msg["role"] == "user":
+        return f"<s>[INST] {msg['content']} [/INST]"
+    return f"{msg['content']} </s>"
+
+
+class TokenCounter:
+    """
+    Token counts with the tokenizer of the inference model (tokenizer.json
+    from the Hub, via `tokenizers`), falling back to ~4 characters per token
+    when it can't be loaded. Counts are memoized per text.
+    """
+
+    def __init__(self, model_id: str, token: str = None):
+        self.model_id = model_id
+        self.token = token
+        self._tokenizer = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._count = lru_cache(maxsize=4096)(self._count_uncached)
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                from huggingface_hub import hf_hub_download
+                from tokenizers import Tokenizer
+
+                path = hf_hub_download(self.model_id, "tokenizer.json", token=self.token)
+                self._tokenizer = Tokenizer.from_file(path)
+                logging.info(f"Prompt token counts use the {self.model_id} tokenizer")
+            except Exception as e:
+                logging.warning(f"Tokenizer for {self.model_id} unavailable ({e}); estimating 4 chars per token")
+
+    @property
+    def exact(self) -> bool:
+        return self._tokenizer is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        self.load()
+        return self._count(text)
+
+    def count_uncached(self, text: str) -> int:
+        self.load()
+        return self._count_uncached(text)
+
+    def _count_uncached(self, text: str) -> int:
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+        return (len(text) + 3) // 4
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of `text` within max_tokens, cut at a token (or character) boundary."""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        if self._tokenizer is not None:
+            offsets = self._tokenizer.encode(text, add_special_tokens=False).offsets
+            return text[: offsets[max_tokens - 1][1]].rstrip() + " …"
+        return text[: max_tokens * 4].rstrip() + " …"
+
+
+@dataclass
+class HistoryPart:
+    """The history half of a prompt: rolling summary of older turns plus recent turns verbatim."""
+    summary: str = ""
+    recent: str = ""
+    tokens: Dict[str, int] = field(default_factory=dict)
+
+    def text(self) -> str:
+        return self.summary + "\n" + self.recent if self.summary else self.recent
+
+
+@dataclass
+class BuiltPrompt:
+    prompt: str
+    tokens: Dict[str, int]
+    passages_used: int = 0
+
+
+class PromptBuilder:
+    """
+    Assembles the Mistral prompt within a token budget.
+
+    The budget (`max_tokens`) is split between the fixed system text, the
+    question, history (at most `history_tokens`, of which up to
+    `summary_tokens` for the summary) and retrieved context (at most
+    `context_tokens`, plus whatever history left unused).
+
+    Recent messages are kept verbatim newest-first while they fit; older
+    ones are folded into a rolling extractive summary (question plus the
+    first sentence of each answer). Summaries are cached by the messages
+    they cover, so each request only summarizes the turns that just fell
+    out of the verbatim window. Passages are taken in relevance order and
+    the last one that doesn't fit whole is truncated.
+    """
+
+    def __init__(self, counter: TokenCounter, max_tokens: int = None, history_tokens: int = None,
+                 summary_tokens: int = None, context_tokens: int = None, summary_cache_size: int = 1024):
+        self.counter = counter
+        self.max_tokens = max_tokens or int(os.getenv("PROMPT_MAX_TOKENS", "3000"))
+        self.history_tokens = history_tokens if history_tokens is not None else int(os.getenv("PROMPT_HISTORY_TOKENS", "800"))
+        self.summary_tokens = summary_tokens if summary_tokens is not None else int(os.getenv("PROMPT_SUMMARY_TOKENS", "200"))
+        self.context_tokens = context_tokens if context_tokens is not None else int(os.getenv("PROMPT_CONTEXT_TOKENS", "1600"))
+        self.min_passage_tokens = 48
+        self._summaries = OrderedDict()  # hash of summarized messages -> summary
+        self._summary_cache_size = summary_cache_size
+        self._lock = threading.Lock()
+
+    # -------------------------
+    # History
+    # -------------------------
+    def history(self, messages: List[dict]) -> HistoryPart:
+        """Summary + verbatim recent turns within the history budget."""
+        budget = self.history_tokens
+        recent, used = [], 0
+        cut = len(messages)
+        for i in range(len(messages) - 1, -1, -1):
+            line = format_message(messages[i])
+            tokens = self.counter.count(line)
+            # Always keep at least the last message, trimmed if necessary
+            if not recent and tokens > budget - self.summary_tokens:
+                line = self.counter.truncate(line, max(0, budget - self.summary_tokens))
+                tokens = self.counter.count(line)
+            if used + tokens > budget - (self.summary_tokens if i > 0 else 0):
+                break
+            recent.append(line)
+            used += tokens
+            cut = i
+
+        summary = self._summary(messages[:cut]) if cut > 0 else ""
+        summary_tokens = self.counter.count(summary)
+        part = HistoryPart(summary=summary, recent="\n".join(reversed(recent)))
+        part.tokens = {"summary": summary_tokens, "history": used}
+        return part
+
+    def _summary(self, messages: List[dict]) -> str:
+        """
+        Rolling summary of `messages`: start from the longest prefix whose
+        summary is cached, then fold in one exchange at a time (caching each).
+        """
+        starts = [i for i, msg in enumerate(messages) if msg["role"] == "user" and i > 0]
+        ends = starts + [len(messages)]
+
+        summary, done = "", 0
+        with self._lock:
+            for end in reversed(ends):
+                cached = self._summaries.get(_messages_key(messages[:end]))
+                if cached is not None:
+                    self._summaries.move_to_end(_messages_key(messages[:end]))
+                    summary, done = cached, end
+                    break
+
+        for end in ends:
+            if end <= done:
+                continue
+            lines = summary.splitlines()[1:] if summary else []
+            lines.extend(_summarize_turn(messages[done:end]))
+            # Oldest lines go first when the summary outgrows its budget
+            while lines and self.counter.count(_render_summary(lines)) > self.summary_tokens:
+                lines.pop(0)
+            summary = _render_summary(lines) if lines else ""
+            with self._lock:
+                self._summaries[_messages_key(messages[:end])] = summary
+                while len(self._summaries) > self._summary_cache_size:
+                    self._summaries.popitem(last=False)
+            done = end
+        return summary
+
+    # -------------------------
+    # Whole prompt
+    # -------------------------
+    def build(self, history: HistoryPart, passages: List[str], user_query: str,
+              context_header: str = "") -> BuiltPrompt:
+        """Prompt with as many passages (best first) as the context budget allows."""
+        system_tokens = self.counter.count(SYSTEM_PROMPT)
+        question_tokens = self.counter.count(user_query)
+        history_tokens = history.tokens.get("summary", 0) + history.tokens.get("history", 0)
+        available = self.max_tokens - system_tokens - question_tokens - history_tokens
+        budget = max(0, min(self.context_tokens + max(0, self.history_tokens - history_tokens), available))
+
+        used, kept = 0, []
+        if context_header:
+            used += self.counter.count(context_header)
+        for passage in passages:
+            tokens = self.counter.count(passage)
+            if used + tokens > budget:
+                remaining = budget - used
+                if remaining >= self.min_passage_tokens:
+                    passage = self.counter.truncate(passage, remaining)
+                    kept.append(passage)
+                    used += self.counter.count(passage)
+                break
+            kept.append(passage)
+            used += tokens
+
+        if kept:
+            context = (context_header + "\n" if context_header else "") + "\n\n".join(kept)
+        else:
+            context, used = NO_CONTEXT, self.counter.count(NO_CONTEXT)
+        summary_block = f"{history.summary}\n\n" if history.summary else ""
+
+        prompt = f"""{history.recent}
+<s>[INST] {SYSTEM_PROMPT}
+
+{summary_block}Local Menu Data Context:
+{context}
+
+Current Question: {user_query}
+[/INST]"""
+        tokens = {
+            "system": system_tokens,
+            "summary": history.tokens.get("summary", 0),
+            "history": history.tokens.get("history", 0),
+            "context": used,
+            "question": question_tokens,
+        }
+        # Whole prompts are unique, so they bypass the memoized counter
+        tokens["total"] = self.counter.count_uncached(prompt)
+        return BuiltPrompt(prompt=prompt, tokens=tokens, passages_used=len(kept))
+
+
+def _messages_key(messages: List[dict]) -> str:
+    digest = hashlib.sha1()
+    for msg in messages:
+        digest.update(f"{msg['role']}\x00{msg['content']}\x01".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _first_sentence(text: str, max_chars: int = 160) -> str:
+    text = re.sub(r"\s+", " ", text).strip()
+    sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars].rstrip() + "…"
+
+
+def _summarize_turn(messages: List[dict]) -> List[str]:
+    """One summary line per exchange: the question and the gist of the answer."""
+    lines = []
+    for msg in messages:
+        if msg["role"] == "user":
+            lines.append(f"- User asked: {_first_sentence(msg['content'])}")
+        elif lines:
+            lines[-1] += f" Answer: {_first_sentence(msg['content'])}"
+        else:
+            lines.append(f"- Assistant said: {_first_sentence(msg['content'])}")
+    return lines
+
+
+def _render_summary(lines: List[str]) -> str:
+    return "Summary of earlier turns:\n" + "\n".join(lines)
@@ -0,0 +1,232 @@
+import json
+import os
+import re
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+US_STATES = {
+    "al": "alabama", "ak": "alaska", "az": "arizona", "ar": "arkansas", "ca": "california",
+    "co": "colorado", "ct": "connecticut", "de": "delaware", "dc": "district of columbia",
+    "fl": "florida", "ga": "georgia", "hi": "hawaii", "id": "idaho", "il": "illinois",
+    "in": "indiana", "ia": "iowa", "ks": "kansas", "ky": "kentucky", "la": "louisiana",
+    "me": "maine", "md": "maryland", "ma": "massachusetts", "mi": "michigan", "mn": "minnesota",
+    "ms": "mississippi", "mo": "missouri", "mt": "montana", "ne": "nebraska", "nv": "nevada",
+    "nh": "new hampshire", "nj": "new jersey", "nm": "new mexico", "ny": "new york",
+    "nc": "north carolina", "nd": "north dakota", "oh": "ohio", "ok": "oklahoma", "or": "oregon",
+    "pa": "pennsylvania", "ri": "rhode island", "sc": "south carolina", "sd": "south dakota",
+    "tn": "tennessee", "tx": "texas", "ut": "utah", "vt": "vermont", "va": "virginia",
+    "wa": "washington", "wv": "west virginia", "wi": "wisconsin", "wy": "wyoming",
+}
+GAZETTEER_FILE = "locations.json"
+
+# An amount, with or without "$" / a currency word, that isn't a count of something else
+# ("over 4 stars", "more than 100 reviews")
+_NUMBER = (
+    r"\$?\s*(\d+(?:\.\d+)?)(?!\.?\d)\s*(?:dollars|bucks|usd)?"
+    r"(?!\s*\+?\s*(?:stars?|reviews?|ratings?|miles?|minutes?|mins?|people|percent|%))"
+)
+_NOT_RATING = r"(?<!rated )(?<!rating )"  # "rated at least 4" is a rating
+_MAX_PRICE = re.compile(_NOT_RATING + r"\b(?:under|below|less than|cheaper than|at most|max(?:imum)?|up to)\s+" + _NUMBER)
+_MIN_PRICE = re.compile(_NOT_RATING + r"\b(?:over|above|more than|at least)\s+" + _NUMBER)
+_PRICE_RANGE = re.compile(r"\bbetween\s+" + _NUMBER + r"\s+and\s+" + _NUMBER)
+_MIN_RATING = [
+    re.compile(r"\b(?:rated|rating)\s+(?:of\s+|above\s+|over\s+|at least\s+)?(\d(?:\.\d)?)"),
+    re.compile(r"\b(\d(?:\.\d)?)\s*\+?\s*stars?\b"),
+]
+_CHEAP = re.compile(r"\b(?:cheap|inexpensive|budget|affordable)\b")
+_HIGHLY_RATED = re.compile(r"\b(?:highly rated|top rated|best rated|well rated)\b")
+# Words that also name dishes or ingredients ("buffalo wings", "orange chicken", "texas toast",
+# "new york style pizza"): a city or state containing one only counts next to a location cue
+MENU_TERMS = frozenset("""
+    apple bacon bean beef boston bread buffalo butter cajun cake california carolina cheese cherry
+    chicken chili coney corn cream creole denver fish frankfurt garlic georgia ginger ham hamburg
+    honey hot jamaica kansas kentucky key lemon lime louisiana maine maryland memphis nashville naples
+    napa olive orange peach pepper philadelphia philly pie plum pork rice salmon sandwich sonoma sweet
+    tampa texas turkey vienna wing wings york
+""".split())
+_LOCATION_CUE = r"\b(?:in|near|around|at)\s+(?:the\s+|downtown\s+)?"
+_STATE_SUFFIX = r"\s*,\s*(?:" + "|".join(sorted(list(US_STATES) + list(US_STATES.values()), key=len, reverse=True)) + r")\b"
+
+
+def normalize_location(value: str) -> str:
+    """Same normalization preprocess_csv.py applies to city/state: lowercase, no punctuation."""
+    return re.sub(r"[^\w\s]", "", str(value).lower()).strip()
+
+
+@dataclass
+class QueryConstraints:
+    """Structured constraints found in a question; values use the stored metadata spelling."""
+    city: Optional[str] = None
+    state: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    max_price_tier: Optional[int] = None
+    min_rating: Optional[float] = None
+
+    @property
+    def is_empty(self) -> bool:
+        return all(v is None for v in vars(self).values())
+
+    def relaxations(self) -> List["QueryConstraints"]:
+        """Looser constraints to retry with when these match too little: without the city, then none."""
+        steps = []
+        if self.city is not None and not replace(self, city=None).is_empty:
+            steps.append(replace(self, city=None))
+        if not self.is_empty:
+            steps.append(QueryConstraints())
+        return steps
+
+    def where(self) -> Optional[dict]:
+        """Chroma `where` filter for these constraints (None when unconstrained)."""
+        clauses = []
+        if self.city is not None:
+            clauses.append({"city": self.city})
+        if self.state is not None:
+            clauses.append({"state": self.state})
+        if self.min_price is not None:
+            clauses.append({"price_value": {"$gte": self.min_price}})
+        if self.max_price is not None:
+            clauses.append({"price_value": {"$lte": self.max_price}})
+        if self.max_price_tier is not None:
+            clauses.append({"price_tier": {"$lte": self.max_price_tier}})
+        if self.min_rating is not None:
+            clauses.append({"rating": {"$gte": self.min_rating}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def matches(self, metadata: dict) -> bool:
+        """Evaluate the same constraints in Python (for BM25 hits and benchmarks)."""
+        def number(key):
+            try:
+                value = float(metadata.get(key))
+            except (TypeError, ValueError):
+                return None
+            return None if value != value else value  # NaN
+
+        checks = [
+            (self.city, lambda: metadata.get("city") == self.city),
+            (self.state, lambda: metadata.get("state") == self.state),
+            (self.min_price, lambda: number("price_value") is not None and number("price_value") >= self.min_price),
+            (self.max_price, lambda: number("price_value") is not None and number("price_value") <= self.max_price),
+            (self.max_price_tier, lambda: number("price_tier") is not None and number("price_tier") <= self.max_price_tier),
+            (self.min_rating, lambda: number("rating") is not None and number("rating") >= self.min_rating),
+        ]
+        return all(check() for value, check in checks if value is not None)
+
+
+class QueryParser:
+    """
+    Pulls location, price and rating constraints out of a question.
+
+    Locations are only recognised when they appear in the gazetteer of city
+    and state values actually present in the index (written at ingest time),
+    so "pizza in a bowl" never turns into a city filter and the filter value
+    always matches the stored spelling. A city whose name shares a word with
+    MENU_TERMS also needs a cue ("in Buffalo", "Buffalo, NY"), so "buffalo
+    wings" stays a dish; so does a state ("in Texas", "Austin, Texas"), so
+    "Texas toast" does.
+    """
+
+    def __init__(self, cities: Dict[str, str] = None, states: Dict[str, str] = None):
+        # normalized name -> stored metadata value
+        self.cities = cities or {}
+        self.states = states or {}
+        for stored in list(self.states.values()):
+            code = normalize_location(stored)
+            if code in US_STATES:
+                self.states.setdefault(US_STATES[code], stored)
+            for abbr, name in US_STATES.items():
+                if code == name:
+                    self.states.setdefault(abbr, stored)
+        # Longest names first so "west palm beach" wins over "palm beach"
+        self._city_names = sorted(self.cities, key=len, reverse=True)
+
+    @classmethod
+    def from_gazetteer(cls, path: str) -> "QueryParser":
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            gazetteer = json.load(f)
+        return cls(
+            {normalize_location(c): c for c in gazetteer.get("cities", [])},
+            {normalize_location(s): s for s in gazetteer.get("states", [])},
+        )
+
+    def parse(self, query: str) -> QueryConstraints:
+        constraints = QueryConstraints()
+        text = " " + normalize_location(query) + " "
+        raw = query.lower()
+
+        for name in self._city_names:
+            if f" {name} " in text and (MENU_TERMS.isdisjoint(name.split()) or self._has_location_cue(name, query)):
+                constraints.city = self.cities[name]
+                break
+
+        for name, stored in self.states.items():
+            # Two-letter codes only count in their usual "City, ST" / "in ST" positions
+            if len(name) == 2:
+                if re.search(rf"(?:,\s*|\bin\s+){name.upper()}\b", query):
+                    constraints.state = stored
+                    break
+            elif (
+                f" {name} " in text
+                and not (constraints.city and name in normalize_location(constraints.city))
+                and (MENU_TERMS.isdisjoint(name.split()) or self._has_location_cue(name, query))
+            ):
+                constraints.state = stored
+                break
+
+        price_range = _PRICE_RANGE.search(raw)
+        if price_range:
+            constraints.min_price, constraints.max_price = sorted(map(float, price_range.groups()))
+        else:
+            max_price = _MAX_PRICE.search(raw)
+            if max_price:
+                constraints.max_price = float(max_price.group(1))
+            min_price = _MIN_PRICE.search(raw)
+            if min_price:
+                constraints.min_price = float(min_price.group(1))
+        if constraints.max_price is None and _CHEAP.search(raw):
+            constraints.max_price_tier = 1
+
+        for pattern in _MIN_RATING:
+            rating = pattern.search(raw)
+            if rating and float(rating.group(1)) <= 5:
+                constraints.min_rating = float(rating.group(1))
+                break
+        if constraints.min_rating is None and _HIGHLY_RATED.search(raw):
+            constraints.min_rating = 4.0
+
+        return constraints
+
+    @staticmethod
+    def _has_location_cue(name: str, query: str) -> bool:
+        """True if `name` follows "in"/"near"/"around"/"at" or a comma ("Austin, Texas"), or precedes a ", ST" suffix."""
+        text = re.sub(r"[^\w\s,]", "", query.lower())
+        name = re.escape(name)
+        return bool(
+            re.search(rf"(?:{_LOCATION_CUE}|,\s*){name}\b", text) or re.search(rf"\b{name}{_STATE_SUFFIX}", text)
+        )
+
+
+def build_gazetteer(vectordb, path: str, page_size: int = 10000) -> dict:
+    """Write the distinct city/state metadata values of a Chroma collection to `path`."""
+    cities, states = set(), set()
+    offset = 0
+    while True:
+        page = vectordb.get(include=["metadatas"], limit=page_size, offset=offset)
+        for metadata in page["metadatas"]:
+            metadata = metadata or {}
+            if isinstance(metadata.get("city"), str):
+                cities.add(metadata["city"])
+            if isinstance(metadata.get("state"), str):
+                states.add(metadata["state"])
+        if len(page["ids"]) < page_size:
+            break
+        offset += page_size
+    gazetteer = {"cities": sorted(cities), "states": sorted(states)}
+    with open(path + ".tmp", "w") as f:
+        json.dump(gazetteer, f)
+    os.replace(path + ".tmp", path)
+    return gazetteer
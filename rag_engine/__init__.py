@@ -0,0 +1,40 @@
+"""
+Shared RAG core used by every front end: one engine (models, indexes,
+caches, feedback store) per process.
+
+    from rag_engine import get_engine
+    engine = get_engine()
+    engine.start()
+    history, metadata, sources = engine.respond("Where can I find Pad Thai?", [])
+"""
+from feedback_store import FeedbackStore
+from prompt_builder import PromptBuilder, TokenCounter
+
+from .engine import (
+    GREETING_RESPONSE,
+    EngineNotReady,
+    RagEngine,
+    RagTurn,
+    append_turn,
+    get_engine,
+)
+from .generator import GENERATION_KWARGS, Generator
+from .retriever import RELEVANCE_THRESHOLD, RETRIEVAL_K, Retrieval, Retriever
+
+__all__ = [
+    "EngineNotReady",
+    "FeedbackStore",
+    "GENERATION_KWARGS",
+    "GREETING_RESPONSE",
+    "Generator",
+    "PromptBuilder",
+    "RELEVANCE_THRESHOLD",
+    "RETRIEVAL_K",
+    "RagEngine",
+    "RagTurn",
+    "Retrieval",
+    "Retriever",
+    "TokenCounter",
+    "append_turn",
+    "get_engine",
+]
@@ -0,0 +1,305 @@
+"""
+HTTP API over the shared engine, mounted by every front end (app.py serves it
+next to the React build, r1_smolagent_rag.py next to the Gradio UI):
+
+    from rag_engine.api import api_router, start_services, stop_services
+    app.include_router(api_router)
+    app.add_event_handler("startup", start_services)
+    app.add_event_handler("shutdown", stop_services)
+
+Importing this module creates the engine (get_engine()), the chat executor
+that bounds concurrent RAG requests, the opt-in sampling profiler and the
+request metrics, once per process. Raises if HUGGINGFACE_API_TOKEN is
+missing, or both INDEX_SNAPSHOT_URL and CHROMA_DB_GDRIVE_URL.
+"""
+import hmac
+import json
+import logging
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+import metrics
+from chat_executor import ChatExecutor, ChatOverloaded
+from profiler import SamplingProfiler
+
+from .engine import EngineNotReady, get_engine
+
+engine = get_engine()
+startup = engine.startup
+
+# Bounded worker pool for the blocking RAG pipeline (CHAT_MAX_WORKERS / CHAT_MAX_QUEUE)
+chat_executor = ChatExecutor()
+
+# Opt-in sampling profiler: 1 in PROFILE_SAMPLE_EVERY chat requests (0 = off, the default)
+profiler = SamplingProfiler()
+
+def start_services():
+    """Bind first; the index download, model loads and warm-up run in the background."""
+    engine.start()
+
+def stop_services():
+    chat_executor.shutdown()
+    profiler.shutdown()
+    engine.close()
+
+# Request-level metrics; pipeline stages are recorded by the engine (see metrics.py)
+CHAT_REQUEST_SECONDS = metrics.REGISTRY.histogram(
+    "rag_chat_request_seconds", "Chat request time on a worker (excludes queue wait).", ["endpoint"]
+)
+CHAT_QUEUE_WAIT_SECONDS = metrics.REGISTRY.histogram(
+    "rag_chat_queue_wait_seconds", "Time chat requests waited for a worker.", ["endpoint"]
+)
+CHAT_REJECTED = metrics.REGISTRY.counter(
+    "rag_chat_rejected_total", "Chat requests shed with 503.", ["reason"]
+)
+metrics.REGISTRY.callback("rag_chat_in_flight", "Chat requests running on a worker.", lambda: chat_executor.in_flight)
+metrics.REGISTRY.callback("rag_chat_queue_depth", "Chat requests waiting for a worker.", lambda: chat_executor.queue_depth)
+metrics.REGISTRY.callback("rag_ready", "1 once background startup has finished.", lambda: int(startup.ready))
+metrics.REGISTRY.callback(
+    "rag_cache_stat",
+    "Answer/embedding/shard/web-search cache counters, as in /api/cache/stats.",
+    lambda: {
+        (cache, stat): value
+        for cache, stats in engine.stats().items() if stats
+        for stat, value in stats.items() if isinstance(value, (int, float)) and not isinstance(value, bool)
+    },
+    labelnames=["cache", "stat"],
+)
+
+def record_timing(endpoint: str, timing):
+    logging.info(
+        f"Chat timing ({endpoint}): queue_wait={timing.queue_wait_ms:.1f}ms service={timing.service_ms:.1f}ms"
+    )
+    CHAT_QUEUE_WAIT_SECONDS.observe(timing.queue_wait_ms / 1000, endpoint=endpoint)
+    CHAT_REQUEST_SECONDS.observe(timing.service_ms / 1000, endpoint=endpoint)
+
+async def respond(user_message: str, history: list, endpoint: str = "chat"):
+    """
+    engine.respond on the chat executor (admission control, queue metrics,
+    sampling profiler). Returns ((history, metadata, sources), ChatTiming);
+    raises ChatOverloaded when the queue is full. Every front end's chat
+    path goes through here rather than calling the engine directly.
+    """
+    try:
+        result, timing = await chat_executor.run(profiler.wrap(engine.respond, endpoint), user_message, history)
+    except ChatOverloaded:
+        CHAT_REJECTED.inc(reason="overloaded")
+        raise
+    record_timing(endpoint, timing)
+    return result, timing
+
+# -------------------------
+# API routes, shared by every front end
+# -------------------------
+api_router = APIRouter()
+
+WARMUP_RETRY_AFTER = 5
+
+def not_ready_response() -> Optional[JSONResponse]:
+    """503 for chat requests until background startup has finished (None once ready)."""
+    if startup.ready:
+        return None
+    CHAT_REJECTED.inc(reason="not_ready")
+    if startup.failed:
+        detail = f"❌ Service failed to start: {startup.error}"
+    else:
+        detail = f"Service is warming up ({startup.state}), please retry in a few seconds."
+    return JSONResponse(
+        status_code=503,
+        content={"detail": detail, "status": startup.state},
+        headers={"Retry-After": str(WARMUP_RETRY_AFTER)},
+    )
+
+@api_router.get("/healthz")
+async def healthz_endpoint():
+    """Liveness: the process is up and serving HTTP, whether or not startup has finished."""
+    return {"status": "ok"}
+
+@api_router.get("/readyz")
+async def readyz_endpoint():
+    """Readiness: 200 once the index, embedder and warm-up are done, 503 before (or on failure)."""
+    return JSONResponse(status_code=200 if startup.ready else 503, content=startup.status())
+
+@api_router.post("/api/chat")
+async def api_chat_endpoint(payload: dict, response: Response, timings: bool = False):
+    """
+    Expects JSON:
+    {
+      "message": "User query string",
+      "history": [{role: "user"/"assistant", content: "..."}]
+    }
+    Returns JSON:
+    {
+      "response": "<assistant response>",
+      "sources": [...],
+      "history": updated_history,
+      "prompt_tokens": {"system": .., "summary": .., "history": .., "context": .., "question": .., "total": ..},
+      "timings": {"queue_wait_ms": .., "stages_ms": {"embed": .., "vector_search": .., ...}, "total_ms": ..}
+    }
+    "timings" is only included with ?timings=true.
+    Responds 503 with Retry-After when the chat queue is full or the service is still warming up.
+    """
+    not_ready = not_ready_response()
+    if not_ready is not None:
+        return not_ready
+    try:
+        user_message = payload.get("message", "")
+        history = payload.get("history", [])
+        (updated_history, metadata, sources), timing = await respond(user_message, history)
+        response.headers["Server-Timing"] = timing.server_timing()
+        body = {
+            "response": metadata["response"],
+            "sources": sources,
+            "history": updated_history,
+            "prompt_tokens": metadata.get("prompt_tokens", {})
+        }
+        if timings:
+            body["timings"] = {"queue_wait_ms": round(timing.queue_wait_ms, 2), **metadata.get("timings", {})}
+        return body
+    except ChatOverloaded as e:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except Exception as e:
+        logging.exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@api_router.post("/api/chat/stream")
+async def api_chat_stream_endpoint(payload: dict, timings: bool = False):
+    """
+    Same request body as /api/chat, answered as a text/event-stream:
+      event: sources  data: [...]                       (right after retrieval)
+      event: token    data: "<text>"                    (one per generated token)
+      event: error    data: {"detail": "..."}           (only on failure)
+      event: done     data: {"response": "...", "history": [...], "prompt_tokens": {...}}
+                      (plus "timings": {"stages_ms": {...}, "total_ms": ..} with ?timings=true)
+    Responds 503 with Retry-After when the chat queue is full or the service is still warming up.
+    """
+    not_ready = not_ready_response()
+    if not_ready is not None:
+        return not_ready
+    user_message = payload.get("message", "")
+    history = payload.get("history", [])
+
+    try:
+        events = chat_executor.stream(
+            profiler.wrap_stream(engine.respond_stream, "stream"), user_message, history,
+            on_timing=lambda timing: record_timing("stream", timing),
+        )
+    except ChatOverloaded as e:
+        CHAT_REJECTED.inc(reason="overloaded")
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    async def event_source():
+        async for event, data in events:
+            if event == "done" and not timings:
+                data = {key: value for key, value in data.items() if key != "timings"}
+            yield sse_event(event, data)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api_router.post("/api/feedback")
+async def api_feedback_endpoint(payload: dict):
+    """
+    Expects JSON:
+    {
+      "query": "User's original question",
+      "response": "Assistant's response",
+      "type": "Good" or "Bad"
+    }
+    """
+    try:
+        engine.save_feedback(payload["query"], payload["response"], payload["type"])
+        return {"status": "success"}
+    except Exception as e:
+        logging.exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/api/feedback/stats")
+async def api_feedback_stats_endpoint(limit: int = 100, min_votes: int = 1):
+    """Overall Good/Bad rate plus per-query counts, most-voted queries first."""
+    return {
+        "summary": engine.feedback_store.summary(),
+        "queries": engine.feedback_store.rates_by_query(limit=limit, min_votes=min_votes),
+    }
+
+@api_router.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text exposition: stage latency histograms, turn/cache counters, queue gauges."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+@api_router.get("/api/cache/stats")
+async def api_cache_stats_endpoint():
+    """Answer cache, query-embedding cache, vector-store shard and web search counters."""
+    return engine.stats()
+
+# -------------------------
+# Admin: profiler and index control (needs ADMIN_TOKEN set, sent as X-Admin-Token)
+# -------------------------
+def require_admin(token: Optional[str]):
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set).")
+    if not token or not hmac.compare_digest(token, admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+@api_router.get("/admin/profiler")
+async def admin_profiler_status_endpoint(x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    return profiler.status()
+
+@api_router.post("/admin/profiler")
+async def admin_profiler_configure_endpoint(payload: dict, x_admin_token: Optional[str] = Header(None)):
+    """
+    Expects JSON: {"sample_every": N, "interval_ms": 5}
+    N = 0 turns profiling off; either field may be omitted.
+    """
+    require_admin(x_admin_token)
+    try:
+        profiler.configure(sample_every=payload.get("sample_every"), interval_ms=payload.get("interval_ms"))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return profiler.status()
+
+@api_router.get("/admin/profiler/report")
+async def admin_profiler_report_endpoint(window_s: float = None, limit: int = 30,
+                                         x_admin_token: Optional[str] = Header(None)):
+    """Hottest functions (self and inclusive sample share) over the last window_s seconds."""
+    require_admin(x_admin_token)
+    return profiler.hot_functions(window_s=window_s, limit=limit)
+
+@api_router.get("/admin/index")
+async def admin_index_status_endpoint(x_admin_token: Optional[str] = Header(None)):
+    """Snapshot version in use, last check and what the last update fetched."""
+    require_admin(x_admin_token)
+    if engine.snapshots is None:
+        raise HTTPException(status_code=404, detail="Index snapshots are not configured (INDEX_SNAPSHOT_URL).")
+    return engine.snapshots.status()
+
+@api_router.post("/admin/index/refresh")
+def admin_index_refresh_endpoint(x_admin_token: Optional[str] = Header(None)):
+    """Switch to the latest index snapshot now (blocking; runs in the threadpool)."""
+    require_admin(x_admin_token)
+    try:
+        return engine.refresh_index()
+    except EngineNotReady as e:
+        return JSONResponse(status_code=503, content={"detail": str(e)}, headers={"Retry-After": str(WARMUP_RETRY_AFTER)})
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
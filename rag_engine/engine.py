@@ -0,0 +1,430 @@
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from answer_cache import AnswerCache, history_scope
+from embedding_backends import build_embeddings
+from embedding_service import EmbeddingService
+from feedback_store import FeedbackStore
+from index_snapshot import SnapshotSync, open_source
+from metrics import ANSWER_CACHE, PROMPT_SECTION_TOKENS, PROMPT_TOKENS, TURNS, Trace
+from model_registry import DEFAULT_MODEL_ID, ModelRegistry
+from prompt_builder import PromptBuilder, TokenCounter
+from query_parser import GAZETTEER_FILE, QueryParser
+from reranker import build_reranker
+from shard_router import ShardRouter
+from startup import StartupState, download_index_if_needed
+from web_search import WebSearch
+
+from .generator import NO_RESPONSE, Generator
+from .retriever import Retriever
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_DIR = os.path.join(ROOT_DIR, "chroma_db")
+SNAPSHOT_DIR = os.path.join(ROOT_DIR, "index_snapshots")
+FEEDBACK_FILE = "feedback.json"  # legacy JSON array, imported once into the store
+GREETING_WORDS = ["hi", "hello", "hey", "greetings", "good morning", "good afternoon", "good evening"]
+GREETING_RESPONSE = "Hello! 👋 How can I help you with restaurant information today?"
+WARMUP_QUERY = "restaurant menu"
+RETIRE_AFTER_S = 60  # a replaced index stays open this long for requests still using it
+
+
+class EngineNotReady(RuntimeError):
+    """Raised for questions asked before background startup has finished."""
+
+
+def append_turn(history: List[dict], user_query: str, bot_response: str) -> List[dict]:
+    """Return history extended with one user/assistant exchange."""
+    return history + [
+        {"role": "user", "content": user_query},
+        {"role": "assistant", "content": bot_response}
+    ]
+
+
+@dataclass
+class RagTurn:
+    """Everything prepare_turn works out before generation."""
+    prompt: Optional[str] = None
+    sources: List[dict] = field(default_factory=list)
+    canned_response: Optional[str] = None  # set when no LLM call is needed
+    cache_scope: str = ""
+    query_vector: Optional[List[float]] = None
+    cacheable: bool = False
+    prompt_tokens: dict = field(default_factory=dict)  # tokens per prompt section
+    source: str = "none"  # greeting | cache | local | web | none
+
+
+class RagEngine:
+    """
+    The RAG pipeline and every heavy resource it needs, once per process:
+    embedder, vector store shards, BM25 indexes, reranker, tokenizer,
+    inference client, caches and the feedback store.
+
+    Front ends (the FastAPI JSON API in app.py, the Gradio UI in
+    r1_smolagent_rag.py) call start() on startup and then respond() /
+    respond_stream(); co-hosting both in one process shares one engine.
+    start() returns immediately: the index download, model loads and
+    warm-up run on a background thread and `startup` reports progress.
+
+    With `snapshot_url` the index comes from a snapshot store (see
+    index_snapshot.py) instead of the Google Drive zip, and refresh_index()
+    (every INDEX_REFRESH_S seconds, or on demand) switches to a newer
+    snapshot without a restart.
+    """
+
+    def __init__(self, huggingface_api_token: str, index_url: str = None, db_dir: str = DB_DIR,
+                 index_sha256: str = None, snapshot_url: str = None, snapshot_dir: str = SNAPSHOT_DIR):
+        # Created first so the "import" phase covers everything up to start()
+        self.startup = StartupState()
+        self.db_dir = db_dir
+        self.index_url = index_url
+        self.index_sha256 = index_sha256
+        self.snapshots = SnapshotSync(open_source(snapshot_url), snapshot_dir) if snapshot_url else None
+        self.refresh_interval = float(os.getenv("INDEX_REFRESH_S", "0"))
+
+        # One InferenceClient per model id, Hub-checked in the background (MODEL_CHECK_TTL)
+        self.model_registry = ModelRegistry(huggingface_api_token)
+        self.generator = Generator(self.model_registry)
+        # Token-budgeted prompts (PROMPT_*_TOKENS) counted with the inference model's tokenizer
+        self.prompt_builder = PromptBuilder(TokenCounter(DEFAULT_MODEL_ID, huggingface_api_token))
+        # Final answers for repeated questions (ANSWER_CACHE_MAX_BYTES / _TTL / _SIMILARITY)
+        self.answer_cache = AnswerCache()
+        # Web fallback: WEB_SEARCH_PROVIDER with a TTL cache, deadline and circuit breaker
+        self.web_search = WebSearch()
+        # Optional cross-encoder over the retrieval candidates (RERANKER=cross-encoder)
+        self.reranker = build_reranker()
+        self.feedback_store = FeedbackStore()
+        self.feedback_store.migrate_json(FEEDBACK_FILE)
+
+        # Set by _initialize() on the startup thread
+        self.embeddings: Optional[EmbeddingService] = None
+        self.retriever: Optional[Retriever] = None
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    # -------------------------
+    # Lifecycle
+    # -------------------------
+    def start(self):
+        """Kick off background initialization (idempotent, so every front end may call it)."""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+        self.startup.mark("import")
+        self.startup.run(self._initialize)
+        self.model_registry.start_background_checks()
+        if self.snapshots is not None and self.refresh_interval > 0:
+            threading.Thread(target=self._refresh_loop, name="index-refresh", daemon=True).start()
+
+    def _initialize(self):
+        """Download the index if needed, load the embedder and the vector store, then warm both up."""
+        with self.startup.phase("download"):
+            if self.snapshots is not None:
+                self.db_dir = self._sync_snapshot()
+                self.snapshots.acquire(os.path.basename(self.db_dir))
+            else:
+                download_index_if_needed(self.index_url, self.db_dir, sha256=self.index_sha256)
+
+        # Backend comes from EMBEDDING_BACKEND (torch | onnx | onnx-int8) and must match ingest.
+        # Query vectors are cached and concurrent queries are embedded in micro-batches.
+        with self.startup.phase("embeddings"):
+            embeddings = EmbeddingService(build_embeddings())
+
+        with self.startup.phase("vector_store"):
+            retriever = self._open_retriever(self.db_dir, embeddings)
+
+        with self.startup.phase("tokenizer"):
+            self.prompt_builder.counter.load()
+
+        if self.reranker is not None:
+            with self.startup.phase("reranker"):
+                self.reranker.load()
+                self.reranker.score(WARMUP_QUERY, [WARMUP_QUERY])
+
+        # First query pays for model graph setup and the HNSW index load; do it now
+        with self.startup.phase("warmup"):
+            retriever.warm_up(embeddings.embed_query(WARMUP_QUERY))
+
+        self.embeddings, self.retriever = embeddings, retriever
+
+    def _open_retriever(self, db_dir: str, embeddings: EmbeddingService) -> Retriever:
+        # One collection, or one per state/region (ingest_pdfs.py --sharded) opened lazily and
+        # LRU-evicted (SHARD_MAX_LOADED). Each shard has its BM25 index next to it (optional).
+        router = ShardRouter.open(db_dir, embeddings)
+        logging.info(
+            f"Vector store: {len(router.shards)} shard(s)"
+            + (f", at most {router.max_loaded} loaded" if router.sharded else "")
+        )
+        # Location / price / rating constraints in questions become metadata filters
+        parser = QueryParser.from_gazetteer(os.path.join(db_dir, GAZETTEER_FILE))
+        return Retriever(router, parser, self.web_search, self.reranker)
+
+    def _sync_snapshot(self) -> str:
+        """Directory of the latest snapshot, or of the local copy if the source can't be reached."""
+        try:
+            self.snapshots.update()
+        except Exception as e:
+            if self.snapshots.current_dir() is None:
+                raise
+            logging.warning(f"Index snapshot update failed, using local {self.snapshots.current_version()}: {e}")
+        return self.snapshots.current_dir()
+
+    def refresh_index(self) -> dict:
+        """
+        Fetch the latest index snapshot and, if it is new, switch to it in
+        place: the new version is opened and warmed up beside the live one,
+        then swapped in. Requests already running finish on the old index,
+        which is closed RETIRE_AFTER_S later; its version stays on disk until
+        then. Cached answers are dropped.
+        """
+        if self.snapshots is None:
+            raise ValueError("Index snapshots are not configured (INDEX_SNAPSHOT_URL is not set).")
+        if not self.startup.ready:
+            raise EngineNotReady(f"Service is warming up ({self.startup.state}), please retry in a few seconds.")
+
+        with self._refresh_lock:
+            new_dir = self.snapshots.update()
+            if new_dir is None:
+                return {**self.snapshots.status(), "updated": False}
+            self.snapshots.acquire(os.path.basename(new_dir))
+            try:
+                retriever = self._open_retriever(new_dir, self.embeddings)
+                retriever.warm_up(self.embeddings.embed_query(WARMUP_QUERY))
+            except Exception:
+                self.snapshots.release(os.path.basename(new_dir))
+                raise
+            old, old_dir = self.retriever, self.db_dir
+            self.retriever, self.db_dir = retriever, new_dir
+            self.answer_cache.clear()
+
+        retire = threading.Timer(RETIRE_AFTER_S, self._retire, args=(old, old_dir))
+        retire.daemon = True
+        retire.start()
+        logging.info(f"Switched to index snapshot {self.snapshots.current_version()}")
+        return {**self.snapshots.status(), "updated": True}
+
+    def _retire(self, retriever: Retriever, db_dir: str):
+        """Close a replaced index and let its snapshot version be pruned."""
+        retriever.shard_router.close()
+        self.snapshots.release(os.path.basename(db_dir))
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            if not self.startup.ready:
+                continue
+            try:
+                self.refresh_index()
+            except Exception as e:
+                logging.error(f"Index refresh failed: {e}")
+
+    def close(self):
+        self._stop.set()
+        self.model_registry.stop()
+        self.feedback_store.close()
+        self.web_search.shutdown()
+        if self.retriever is not None:
+            self.retriever.shard_router.close()
+
+    # -------------------------
+    # Pipeline
+    # -------------------------
+    def prepare_turn(self, user_query: str, history: List[dict], trace: Optional[Trace] = None) -> RagTurn:
+        """
+        Runs everything that happens before generation: greeting check, answer
+        cache lookup, local retrieval, web search fallback and prompt assembly.
+        Each step is timed on `trace`.
+        """
+        trace = trace or Trace()
+
+        # Greeting guardrail
+        with trace.stage("greeting"):
+            is_greeting = user_query.strip().lower() in GREETING_WORDS
+        if is_greeting:
+            return RagTurn(canned_response=GREETING_RESPONSE, source="greeting")
+
+        if not self.startup.ready:
+            raise EngineNotReady(f"Service is warming up ({self.startup.state}), please retry in a few seconds.")
+
+        # Answer cache: exact match first, then by query embedding (fresh chats only)
+        with trace.stage("history"):
+            history_part = self.prompt_builder.history(history)
+        cache_scope = history_scope(history_part.text())
+        with trace.stage("answer_cache"):
+            cached = self.answer_cache.get(cache_scope, user_query)
+        if cached is not None:
+            logging.info("Answer cache hit (exact).")
+            ANSWER_CACHE.inc(result="exact")
+            return RagTurn(sources=cached.sources, canned_response=cached.response, source="cache")
+
+        with trace.stage("embed"):
+            query_vector = self.embeddings.embed_query(user_query)
+        with trace.stage("answer_cache"):
+            cached = self.answer_cache.get_similar(cache_scope, query_vector)
+        if cached is not None:
+            logging.info("Answer cache hit (similar query).")
+            ANSWER_CACHE.inc(result="similar")
+            return RagTurn(sources=cached.sources, canned_response=cached.response, source="cache")
+        self.answer_cache.record_miss()
+        if self.answer_cache.enabled:
+            ANSWER_CACHE.inc(result="miss")
+
+        retrieval = self.retriever.retrieve(user_query, query_vector, trace)
+
+        # Build prompt within the token budget; passages are best first, so trimming drops the weakest
+        with trace.stage("prompt_build"):
+            built = self.prompt_builder.build(
+                history_part, retrieval.passages, user_query, context_header=retrieval.context_header
+            )
+        logging.info("Prompt tokens: " + ", ".join(f"{name}={count}" for name, count in built.tokens.items()))
+        PROMPT_TOKENS.observe(built.tokens["total"])
+        for section, count in built.tokens.items():
+            if section != "total":
+                PROMPT_SECTION_TOKENS.inc(count, section=section)
+        return RagTurn(
+            prompt=built.prompt,
+            sources=retrieval.sources[:built.passages_used],
+            cache_scope=cache_scope,
+            query_vector=query_vector,
+            cacheable=True,
+            prompt_tokens=built.tokens,
+            source=retrieval.source,
+        )
+
+    def cache_answer(self, user_query: str, turn: RagTurn, bot_response_text: str):
+        """Store a freshly generated answer so repeated questions skip the LLM."""
+        if turn.cacheable and not bot_response_text.startswith("❌"):
+            self.answer_cache.put(turn.cache_scope, user_query, bot_response_text, turn.sources, turn.query_vector)
+
+    def respond(self, user_query: str, history: List[dict]):
+        """
+        Generates a response using local Chroma knowledge base or web search fallback.
+        Returns updated_history, metadata, and sources. metadata["timings"] has
+        the wall time of each pipeline stage.
+        """
+        logging.info(f"Received query: {user_query}")
+        trace = Trace()
+
+        try:
+            turn = self.prepare_turn(user_query, history, trace)
+            TURNS.inc(source=turn.source)
+            if turn.canned_response is not None:
+                updated_history = append_turn(history, user_query, turn.canned_response)
+                metadata = {"query": user_query, "response": turn.canned_response, "timings": trace.timings()}
+                return updated_history, metadata, turn.sources
+
+            # Generate response
+            bot_response_text = self.generator.generate(turn.prompt, trace)
+            self.cache_answer(user_query, turn, bot_response_text)
+
+            updated_history = append_turn(history, user_query, bot_response_text)
+            metadata = {
+                "query": user_query,
+                "response": bot_response_text,
+                "prompt_tokens": turn.prompt_tokens,
+                "timings": trace.timings(),
+            }
+            return updated_history, metadata, turn.sources
+
+        except Exception as e:
+            logging.error(f"Error: {str(e)}")
+            TURNS.inc(source="error")
+            error_message = f"❌ Error: {str(e)}"
+            updated_history = append_turn(history, user_query, error_message)
+            return updated_history, {"query": user_query, "response": error_message, "timings": trace.timings()}, []
+
+    def respond_stream(self, user_query: str, history: List[dict]):
+        """
+        Streaming variant of respond. Yields (event, data) pairs:
+        ("sources", [...]) as soon as retrieval finishes, then ("token", str) for
+        each generated token, then ("done", {"response", "history", "prompt_tokens", "timings"}).
+        Errors are reported as ("error", {"detail"}) followed by "done".
+        """
+        logging.info(f"Received streaming query: {user_query}")
+        trace = Trace()
+        chunks = []
+        prompt_tokens = {}
+
+        try:
+            turn = self.prepare_turn(user_query, history, trace)
+            TURNS.inc(source=turn.source)
+            prompt_tokens = turn.prompt_tokens
+            yield "sources", turn.sources
+
+            if turn.canned_response is not None:
+                chunks.append(turn.canned_response)
+                yield "token", turn.canned_response
+            else:
+                for token in self.generator.stream(turn.prompt, trace):
+                    chunks.append(token)
+                    yield "token", token
+
+            bot_response_text = "".join(chunks).strip() or NO_RESPONSE
+            self.cache_answer(user_query, turn, bot_response_text)
+        except Exception as e:
+            logging.error(f"Error: {str(e)}")
+            TURNS.inc(source="error")
+            bot_response_text = f"❌ Error: {str(e)}"
+            yield "error", {"detail": bot_response_text}
+
+        yield "done", {
+            "response": bot_response_text,
+            "history": append_turn(history, user_query, bot_response_text),
+            "prompt_tokens": prompt_tokens,
+            "timings": trace.timings(),
+        }
+
+    # -------------------------
+    # Feedback / stats
+    # -------------------------
+    def save_feedback(self, user_query, bot_response, feedback):
+        """Save feedback (Good/Bad) to the append-only feedback store."""
+        self.feedback_store.add(user_query, bot_response, feedback)
+
+    def stats(self) -> dict:
+        """Answer cache, query-embedding cache, vector-store shard and web search counters."""
+        return {
+            "answers": self.answer_cache.stats(),
+            "embeddings": self.embeddings.stats() if self.embeddings is not None else None,
+            "shards": self.retriever.shard_router.stats() if self.retriever is not None else None,
+            "web_search": self.web_search.stats(),
+        }
+
+
+_engine: Optional[RagEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> RagEngine:
+    """
+    The process-wide engine, created on first call from the environment
+    (HUGGINGFACE_API_TOKEN, and INDEX_SNAPSHOT_URL with optional INDEX_SNAPSHOT_DIR,
+    or CHROMA_DB_GDRIVE_URL with optional CHROMA_DB_SHA256 and CHROMA_DB_DIR; an
+    existing CHROMA_DB_DIR is used as is, without a download).
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            huggingface_api_token = os.getenv("HUGGINGFACE_API_TOKEN")
+            if not huggingface_api_token:
+                raise ValueError("HUGGINGFACE_API_TOKEN is not set. Please check your .env or HF secrets.")
+            index_url = os.getenv("CHROMA_DB_GDRIVE_URL")
+            snapshot_url = os.getenv("INDEX_SNAPSHOT_URL")
+            if not index_url and not snapshot_url:
+                raise ValueError(
+                    "Neither INDEX_SNAPSHOT_URL nor CHROMA_DB_GDRIVE_URL is set in .env. "
+                    "Please provide a snapshot store or the direct download link."
+                )
+            _engine = RagEngine(
+                huggingface_api_token,
+                index_url,
+                db_dir=os.getenv("CHROMA_DB_DIR", DB_DIR),
+                index_sha256=os.getenv("CHROMA_DB_SHA256"),
+                snapshot_url=snapshot_url,
+                snapshot_dir=os.getenv("INDEX_SNAPSHOT_DIR", SNAPSHOT_DIR),
+            )
+        return _engine
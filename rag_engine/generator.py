@@ -0,0 +1,45 @@
+import time
+from typing import Iterator, Optional
+
+from metrics import TIME_TO_FIRST_TOKEN, Trace
+from model_registry import DEFAULT_MODEL_ID, ModelRegistry
+
+GENERATION_KWARGS = {"max_new_tokens": 512, "temperature": 0.7, "return_full_text": False}
+NO_RESPONSE = "❌ No response generated."
+
+
+class Generator:
+    """Text generation on the HF inference endpoint through the shared ModelRegistry client."""
+
+    def __init__(self, model_registry: ModelRegistry, model_id: str = DEFAULT_MODEL_ID):
+        self.model_registry = model_registry
+        self.model_id = model_id
+
+    def get_model(self):
+        """Return the long-lived InferenceClient for model_id (no Hub round trip)."""
+        return self.model_registry.get(self.model_id)
+
+    def generate(self, prompt: str, trace: Optional[Trace] = None) -> str:
+        trace = trace or Trace()
+        with trace.stage("get_model"):
+            client = self.get_model()
+        with trace.stage("generation"):
+            response = client.text_generation(prompt, **GENERATION_KWARGS)
+        return response.strip() if response else NO_RESPONSE
+
+    def stream(self, prompt: str, trace: Optional[Trace] = None) -> Iterator[str]:
+        """Generated tokens as they arrive; time to first token is recorded separately."""
+        trace = trace or Trace()
+        with trace.stage("get_model"):
+            client = self.get_model()
+        with trace.stage("generation"):
+            started = time.perf_counter()
+            first = True
+            for token in client.text_generation(prompt, stream=True, **GENERATION_KWARGS):
+                if token:
+                    if first:
+                        first = False
+                        elapsed = time.perf_counter() - started
+                        TIME_TO_FIRST_TOKEN.observe(elapsed)
+                        trace.stages_ms["first_token"] = elapsed * 1000
+                    yield token
@@ -0,0 +1,234 @@
+import heapq
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from lexical_index import reciprocal_rank_fusion
+from metrics import Trace
+from query_parser import QueryConstraints, QueryParser
+from reranker import CrossEncoderReranker
+from shard_router import Shard, ShardRouter
+from web_search import WebSearch
+
+RELEVANCE_THRESHOLD = 0.5
+RETRIEVAL_K = 3
+FUSION_CANDIDATES = int(os.getenv("FUSION_CANDIDATES", "10"))
+# A lexical hit counts as relevant when it contains this fraction of the query's terms
+LEXICAL_MIN_COVERAGE = float(os.getenv("LEXICAL_MIN_COVERAGE", "1.0"))
+# With a reranker, retrieval over-fetches this many candidates for it to score
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+# Start the web fallback while retrieval is still running when the best vector
+# similarity is below RELEVANCE_THRESHOLD + margin (the fallback is likely)
+WEB_SEARCH_SPECULATIVE = os.getenv("WEB_SEARCH_SPECULATIVE", "0") == "1"
+WEB_SEARCH_SPECULATIVE_MARGIN = float(os.getenv("WEB_SEARCH_SPECULATIVE_MARGIN", "0.1"))
+
+
+@dataclass
+class Retrieval:
+    """Context for one question: passages best first, matching sources, and a header for web results."""
+    passages: List[str] = field(default_factory=list)
+    sources: List[dict] = field(default_factory=list)
+    context_header: str = ""
+    source: str = "none"  # local | web | none
+
+
+def search_by_vector(vectordb, query_vector: List[float], k: int = 3, where: Optional[dict] = None):
+    """Like similarity_search_with_relevance_scores, but for an already embedded query."""
+    relevance_score_fn = vectordb._select_relevance_score_fn()
+    docs_with_distances = vectordb.similarity_search_by_vector_with_relevance_scores(query_vector, k=k, filter=where)
+    return [(doc, relevance_score_fn(distance)) for doc, distance in docs_with_distances]
+
+
+def shard_lexical_hits(shard: Shard, user_query: str, depth: int, constraints: QueryConstraints):
+    """BM25 hits (doc, score, coverage) from one shard that satisfy the constraints."""
+    if shard.lexical_index is None:
+        return []
+    # BM25 has no metadata index: over-fetch, then keep hits that satisfy the constraints
+    lexical_depth = depth if constraints.is_empty else depth * 5
+    return [
+        (doc, score, coverage)
+        for doc, score, coverage in (
+            (shard.lexical_index.document(doc_idx), score, coverage)
+            for doc_idx, score, coverage in shard.lexical_index.search(user_query, k=lexical_depth)
+        )
+        if constraints.matches(doc.metadata)
+    ][:depth]
+
+
+def backfill(hits: list, more: list, limit: int) -> list:
+    """`hits` followed by the (doc, score) pairs of `more` it doesn't already contain, up to `limit`."""
+    seen = {doc.page_content for doc, _ in hits}
+    return hits + [hit for hit in more if hit[0].page_content not in seen][: max(0, limit - len(hits))]
+
+
+class Retriever:
+    """
+    Local retrieval plus web fallback: query filters, hybrid (vector + BM25)
+    search across shards, optional cross-encoder reranking, and a web search
+    when nothing local is relevant.
+    """
+
+    def __init__(self, shard_router: ShardRouter, query_parser: QueryParser, web_search: WebSearch,
+                 reranker: Optional[CrossEncoderReranker] = None):
+        self.shard_router = shard_router
+        self.query_parser = query_parser
+        self.web_search = web_search
+        self.reranker = reranker
+
+    def warm_up(self, query_vector: List[float]):
+        """Load the HNSW index of the single-collection layout; shards stay lazy."""
+        if not self.shard_router.sharded:
+            self.shard_router.map(
+                lambda shard: search_by_vector(shard.vectordb, query_vector, k=1), self.shard_router.route()
+            )
+
+    def hybrid_search(self, user_query: str, query_vector: List[float], k: int = RETRIEVAL_K,
+                      constraints: Optional[QueryConstraints] = None, on_vector_hits=None,
+                      trace: Optional[Trace] = None):
+        """
+        Reciprocal-rank fusion of the vector and BM25 rankings. Returns the top k
+        as (doc, relevant) pairs: a doc is relevant if its vector score clears
+        RELEVANCE_THRESHOLD or it matches enough of the query's keywords, so exact
+        name matches ("Pad Thai") no longer fall through to web search.
+        With constraints, both rankings only contain chunks that satisfy them
+        (pushed down to Chroma as a `where` filter), and only the shards that can
+        hold such chunks are searched. When that finds fewer than k chunks the
+        search is repeated with looser constraints (QueryConstraints.relaxations)
+        and the extra hits are ranked after the filtered ones. `on_vector_hits`
+        is called with the merged vector ranking before the lexical side runs.
+        """
+        trace = trace or Trace()
+        constraints = constraints or QueryConstraints()
+        depth = max(k, FUSION_CANDIDATES)
+
+        with trace.stage("vector_search"):
+            steps, vector_hits = [], []
+            for step in [constraints] + constraints.relaxations():
+                if steps and len(vector_hits) >= k:
+                    break
+                if steps:
+                    logging.info(f"Only {len(vector_hits)} hits with filters; retrying with {step.where()}")
+                steps.append(step)
+                vector_hits = backfill(vector_hits, self._vector_hits(query_vector, depth, step), depth)
+        logging.info(f"Similarity scores: {[round(score, 3) for _, score in vector_hits]}")
+        if on_vector_hits is not None:
+            on_vector_hits(vector_hits)
+
+        with trace.stage("lexical_search"):
+            lexical_hits = []
+            for step in steps:
+                lexical_hits = backfill(lexical_hits, self._lexical_hits(user_query, depth, step), depth)
+        if not lexical_hits:
+            return [(doc, score > RELEVANCE_THRESHOLD) for doc, score in vector_hits[:k]]
+        logging.info(f"BM25 coverage: {[round(coverage, 2) for _, coverage in lexical_hits]}")
+
+        docs, relevant = {}, {}
+        for doc, score in vector_hits:
+            docs.setdefault(doc.page_content, doc)
+            relevant[doc.page_content] = relevant.get(doc.page_content, False) or score > RELEVANCE_THRESHOLD
+        for doc, coverage in lexical_hits:
+            docs.setdefault(doc.page_content, doc)
+            relevant[doc.page_content] = relevant.get(doc.page_content, False) or coverage >= LEXICAL_MIN_COVERAGE
+
+        fused = reciprocal_rank_fusion(
+            [doc.page_content for doc, _ in vector_hits],
+            [doc.page_content for doc, _ in lexical_hits],
+        )
+        return [(docs[key], relevant[key]) for key, _ in fused[:k]]
+
+    def _vector_hits(self, query_vector: List[float], depth: int, constraints: QueryConstraints):
+        shard_keys = self.shard_router.route(constraints)
+        if self.shard_router.sharded:
+            logging.info(f"Searched shards: {shard_keys}")
+        # Similarities share one embedding model, so shards merge by score
+        vector_per_shard = self.shard_router.map(
+            lambda shard: search_by_vector(shard.vectordb, query_vector, k=depth, where=constraints.where()),
+            shard_keys,
+        )
+        return heapq.nlargest(depth, (hit for hits in vector_per_shard for hit in hits), key=lambda hit: hit[1])
+
+    def _lexical_hits(self, user_query: str, depth: int, constraints: QueryConstraints):
+        # BM25 scores use per-shard statistics, so this merge is only approximate
+        lexical_per_shard = self.shard_router.map(
+            lambda shard: shard_lexical_hits(shard, user_query, depth, constraints),
+            self.shard_router.route(constraints),
+        )
+        return [
+            (doc, coverage)
+            for doc, _, coverage in heapq.nlargest(
+                depth, (hit for hits in lexical_per_shard for hit in hits), key=lambda hit: hit[1]
+            )
+        ]
+
+    def select_passages(self, user_query: str, ranked_docs: list, trace: Optional[Trace] = None) -> list:
+        """
+        Passages for the prompt: the reranker's picks among all candidates, or,
+        without a reranker (or if it fails), the top RETRIEVAL_K retrieval hits
+        that passed the relevance checks.
+        """
+        if self.reranker is not None:
+            try:
+                with (trace or Trace()).stage("rerank"):
+                    result = self.reranker.rerank(user_query, [doc for doc, _ in ranked_docs], top_k=RETRIEVAL_K)
+                logging.info(
+                    f"Reranked {result.scored}/{result.candidates} candidates in {result.elapsed_ms:.0f}ms "
+                    f"({result.stop_reason}): {[round(score, 3) for _, score in result.passages]}"
+                )
+                return [doc for doc, _ in result.passages]
+            except Exception as e:
+                logging.error(f"Reranker failed, using retrieval order: {e}")
+        return [doc for doc, relevant in ranked_docs[:RETRIEVAL_K] if relevant]
+
+    def retrieve(self, user_query: str, query_vector: List[float], trace: Optional[Trace] = None) -> Retrieval:
+        """Local passages for the question, or web results when none are relevant (stages timed on `trace`)."""
+        trace = trace or Trace()
+        # Hybrid search: Chroma (vector) + BM25 (lexical), fused by reciprocal rank,
+        # restricted to chunks matching any city/state/price/rating in the question
+        constraints = self.query_parser.parse(user_query)
+        if not constraints.is_empty:
+            logging.info(f"Query filters: {constraints.where()}")
+        speculative = []
+
+        def speculate(vector_hits):
+            top_score = max((score for _, score in vector_hits), default=0.0)
+            if WEB_SEARCH_SPECULATIVE and top_score < RELEVANCE_THRESHOLD + WEB_SEARCH_SPECULATIVE_MARGIN:
+                logging.info(f"Top similarity {top_score:.3f} is borderline; starting web search early.")
+                speculative.append(self.web_search.start(user_query))
+
+        candidate_k = RERANK_CANDIDATES if self.reranker is not None else RETRIEVAL_K
+        ranked_docs = self.hybrid_search(
+            user_query, query_vector, k=candidate_k, constraints=constraints, on_vector_hits=speculate, trace=trace
+        )
+
+        # Filter by relevance (reranker scores when enabled); only these reach the prompt
+        filtered_docs = self.select_passages(user_query, ranked_docs, trace)
+
+        if filtered_docs:
+            logging.info(f"Using {len(filtered_docs)} local documents")
+            return Retrieval(
+                passages=[doc.page_content for doc in filtered_docs],
+                sources=[
+                    {
+                        'text': doc.page_content[:200] + "...",
+                        'url': doc.metadata.get('source', '')
+                    }
+                    for doc in filtered_docs
+                ],
+                source="local",
+            )
+
+        # Web search fallback
+        logging.info("No relevant local results found. Searching the web.")
+        with trace.stage("web_search"):
+            pending = speculative[0] if speculative else self.web_search.start(user_query)
+            web_results = pending.result()
+        if not web_results:
+            return Retrieval()
+        logging.info(f"Found {len(web_results)} web sources")
+        return Retrieval(
+            passages=[res['body'] for res in web_results],
+            sources=[{'text': res['body'], 'url': res['href']} for res in web_results],
+            context_header="Web Search Results:",
+            source="web",
+        )
@@ -0,0 +1,114 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+@dataclass
+class RerankResult:
+    """Passages that made the cut, best first, plus how the scoring went."""
+    passages: List[Tuple[object, float]] = field(default_factory=list)  # (doc, score in [0, 1])
+    scored: int = 0
+    candidates: int = 0
+    elapsed_ms: float = 0.0
+    stop_reason: str = "exhausted"  # exhausted | score_drop | time_budget
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, passage) pairs with a small cross-encoder on CPU.
+
+    Candidates arrive in retrieval order and are scored `batch_size` at a
+    time. Scoring stops early once a whole batch falls below `drop_ratio` of
+    the best score so far (later candidates are ranked lower by retrieval and
+    rarely recover), or when the next batch would overrun `budget_ms`.
+    Unscored candidates are dropped. Passages whose score is at least
+    `min_score` and within `drop_ratio` of the best are kept, up to `top_k`.
+
+    Scores are sigmoid(logit), so thresholds are probabilities. The model
+    loads on first use (or via load()); transformers and torch are only
+    imported then.
+    """
+
+    def __init__(self, model_name: str = None, batch_size: int = None, budget_ms: float = None,
+                 min_score: float = None, drop_ratio: float = None, max_length: int = 256):
+        self.model_name = model_name or os.getenv("RERANKER_MODEL", RERANKER_MODEL)
+        self.batch_size = batch_size or int(os.getenv("RERANK_BATCH_SIZE", "8"))
+        self.budget_ms = budget_ms if budget_ms is not None else float(os.getenv("RERANK_BUDGET_MS", "150"))
+        self.min_score = min_score if min_score is not None else float(os.getenv("RERANK_MIN_SCORE", "0.05"))
+        self.drop_ratio = drop_ratio if drop_ratio is not None else float(os.getenv("RERANK_DROP_RATIO", "0.3"))
+        self.max_length = max_length
+        self._model = None
+        self._tokenizer = None
+        self._torch = None
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        with self._load_lock:
+            if self._model is not None:
+                return
+            import torch
+            from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+            started = time.perf_counter()
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self._model = AutoModelForSequenceClassification.from_pretrained(self.model_name).eval()
+            self._torch = torch
+            logging.info(f"Reranker {self.model_name} loaded in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    def score(self, query: str, passages: List[str]) -> np.ndarray:
+        """Relevance of each passage to the query, in [0, 1]."""
+        self.load()
+        features = self._tokenizer(
+            [query] * len(passages), passages,
+            padding=True, truncation=True, max_length=self.max_length, return_tensors="pt",
+        )
+        with self._torch.inference_mode():
+            logits = self._model(**features).logits.reshape(-1).float().numpy()
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def rerank(self, query: str, docs: list, top_k: int) -> RerankResult:
+        started = time.perf_counter()
+        result = RerankResult(candidates=len(docs))
+        scored = []
+        best = 0.0
+        last_batch_ms = 0.0
+        for i in range(0, len(docs), self.batch_size):
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if scored and elapsed_ms + last_batch_ms > self.budget_ms:
+                result.stop_reason = "time_budget"
+                break
+            batch = docs[i : i + self.batch_size]
+            batch_started = time.perf_counter()
+            scores = self.score(query, [doc.page_content for doc in batch])
+            last_batch_ms = (time.perf_counter() - batch_started) * 1000
+            scored.extend(zip(batch, scores.tolist()))
+            batch_best = float(scores.max())
+            dropped = i > 0 and batch_best < best * self.drop_ratio
+            best = max(best, batch_best)
+            if dropped:
+                result.stop_reason = "score_drop"
+                break
+
+        cutoff = max(self.min_score, best * self.drop_ratio)
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        result.passages = [(doc, score) for doc, score in scored if score >= cutoff][:top_k]
+        result.scored = len(scored)
+        result.elapsed_ms = (time.perf_counter() - started) * 1000
+        return result
+
+
+def build_reranker(name: str = None) -> Optional[CrossEncoderReranker]:
+    """Reranker from RERANKER: none (default) or cross-encoder."""
+    name = name or os.getenv("RERANKER", "none")
+    if name == "none":
+        return None
+    if name == "cross-encoder":
+        return CrossEncoderReranker()
+    raise ValueError(f"Unknown RERANKER {name!r}; expected 'none' or 'cross-encoder'.")
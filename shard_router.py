@@ -0,0 +1,318 @@
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from langchain_chroma import Chroma
+
+from lexical_index import LexicalIndex
+from query_parser import GAZETTEER_FILE, QueryConstraints, US_STATES, normalize_location
+
+SHARD_MANIFEST = "shards.json"
+SHARDS_DIR = "shards"
+LEXICAL_INDEX_DIR = "lexical_index"
+MANIFEST_VERSION = 1
+
+# US Census regions, for --shard-by region
+CENSUS_REGIONS = {
+    "northeast": ["ct", "me", "ma", "nh", "ri", "vt", "nj", "ny", "pa"],
+    "midwest": ["il", "in", "mi", "oh", "wi", "ia", "ks", "mn", "mo", "ne", "nd", "sd"],
+    "south": ["de", "dc", "fl", "ga", "md", "nc", "sc", "va", "wv", "al", "ky", "ms", "tn",
+              "ar", "la", "ok", "tx"],
+    "west": ["az", "co", "id", "mt", "nv", "nm", "ut", "wy", "ak", "ca", "hi", "or", "wa"],
+}
+_STATE_REGION = {code: region for region, codes in CENSUS_REGIONS.items() for code in codes}
+_STATE_REGION.update({US_STATES[code]: region for code, region in list(_STATE_REGION.items())})
+
+
+def shard_key(state, shard_by: str = "state") -> str:
+    """Shard a row with this `state` value belongs to ("unknown" when missing)."""
+    state = normalize_location(state) if isinstance(state, str) else ""
+    if shard_by == "region":
+        return _STATE_REGION.get(state, "other")
+    return re.sub(r"[^a-z0-9]+", "_", state).strip("_") or "unknown"
+
+
+def load_manifest(root_dir: str) -> Optional[dict]:
+    path = os.path.join(root_dir, SHARD_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported shard manifest version {manifest.get('version')} in {root_dir}")
+    return manifest
+
+
+def write_manifest(root_dir: str, shard_by: str, shards: Dict[str, dict]):
+    """Write `<root_dir>/shards.json` atomically; `shards` maps key -> {path, states, cities, chunks}."""
+    path = os.path.join(root_dir, SHARD_MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "shard_by": shard_by, "shards": shards}, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def release_chroma(vectordb):
+    """
+    Stop a Chroma handle's client. chromadb keeps one System per persist
+    directory in a class-level cache, so it has to be dropped from there too
+    or the HNSW segments stay referenced after eviction.
+    """
+    try:
+        from chromadb.api.client import SharedSystemClient
+
+        system = vectordb._client._system
+        for attr in ("_identifer_to_system", "_identifier_to_system"):
+            cache = getattr(SharedSystemClient, attr, None)
+            if isinstance(cache, dict):
+                for identifier, cached in list(cache.items()):
+                    if cached is system:
+                        del cache[identifier]
+        system.stop()
+    except Exception as e:
+        logging.warning(f"Could not release Chroma client: {e}")
+
+
+class Shard:
+    """One partition: a Chroma collection plus its optional BM25 index."""
+
+    def __init__(self, key: str, vectordb, lexical_index: Optional[LexicalIndex] = None, pinned: bool = False):
+        self.key = key
+        self.vectordb = vectordb
+        self.lexical_index = lexical_index
+        self.pinned = pinned  # never evicted (the unsharded store)
+        self.users = 0
+
+    def close(self):
+        if self.lexical_index is not None:
+            self.lexical_index.close()
+        release_chroma(self.vectordb)
+
+
+class ShardRouter:
+    """
+    Sends each query to the shards that can hold its answer.
+
+    With a shard manifest (ingest_pdfs.py --sharded) every state or region is
+    its own Chroma directory under `<root>/shards/`, opened on first use and
+    kept in an LRU of at most `max_loaded` shards; the least recently used one
+    is closed once no query is still reading it. Queries naming a state (or a
+    city known to live in specific shards) go only to those shards, anything
+    else fans out in parallel to every shard; shards outside the LRU are opened
+    for that query only. `max_fanout` (SHARD_MAX_FANOUT, 0 = no cap) optionally
+    limits the fan-out to the largest shards, trading recall for latency.
+
+    Without a manifest the router wraps the single collection in `root_dir`,
+    so callers don't need a separate code path.
+    """
+
+    def __init__(self, root_dir: str, embedding_function, manifest: Optional[dict] = None,
+                 max_loaded: int = None, fanout_workers: int = None, max_fanout: int = None):
+        self.root_dir = root_dir
+        self.embedding_function = embedding_function
+        self.max_loaded = max_loaded or int(os.getenv("SHARD_MAX_LOADED", "8"))
+        self.sharded = manifest is not None
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._loaded: "OrderedDict[str, Shard]" = OrderedDict()  # the LRU, kept open while idle
+        self._open_shards: Dict[str, Shard] = {}  # every open shard: the LRU plus ones still in use
+        self.loads = 0
+        self.evictions = 0
+
+        if manifest is None:
+            self.shards = {"default": {"path": ".", "states": [], "cities": []}}
+            self._loaded["default"] = self._open_shards["default"] = self._open("default", pinned=True)
+        else:
+            self.shards = manifest["shards"]
+        self._state_to_shard = {}
+        self._city_to_shards = defaultdict(list)
+        for key, info in self.shards.items():
+            for state in info.get("states", []):
+                self._state_to_shard[state] = key
+            for city in info.get("cities", []):
+                self._city_to_shards[city].append(key)
+        self.max_fanout = max_fanout if max_fanout is not None else int(os.getenv("SHARD_MAX_FANOUT", "0"))
+        by_size = sorted(self.shards, key=lambda key: self.shards[key].get("chunks", 0), reverse=True)
+        self._fanout_keys = by_size[: self.max_fanout] if self.max_fanout > 0 else list(self.shards)
+
+        workers = fanout_workers or int(os.getenv("SHARD_FANOUT_WORKERS", "8"))
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard") if self.sharded else None
+
+    @classmethod
+    def open(cls, root_dir: str, embedding_function, **kwargs) -> "ShardRouter":
+        return cls(root_dir, embedding_function, load_manifest(root_dir), **kwargs)
+
+    def _open(self, key: str, pinned: bool = False) -> Shard:
+        directory = os.path.normpath(os.path.join(self.root_dir, self.shards[key]["path"]))
+        vectordb = Chroma(persist_directory=directory, embedding_function=self.embedding_function)
+        lexical_index = LexicalIndex.load_if_exists(os.path.join(directory, LEXICAL_INDEX_DIR))
+        logging.info(
+            f"Opened shard '{key}'"
+            + (f" ({lexical_index.n_docs:,} chunks in BM25 index)" if lexical_index else " (no BM25 index)")
+        )
+        return Shard(key, vectordb, lexical_index, pinned=pinned)
+
+    # -------------------------
+    # Routing
+    # -------------------------
+    def route(self, constraints: Optional[QueryConstraints] = None) -> List[str]:
+        """Shard keys to search for these constraints (every shard when the region is unknown)."""
+        if constraints is not None and self.sharded:
+            if constraints.state in self._state_to_shard:
+                return [self._state_to_shard[constraints.state]]
+            if constraints.city in self._city_to_shards:
+                return list(self._city_to_shards[constraints.city])
+        if self.max_fanout and len(self._fanout_keys) < len(self.shards):
+            logging.info(
+                f"Searching the {len(self._fanout_keys)} largest of {len(self.shards)} shards "
+                f"(SHARD_MAX_FANOUT={self.max_fanout})"
+            )
+        return list(self._fanout_keys)
+
+    def map(self, fn: Callable[[Shard], object], keys: List[str]) -> list:
+        """
+        fn(shard) for every key, in parallel when there is more than one; results in key order.
+        A fan-out wider than max_loaded uses the shards that are open and opens the others
+        only for this call, so it doesn't flush the LRU the routed queries rely on.
+        """
+        admit = len(keys) <= self.max_loaded
+        if len(keys) == 1 or self._pool is None:
+            return [self._call(fn, key, admit) for key in keys]
+        return list(self._pool.map(lambda key: self._call(fn, key, admit), keys))
+
+    def _call(self, fn, key, admit=True):
+        with self.acquire(key, admit) as shard:
+            return fn(shard)
+
+    # -------------------------
+    # Lazy loading / eviction
+    # -------------------------
+    @contextmanager
+    def acquire(self, key: str, admit: bool = True):
+        """
+        Open shard `key` if needed and keep it from being closed while in use. With
+        admit=False a shard that isn't open yet is not added to the LRU and is closed
+        again once its last user is done.
+        """
+        shard = self._checkout(key, admit)
+        try:
+            yield shard
+        finally:
+            with self._lock:
+                shard.users -= 1
+                close = shard.users == 0 and self._loaded.get(key) is not shard and self._open_shards.get(key) is shard
+                if close:
+                    del self._open_shards[key]
+            if close:
+                self._close([shard])
+
+    def _checkout(self, key: str, admit: bool = True) -> Shard:
+        with self._lock:
+            shard = self._use(key, admit)
+            if shard is None:
+                load_lock = self._load_lock(key)
+            else:
+                evicted = self._evict_locked()
+        if shard is not None:
+            self._close(evicted)
+            return shard
+
+        # Shards load concurrently; only two loads of the same shard are serialized
+        with load_lock:
+            with self._lock:
+                shard = self._use(key, admit)
+            if shard is None:
+                opened = self._open(key)
+                with self._lock:
+                    self._open_shards[key] = opened
+                    self.loads += 1
+                    shard = self._use(key, admit)
+            with self._lock:
+                evicted = self._evict_locked()
+        self._close(evicted)
+        return shard
+
+    def _use(self, key: str, admit: bool) -> Optional[Shard]:
+        """
+        Mark the open shard for `key` in use (adding it to the LRU if `admit`). There is only ever
+        one open handle per shard: chromadb shares one System per directory between handles, so
+        closing a second one would stop the first. Lock held.
+        """
+        shard = self._open_shards.get(key)
+        if shard is None:
+            return None
+        if admit or key in self._loaded:
+            self._loaded[key] = shard
+            self._loaded.move_to_end(key)
+        shard.users += 1
+        return shard
+
+    def _load_lock(self, key: str) -> threading.Lock:
+        return self._load_locks.setdefault(key, threading.Lock())
+
+    def _close(self, shards: List[Shard]):
+        """Close shards no longer open for anyone; holding the shard's load lock keeps a reopen of
+        the same directory from picking up the chromadb System that is being stopped."""
+        for shard in shards:
+            with self._load_lock(shard.key):
+                shard.close()
+
+    def _evict_locked(self) -> List[Shard]:
+        """Drop least recently used shards over max_loaded; returns those safe to close now."""
+        to_close = []
+        for key in list(self._loaded):
+            if len(self._loaded) <= self.max_loaded:
+                break
+            shard = self._loaded[key]
+            if shard.pinned:
+                continue
+            del self._loaded[key]
+            self.evictions += 1
+            logging.info(f"Evicted shard '{key}'")
+            # A shard still being searched is closed by its last user instead
+            if shard.users == 0:
+                del self._open_shards[key]
+                to_close.append(shard)
+        return to_close
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sharded": self.sharded,
+                "shards": len(self.shards),
+                "loaded": list(self._loaded),
+                "open": len(self._open_shards),
+                "max_loaded": self.max_loaded,
+                "max_fanout": self.max_fanout,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        with self._lock:
+            self._loaded = OrderedDict()
+            idle = [shard for shard in self._open_shards.values() if shard.users == 0]
+            for shard in idle:
+                del self._open_shards[shard.key]
+        self._close(idle)
+
+
+def merge_gazetteers(root_dir: str, shards: Dict[str, dict]) -> dict:
+    """Union of the per-shard location gazetteers, written to `<root_dir>/locations.json` for the query parser."""
+    cities, states = set(), set()
+    for info in shards.values():
+        cities.update(info.get("cities", []))
+        states.update(info.get("states", []))
+    gazetteer = {"cities": sorted(cities), "states": sorted(states)}
+    path = os.path.join(root_dir, GAZETTEER_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(gazetteer, f)
+    os.replace(path + ".tmp", path)
+    return gazetteer
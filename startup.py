@@ -0,0 +1,136 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+
+class StartupState:
+    """
+    Readiness of a service that initializes in the background.
+
+    `state` is "starting" until run() is called, then the name of the phase
+    in progress, then "ready" (or "failed" with `error` set). Each phase's
+    duration is recorded in `phases_ms`, in the order the phases ran.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.state = "starting"
+        self.error: Optional[str] = None
+        self.phases_ms: Dict[str, float] = {}
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def failed(self) -> bool:
+        return self.state == "failed"
+
+    def mark(self, name: str):
+        """Record `name` as a phase that ran from process start (or the previous phase) until now."""
+        elapsed = (time.perf_counter() - self.started_at) * 1000 - sum(self.phases_ms.values())
+        self.phases_ms[name] = round(elapsed, 1)
+
+    @contextmanager
+    def phase(self, name: str):
+        self.state = name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+            logging.info(f"Startup phase '{name}': {self.phases_ms[name]:.0f}ms")
+
+    def run(self, initialize: Callable[[], None]):
+        """Run `initialize` on a daemon thread; the service is ready when it returns."""
+        def target():
+            try:
+                initialize()
+            except Exception as e:
+                logging.exception("Startup failed")
+                self.error = f"{type(e).__name__}: {e}"
+                self.state = "failed"
+                return
+            self.state = "ready"
+            self._ready.set()
+            logging.info(
+                f"Service ready in {self.total_ms():.0f}ms ("
+                + ", ".join(f"{name}={ms:.0f}ms" for name, ms in self.phases_ms.items()) + ")"
+            )
+
+        self._thread = threading.Thread(target=target, name="startup", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self.started_at) * 1000, 1)
+
+    def status(self) -> dict:
+        return {
+            "status": self.state,
+            "ready": self.ready,
+            "error": self.error,
+            "uptime_ms": self.total_ms(),
+            "phases_ms": dict(self.phases_ms),
+        }
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def download_index_if_needed(url: str, target_dir: str, sha256: str = None) -> bool:
+    """
+    Make sure `target_dir` (e.g. chroma_db/) exists, fetching it as a zip
+    from Google Drive if not. The zip is streamed to a `.part` file, checked
+    (optional sha256, then every member's CRC), extracted next to the target
+    and renamed into place, so an interrupted or corrupt download never leaves
+    a half-populated directory behind. Returns True if it downloaded.
+    """
+    if os.path.exists(target_dir):
+        logging.info(f"{target_dir} exists. Skipping download.")
+        return False
+
+    import gdown
+
+    zip_path = target_dir.rstrip("/") + ".zip"
+    part_path = zip_path + ".part"
+    extract_dir = target_dir.rstrip("/") + ".extract"
+    logging.info(f"{target_dir} not found. Downloading from Google Drive...")
+    try:
+        # gdown writes the response to disk in chunks; nothing is buffered in memory
+        gdown.download(url, part_path, quiet=True)
+        if sha256:
+            actual = file_sha256(part_path)
+            if actual != sha256.lower():
+                raise ValueError(f"Checksum mismatch for {zip_path}: expected {sha256}, got {actual}")
+        with zipfile.ZipFile(part_path) as zip_ref:
+            bad_member = zip_ref.testzip()
+            if bad_member is not None:
+                raise zipfile.BadZipFile(f"Corrupt member {bad_member} in {zip_path}")
+            shutil.rmtree(extract_dir, ignore_errors=True)
+            zip_ref.extractall(extract_dir)
+
+        # The archive holds either chroma_db/ itself or its contents
+        inner = os.path.join(extract_dir, os.path.basename(target_dir.rstrip("/")))
+        os.rename(inner if os.path.isdir(inner) else extract_dir, target_dir)
+    finally:
+        shutil.rmtree(extract_dir, ignore_errors=True)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    logging.info(f"{target_dir} successfully downloaded and extracted.")
+    return True
@@ -0,0 +1,256 @@
+"""
+In-memory manifest of the React build (frontend/dist) served with
+precompressed variants, ETags and long-lived caching for hashed files.
+
+    python static_assets.py precompress frontend/dist   # write .gz/.br next to each asset
+"""
+import argparse
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Mapping, Optional
+
+from starlette.responses import FileResponse, PlainTextResponse, Response
+
+# Vite emits bundles as assets/index-j0DDWtJK.js (8-character content hash); only those never
+# change. Everything else, e.g. apple-touch-icon.png from public/, revalidates.
+HASHED_NAME = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8}\.[a-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+MIN_COMPRESS_BYTES = 1024
+# Larger files are streamed from disk instead of being held in memory
+MAX_MEMORY_BYTES = int(os.getenv("STATIC_MAX_MEMORY_BYTES", str(8 * 1024 * 1024)))
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+mimetypes.add_type("text/javascript", ".js")
+mimetypes.add_type("text/css", ".css")
+mimetypes.add_type("image/svg+xml", ".svg")
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+
+
+@dataclass
+class Asset:
+    path: str  # file on disk
+    media_type: str
+    etag: str  # quoted, without encoding suffix
+    cache_control: str
+    size: int
+    data: Optional[bytes] = None  # None when larger than MAX_MEMORY_BYTES
+    variants: Dict[str, bytes] = field(default_factory=dict)  # content-encoding -> body
+
+
+def _media_type(name: str) -> str:
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if media_type.startswith("text/"):
+        media_type += "; charset=utf-8"
+    return media_type
+
+
+def _compressible(media_type: str) -> bool:
+    return media_type.startswith(COMPRESSIBLE)
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    """Encodings in an Accept-Encoding header with a non-zero q."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        if token and q > 0:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+def _safe_relpath(full_path: str) -> Optional[str]:
+    """Normalized manifest key for a request path, or None if it tries to leave the root."""
+    if "\x00" in full_path or "\\" in full_path:
+        return None
+    parts = []
+    for part in full_path.split("/"):
+        if part in ("", "."):
+            continue
+        if part == "..":
+            return None
+        parts.append(part)
+    return "/".join(parts)
+
+
+class StaticAssets:
+    """
+    Serves files from `root_dir` out of a manifest built once at startup, so a
+    request does no filesystem lookups and can only ever return a file that
+    was in the build (no path traversal through the URL).
+
+    - ETag from the content hash; If-None-Match answers 304
+    - hashed names (index-j0DDWtJK.js) get a year-long immutable Cache-Control,
+      everything else (index.html) is revalidated on each use
+    - brotli/gzip variants: `<file>.br` / `<file>.gz` from the build (see
+      precompress), else gzip compressed in memory at startup
+    - unknown paths fall back to index.html for client-side routing, except
+      ones that look like files (have an extension), which get 404
+    """
+
+    def __init__(self, root_dir: str, index: str = "index.html"):
+        self.root_dir = os.path.abspath(root_dir)
+        self.index = index
+        self.assets: Dict[str, Asset] = {}
+        self.build()
+
+    def build(self) -> int:
+        assets = {}
+        if not os.path.isdir(self.root_dir):
+            logging.warning(f"Static assets: {self.root_dir} not found; the frontend will not be served.")
+            self.assets = assets
+            return 0
+
+        for dirpath, _, filenames in os.walk(self.root_dir):
+            for filename in filenames:
+                if filename.endswith((".gz", ".br")):
+                    continue
+                path = os.path.join(dirpath, filename)
+                key = os.path.relpath(path, self.root_dir).replace(os.sep, "/")
+                assets[key] = self._load(key, path)
+
+        self.assets = assets
+        compressed = sum(1 for asset in assets.values() if asset.variants)
+        logging.info(
+            f"Static assets: {len(assets)} files from {self.root_dir} ({compressed} with compressed variants)"
+        )
+        return len(assets)
+
+    def _load(self, key: str, path: str) -> Asset:
+        size = os.path.getsize(path)
+        media_type = _media_type(key)
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        asset = Asset(
+            path=path,
+            media_type=media_type,
+            etag=f'"{digest.hexdigest()[:20]}"',
+            cache_control=IMMUTABLE if HASHED_NAME.match(key) else REVALIDATE,
+            size=size,
+        )
+        if size > MAX_MEMORY_BYTES:
+            return asset
+
+        with open(path, "rb") as f:
+            asset.data = f.read()
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                with open(path + suffix, "rb") as f:
+                    asset.variants[encoding] = f.read()
+        if "gzip" not in asset.variants and _compressible(media_type) and size >= MIN_COMPRESS_BYTES:
+            body = gzip.compress(asset.data, compresslevel=9, mtime=0)
+            if len(body) < size:
+                asset.variants["gzip"] = body
+        return asset
+
+    def lookup(self, full_path: str) -> Optional[Asset]:
+        key = _safe_relpath(full_path)
+        if key is None:
+            return None
+        asset = self.assets.get(key or self.index)
+        if asset is None and "." not in key.rsplit("/", 1)[-1]:
+            asset = self.assets.get(self.index)  # client-side route
+        return asset
+
+    def response(self, full_path: str, headers: Mapping[str, str]) -> Response:
+        if _safe_relpath(full_path) is None:
+            return PlainTextResponse("Not found", status_code=404)
+        asset = self.lookup(full_path)
+        if asset is None:
+            if not self.assets:
+                return PlainTextResponse("Frontend build not found.", status_code=404)
+            return PlainTextResponse("Not found", status_code=404)
+
+        accepted = _accepted_encodings(headers.get("accept-encoding", ""))
+        encoding = next((enc for enc, _ in ENCODINGS if enc in accepted and enc in asset.variants), None)
+        etag = asset.etag if encoding is None else f'{asset.etag[:-1]}-{encoding}"'
+        response_headers = {"ETag": etag, "Cache-Control": asset.cache_control}
+        if asset.variants:
+            response_headers["Vary"] = "Accept-Encoding"
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and self._matches(if_none_match, asset):
+            return Response(status_code=304, headers=response_headers)
+
+        if asset.data is None:
+            return FileResponse(asset.path, media_type=asset.media_type, headers=response_headers)
+        if encoding is not None:
+            response_headers["Content-Encoding"] = encoding
+            return Response(asset.variants[encoding], media_type=asset.media_type, headers=response_headers)
+        return Response(asset.data, media_type=asset.media_type, headers=response_headers)
+
+    @staticmethod
+    def _matches(if_none_match: str, asset: Asset) -> bool:
+        """Weak comparison: any encoding variant of the current content counts as a match."""
+        if if_none_match.strip() == "*":
+            return True
+        base = asset.etag.strip('"')
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            tag = tag.strip('"')
+            if tag == base or tag in (f"{base}-{encoding}" for encoding, _ in ENCODINGS):
+                return True
+        return False
+
+
+def precompress(root_dir: str, min_bytes: int = MIN_COMPRESS_BYTES) -> dict:
+    """Write `<file>.gz` (and `<file>.br` if the brotli package is installed) for compressible files."""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        print("⚠️ brotli is not installed; writing gzip variants only (pip install brotli).")
+
+    written = {"gzip": 0, "br": 0}
+    for dirpath, _, filenames in os.walk(root_dir):
+        for filename in filenames:
+            if filename.endswith((".gz", ".br")):
+                continue
+            path = os.path.join(dirpath, filename)
+            if not _compressible(_media_type(filename)) or os.path.getsize(path) < min_bytes:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            variants = [("gzip", ".gz", lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append(("br", ".br", lambda d: brotli.compress(d, quality=11)))
+            for encoding, suffix, compress in variants:
+                body = compress(data)
+                if len(body) < len(data):
+                    with open(path + suffix, "wb") as f:
+                        f.write(body)
+                    written[encoding] += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Static asset tools for the React build.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pre = sub.add_parser("precompress", help="Write .gz/.br variants next to compressible files.")
+    pre.add_argument("root_dir", nargs="?", default=os.path.join(os.path.dirname(__file__), "frontend", "dist"))
+    args = parser.parse_args()
+
+    if args.command == "precompress":
+        written = precompress(args.root_dir)
+        print(f"✅ Wrote {written['gzip']} gzip and {written['br']} brotli variants under `{args.root_dir}`")
+
+
+if __name__ == "__main__":
+    main()
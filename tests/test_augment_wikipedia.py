@@ -0,0 +1,55 @@
+import json
+
+from augment_wikipedia import NO_DATA, SummaryCache, WikipediaFetcher
+
+
+class FakeResponse:
+    status_code = 200
+    ok = True
+
+    def __init__(self, text):
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def test_fixture_mode_bypasses_cache_and_network(tmp_path):
+    fixtures = tmp_path / "fixtures"
+    fixtures.mkdir()
+    (fixtures / "pad%20thai.json").write_text(json.dumps({"extract": "Stir-fried rice noodles."}))
+    cache_path = tmp_path / "cache.sqlite"
+
+    fetcher = WikipediaFetcher(fixture_dir=str(fixtures), cache_path=str(cache_path), rate=1000, workers=2)
+    try:
+        summaries = fetcher.fetch_many(["pad thai", "unknown dish", "pad thai"])
+    finally:
+        fetcher.close()
+
+    assert summaries == {"pad thai": "Stir-fried rice noodles.", "unknown dish": NO_DATA}
+    assert fetcher.requests_made == 0
+    assert not cache_path.exists()
+
+
+def test_cache_is_keyed_by_source(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    stub = SummaryCache(path, ttl=0, source="http://localhost:8000")
+    stub.put("pad thai", NO_DATA)
+    real = SummaryCache(path, ttl=0, source="https://en.wikipedia.org/api/rest_v1")
+    try:
+        assert stub.get("pad thai") == NO_DATA
+        assert real.get("pad thai") is None
+    finally:
+        stub.close()
+        real.close()
+
+
+def test_invalid_json_is_a_transient_failure(tmp_path):
+    fetcher = WikipediaFetcher(base_url="http://stub.invalid", cache_path=str(tmp_path / "cache.sqlite"), rate=1000)
+    fetcher.session.get = lambda url, timeout: FakeResponse("<html>rate limited</html>")
+    try:
+        assert fetcher.fetch("pad thai") == NO_DATA
+        assert fetcher.cache.get("pad thai") is None
+        assert fetcher.requests_made == 1
+    finally:
+        fetcher.close()
@@ -0,0 +1,58 @@
+import hashlib
+import json
+import sqlite3
+
+import pytest
+
+from feedback_store import FeedbackStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FeedbackStore(str(tmp_path / "feedback.db"))
+    yield store
+    store.close()
+
+
+def write_entries(path, entries):
+    path.write_text(json.dumps(entries))
+
+
+def entry(query, feedback="good"):
+    return {"query": query, "response": f"answer to {query}", "feedback": feedback}
+
+
+def test_migrate_json_imports_only_appended_entries(store, tmp_path):
+    path = tmp_path / "feedback.json"
+    write_entries(path, [entry("pad thai"), entry("ramen", "bad")])
+    assert store.migrate_json(str(path)) == 2
+    assert store.migrate_json(str(path)) == 0
+
+    write_entries(path, [entry("pad thai"), entry("ramen", "bad"), {"query": "tacos"}, entry("tacos")])
+    assert store.migrate_json(str(path)) == 1
+    assert store.summary() == {"good": 2, "bad": 1, "total": 3, "good_rate": 2 / 3}
+
+
+def test_migrate_json_continues_after_hash_keyed_import(store, tmp_path):
+    path = tmp_path / "feedback.json"
+    old = [entry("pad thai"), {"query": "curry"}, entry("ramen", "bad")]
+    write_entries(path, old)
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()
+    with sqlite3.connect(store.path) as conn:
+        conn.execute(
+            "INSERT INTO migrations (source, records, migrated_at) VALUES (?, 2, 0)", (f"feedback.json:{digest}",)
+        )
+
+    assert store.migrate_json(str(path)) == 0
+    write_entries(path, old + [entry("tacos")])
+    assert store.migrate_json(str(path)) == 1
+    assert store.summary()["total"] == 1
+
+
+def test_migrate_json_skips_entries_of_older_hash_keyed_import(store, tmp_path):
+    path = tmp_path / "feedback.json"
+    with sqlite3.connect(store.path) as conn:
+        conn.execute("INSERT INTO migrations (source, records, migrated_at) VALUES ('feedback.json:abc', 2, 0)")
+    write_entries(path, [entry("pad thai"), {"query": "curry"}, entry("ramen", "bad"), entry("tacos")])
+    assert store.migrate_json(str(path)) == 1
+    assert store.rates_by_query()[0]["query"] == "tacos"
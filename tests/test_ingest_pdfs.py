@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from ingest_pdfs import drop_near_duplicates  # noqa: E402
+from near_duplicates import NearDuplicateFilter  # noqa: E402
+
+
+def item(menu_item, price, menu_category="Pizza", restaurant_name="Corner Pizza House"):
+    return {
+        "restaurant_name": restaurant_name,
+        "menu_category": menu_category,
+        "city": "Austin",
+        "state": "TX",
+        "price": price,
+        "menu_item": menu_item,
+        "menu_description": "Pepperoni pizza made with tomato, mozzarella and pepperoni.",
+        "ingredient_name": "tomato, mozzarella, pepperoni",
+    }
+
+
+def kept_items(rows):
+    df = drop_near_duplicates(pd.DataFrame(rows), NearDuplicateFilter(0.8))
+    return df["menu_item"].tolist()
+
+
+def test_repeated_item_at_same_price_is_dropped():
+    rows = [item("Pepperoni Pizza", "12.99"), item("Pepperoni Pizza", "12.99")]
+    assert kept_items(rows) == ["Pepperoni Pizza"]
+
+
+def test_items_with_different_prices_are_kept():
+    rows = [item("Pepperoni Pizza", "9.99"), item("Pepperoni Pizza", "14.99")]
+    assert len(kept_items(rows)) == 2
+
+
+def test_items_in_different_categories_are_kept():
+    rows = [item("Pepperoni Pizza", "12.99"), item("Pepperoni Pizza", "12.99", menu_category="Kids Menu")]
+    assert len(kept_items(rows)) == 2
+
+
+def test_other_restaurants_are_not_compared():
+    rows = [item("Pepperoni Pizza", "12.99"), item("Pepperoni Pizza", "12.99", restaurant_name="Lucky Pizza Grill")]
+    assert len(kept_items(rows)) == 2
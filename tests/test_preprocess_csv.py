@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+from preprocess_csv import preprocess_streaming
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def menu_row(i, address2=None):
+    return {
+        "restaurant_name": f"Cafe {i}", "menu_category": "Pizza", "menu_item": "Margherita",
+        "menu_description": "Tomato and basil", "ingredient_name": "basil", "city": "Austin",
+        "state": "TX", "country": "US", "address1": f"{i} Main St", "address2": address2,
+        "confidence": 0.9, "rating": 4.5, "review_count": 10, "price": "$$",
+    }
+
+
+def test_parquet_column_all_nan_in_first_chunk(tmp_path):
+    input_path = tmp_path / "menu.csv"
+    output_path = tmp_path / "menu.parquet"
+    pd.DataFrame([menu_row(0), menu_row(1), menu_row(2, "Suite 5"), menu_row(3)]).to_csv(input_path, index=False)
+
+    rows = preprocess_streaming(str(input_path), str(output_path), chunksize=2, fmt="parquet")
+
+    table = pq.read_table(output_path)
+    assert rows == table.num_rows == 4
+    assert str(table.schema.field("address2").type) == "string"
+    assert str(table.schema.field("rating").type) == "double"
+    assert table.column("address2").to_pylist() == [None, None, "Suite 5", None]
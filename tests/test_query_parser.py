@@ -0,0 +1,63 @@
+import pytest
+
+from query_parser import QueryParser, normalize_location
+
+CITIES = ["buffalo", "orange", "austin", "new york", "atlanta", "new orleans"]
+STATES = ["tx", "ga", "la", "ny", "ca"]
+
+
+@pytest.fixture
+def parser():
+    return QueryParser(
+        {normalize_location(c): c for c in CITIES},
+        {normalize_location(s): s for s in STATES},
+    )
+
+
+@pytest.mark.parametrize("query", [
+    "Where can I find Texas toast?",
+    "Georgia peach cobbler",
+    "best Louisiana hot sauce wings",
+    "New York style pizza",
+    "buffalo wings",
+    "orange chicken",
+])
+def test_dish_names_are_not_locations(parser, query):
+    constraints = parser.parse(query)
+    assert constraints.city is None and constraints.state is None
+
+
+@pytest.mark.parametrize("query, city, state", [
+    ("Texas toast in Texas", None, "tx"),
+    ("peach cobbler near Georgia", None, "ga"),
+    ("gumbo in new orleans, Louisiana", "new orleans", "la"),
+    ("wings in Buffalo, NY", "buffalo", "ny"),
+    ("pizza in New York", "new york", None),
+    ("tacos in Austin, TX", "austin", "tx"),
+    ("best bbq austin", "austin", None),
+])
+def test_locations_with_a_cue(parser, query, city, state):
+    constraints = parser.parse(query)
+    assert (constraints.city, constraints.state) == (city, state)
+
+
+@pytest.mark.parametrize("query, min_price, max_price", [
+    ("something over 20 dollars", 20.0, None),
+    ("something under 20 dollars", None, 20.0),
+    ("pizza over $15", 15.0, None),
+    ("pizza under 12", None, 12.0),
+    ("Any sushi under $20.", None, 20.0),
+    ("more than 30 bucks", 30.0, None),
+    ("between 10 and 25 dollars", 10.0, 25.0),
+    ("places with over 4 stars", None, None),
+    ("more than 100 reviews", None, None),
+    ("burgers rated at least 4", None, None),
+])
+def test_price_bounds(parser, query, min_price, max_price):
+    constraints = parser.parse(query)
+    assert (constraints.min_price, constraints.max_price) == (min_price, max_price)
+
+
+def test_rating_is_not_a_price(parser):
+    constraints = parser.parse("burgers rated at least 4.5")
+    assert constraints.min_rating == 4.5 and constraints.min_price is None
@@ -0,0 +1,69 @@
+import time
+
+from web_search import CircuitBreaker, StubProvider, WebSearch
+
+
+def wait_until_done(pending):
+    while not pending.future.done():
+        time.sleep(0.01)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    provider = StubProvider(fail=True)
+    search = WebSearch(provider, cache_size=0, deadline=1.0, failure_threshold=2, reset_after=60)
+    try:
+        assert search.search("pad thai") == []
+        assert search.search("pad thai") == []
+        assert search.breaker.state == "open"
+        assert search.search("pad thai") == []
+        assert provider.calls == 2
+        assert search.stats()["rejected"] == 1
+    finally:
+        search.shutdown()
+
+
+def test_timeout_then_error_counts_once():
+    search = WebSearch(StubProvider(delay=0.2, fail=True), cache_size=0, deadline=0.05, failure_threshold=3)
+    try:
+        pending = search.start("pad thai")
+        assert pending.result() == []
+        wait_until_done(pending)
+        assert search.breaker._failures == 1
+        assert search.stats()["timeouts"] == 1
+    finally:
+        search.shutdown()
+
+
+def test_late_unawaited_trial_releases_the_half_open_circuit():
+    search = WebSearch(StubProvider(delay=0.1), cache_size=0, deadline=0.05, failure_threshold=1, reset_after=0.05)
+    try:
+        search.breaker.record_failure()
+        time.sleep(0.06)
+        pending = search.start("pad thai")  # the half-open trial, never collected
+        assert not search.breaker.allow()
+        wait_until_done(pending)
+        # The late answer is no success, but it no longer blocks the next trial
+        assert search.breaker.state == "half-open"
+        assert search.breaker.allow()
+    finally:
+        search.shutdown()
+
+
+def test_trial_in_time_closes_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_lost_trial_is_given_up_after_reset_after():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
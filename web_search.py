@@ -0,0 +1,292 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Optional
+
+from answer_cache import normalize_query
+
+
+class SearchProvider:
+    """A web search backend. Results are dicts with 'title', 'body' and 'href' (the DDGS shape)."""
+
+    name = "provider"
+
+    def search(self, query: str, max_results: int) -> List[dict]:
+        raise NotImplementedError
+
+
+class DuckDuckGoProvider(SearchProvider):
+    name = "duckduckgo"
+
+    def __init__(self, timeout: float = 5.0):
+        self.timeout = timeout
+
+    def search(self, query: str, max_results: int) -> List[dict]:
+        from duckduckgo_search import DDGS
+
+        with DDGS(timeout=self.timeout) as ddgs:
+            return list(ddgs.text(query, max_results=max_results))
+
+
+class StubProvider(SearchProvider):
+    """
+    Offline provider for tests and local runs: canned results, optionally
+    loaded from a JSON file mapping normalized queries to result lists
+    ("*" is the fallback), with an optional artificial delay or failure.
+    """
+
+    name = "stub"
+
+    def __init__(self, results: dict = None, fixture_path: str = None, delay: float = 0.0, fail: bool = False):
+        if fixture_path:
+            with open(fixture_path) as f:
+                results = json.load(f)
+        self.results = results or {
+            "*": [{"title": "Stub result", "body": "Stub web search result.", "href": "https://example.com"}]
+        }
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def search(self, query: str, max_results: int) -> List[dict]:
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("stub provider failure")
+        results = self.results.get(normalize_query(query), self.results.get("*", []))
+        return results[:max_results]
+
+
+def build_provider(name: str = None) -> SearchProvider:
+    """Provider from WEB_SEARCH_PROVIDER: duckduckgo (default) or stub (WEB_SEARCH_STUB_FILE for fixtures)."""
+    name = name or os.getenv("WEB_SEARCH_PROVIDER", "duckduckgo")
+    if name == "duckduckgo":
+        return DuckDuckGoProvider(timeout=float(os.getenv("WEB_SEARCH_TIMEOUT", "3.0")))
+    if name == "stub":
+        return StubProvider(fixture_path=os.getenv("WEB_SEARCH_STUB_FILE"))
+    raise ValueError(f"Unknown WEB_SEARCH_PROVIDER {name!r}; expected 'duckduckgo' or 'stub'.")
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_after` seconds; then lets a single trial call through (half-open),
+    closing again on success. A trial that reports nothing within `reset_after`
+    is given up on, so a lost trial can't keep the circuit half-open forever.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_after: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._trial_started_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self._opened_at >= self.reset_after else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and (
+                not self._trial_in_flight or time.monotonic() - self._trial_started_at >= self.reset_after
+            ):
+                self._trial_in_flight = True
+                self._trial_started_at = time.monotonic()
+                return True
+            return False
+
+    def release_trial(self, started_before: float):
+        """End the trial admitted before `started_before` without a verdict (e.g. it answered after its deadline)."""
+        with self._lock:
+            if self._trial_started_at <= started_before:
+                self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class PendingSearch:
+    """A web search already running in the background; result() waits at most until its deadline."""
+
+    def __init__(self, owner: "WebSearch", query: str, future=None, results: List[dict] = None):
+        self.owner = owner
+        self.query = query
+        self.future = future
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + owner.deadline
+        self._results = results
+        self._settled = False
+        self._lock = threading.Lock()
+
+    def settle(self) -> bool:
+        """True for the first caller only: the one that reports this call's outcome to the breaker."""
+        with self._lock:
+            settled, self._settled = self._settled, True
+            return not settled
+
+    def result(self) -> List[dict]:
+        if self._results is None:
+            self._results = self.owner._collect(self)
+        return self._results
+
+
+class WebSearch:
+    """
+    Web-search fallback with a TTL cache keyed by normalized query, a hard
+    deadline per lookup and a circuit breaker around the provider.
+
+    Lookups never raise: a timeout, provider error or open circuit yields
+    an empty result list (and is logged), so the caller's "no context"
+    path takes over. A provider call that overruns its deadline keeps
+    running on the worker pool, but nobody waits for it; if it finishes,
+    its results still land in the cache.
+    """
+
+    def __init__(self, provider: SearchProvider = None, max_results: int = 3, cache_ttl: float = None,
+                 cache_size: int = None, deadline: float = None, failure_threshold: int = None,
+                 reset_after: float = None, workers: int = None):
+        self.provider = provider or build_provider()
+        self.max_results = max_results
+        self.cache_ttl = cache_ttl if cache_ttl is not None else float(os.getenv("WEB_SEARCH_CACHE_TTL", "3600"))
+        self.cache_size = cache_size if cache_size is not None else int(os.getenv("WEB_SEARCH_CACHE_SIZE", "1024"))
+        self.deadline = deadline if deadline is not None else float(os.getenv("WEB_SEARCH_DEADLINE", "3.0"))
+        self.breaker = CircuitBreaker(
+            failure_threshold or int(os.getenv("WEB_SEARCH_FAILURE_THRESHOLD", "3")),
+            reset_after if reset_after is not None else float(os.getenv("WEB_SEARCH_RESET_AFTER", "30")),
+        )
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers or int(os.getenv("WEB_SEARCH_WORKERS", "4")), thread_name_prefix="web-search"
+        )
+        self._cache = OrderedDict()  # normalized query -> (expires_at, results)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.rejected = 0
+
+    # -------------------------
+    # Cache
+    # -------------------------
+    def _cached(self, key: str) -> Optional[List[dict]]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _store(self, key: str, results: List[dict]):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, results)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # -------------------------
+    # Lookups
+    # -------------------------
+    def start(self, query: str) -> PendingSearch:
+        """Begin a lookup without waiting for it (cache hits resolve immediately)."""
+        key = normalize_query(query)
+        cached = self._cached(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return PendingSearch(self, query, results=cached)
+        with self._lock:
+            self.misses += 1
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejected += 1
+            logging.warning(f"Web search skipped: circuit {self.breaker.state} for {self.provider.name}")
+            return PendingSearch(self, query, results=[])
+        pending = PendingSearch(self, query)
+        pending.future = self._pool.submit(self._call, key, query, pending)
+        return pending
+
+    def search(self, query: str) -> List[dict]:
+        """Cached, deadline-bounded lookup; [] on timeout, error or open circuit."""
+        return self.start(query).result()
+
+    def _call(self, key: str, query: str, pending: PendingSearch) -> List[dict]:
+        # Each call reports to the breaker once: here, unless _collect already counted its timeout
+        try:
+            results = self.provider.search(query, self.max_results)
+        except Exception:
+            if pending.settle():
+                self.breaker.record_failure()
+            raise
+        if pending.settle():
+            if time.monotonic() <= pending.deadline:
+                self.breaker.record_success()
+            else:
+                self.breaker.release_trial(pending.started_at)  # late, but nobody waited for it: no verdict
+        # A late answer is still cached
+        self._store(key, results)
+        return results
+
+    def _collect(self, pending: PendingSearch) -> List[dict]:
+        try:
+            return pending.future.result(timeout=max(0.0, pending.deadline - time.monotonic()))
+        except FutureTimeout:
+            # Counts against the breaker even if the call completes later
+            if pending.settle():
+                self.breaker.record_failure()
+            with self._lock:
+                self.timeouts += 1
+            logging.warning(f"Web search timed out after {self.deadline:.1f}s: {pending.query!r}")
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logging.error(f"Web search error: {e}")
+        return []
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._cache)
+        return {
+            "provider": self.provider.name,
+            "circuit": self.breaker.state,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)